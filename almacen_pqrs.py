@@ -0,0 +1,642 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import configuracion
+
+# ============================================================================
+# ALMACÉN DE PQRS
+# ============================================================================
+# SQLite en modo WAL: los lectores no bloquean al escritor y varias réplicas
+# en el mismo servidor pueden compartir el archivo. Cada hilo usa su propia
+# conexión. Las fechas se guardan como texto ISO ('YYYY-MM-DD HH:MM:SS'),
+# que ordena igual que la fecha, así los filtros son rangos sobre índices.
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pqrs (
+    id INTEGER PRIMARY KEY,
+    radicado TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    numero_contrato TEXT NOT NULL,
+    nombre_cliente TEXT,
+    direccion TEXT,
+    numero_medidor TEXT,
+    datos_cliente TEXT NOT NULL,
+    texto TEXT,
+    modelo TEXT,
+    estado TEXT NOT NULL,
+    error TEXT,
+    desde_cache INTEGER NOT NULL DEFAULT 0,
+    tiempo_total_ms INTEGER,
+    tiempo_primer_token_ms INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pqrs_radicado ON pqrs (radicado);
+CREATE INDEX IF NOT EXISTS idx_pqrs_fecha ON pqrs (fecha);
+CREATE INDEX IF NOT EXISTS idx_pqrs_tipo_fecha ON pqrs (tipo, fecha);
+CREATE INDEX IF NOT EXISTS idx_pqrs_contrato_fecha ON pqrs (numero_contrato, fecha);
+CREATE INDEX IF NOT EXISTS idx_pqrs_estado_fecha ON pqrs (estado, fecha);
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    dia TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    desde_cache INTEGER NOT NULL,
+    suma_tiempo_ms INTEGER NOT NULL,
+    con_tiempo INTEGER NOT NULL,
+    PRIMARY KEY (dia, tipo, estado)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS histograma_latencia (
+    dia TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    cubeta INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (dia, tipo, cubeta)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS documentos (
+    radicado TEXT NOT NULL,
+    formato TEXT NOT NULL,
+    hash_texto TEXT NOT NULL,
+    version_plantilla INTEGER NOT NULL,
+    contenido BLOB NOT NULL,
+    PRIMARY KEY (radicado, formato)
+);
+"""
+
+# Límites superiores (ms) de las cubetas del histograma de tiempos de las PQRS
+# completadas; la última cubeta (índice len) recoge todo lo que las supera.
+CUBETAS_LATENCIA_MS = (250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000, 120000)
+
+
+def _sql_cubeta(columna):
+    """Expresión SQL con el índice de la cubeta de latencia de columna"""
+    casos = ' '.join(f"WHEN {columna} <= {limite} THEN {i}" for i, limite in enumerate(CUBETAS_LATENCIA_MS))
+    return f"CASE {casos} ELSE {len(CUBETAS_LATENCIA_MS)} END"
+
+
+def _sql_sumar(fila, signo):
+    """Sentencias que suman (+1) o restan (-1) una fila de pqrs a los resúmenes"""
+    return f"""
+    INSERT INTO resumen_diario (dia, tipo, estado, total, desde_cache, suma_tiempo_ms, con_tiempo)
+    VALUES (substr({fila}.fecha, 1, 10), {fila}.tipo, {fila}.estado, {signo}, {signo} * {fila}.desde_cache,
+            {signo} * COALESCE({fila}.tiempo_total_ms, 0), {signo} * ({fila}.tiempo_total_ms IS NOT NULL))
+    ON CONFLICT (dia, tipo, estado) DO UPDATE SET
+        total = total + excluded.total,
+        desde_cache = desde_cache + excluded.desde_cache,
+        suma_tiempo_ms = suma_tiempo_ms + excluded.suma_tiempo_ms,
+        con_tiempo = con_tiempo + excluded.con_tiempo;
+    INSERT INTO histograma_latencia (dia, tipo, cubeta, cantidad)
+    SELECT substr({fila}.fecha, 1, 10), {fila}.tipo, {_sql_cubeta(f'{fila}.tiempo_total_ms')}, {signo}
+    WHERE {fila}.estado = 'Completada' AND {fila}.tiempo_total_ms IS NOT NULL
+    ON CONFLICT (dia, tipo, cubeta) DO UPDATE SET cantidad = cantidad + excluded.cantidad;"""
+
+
+# Los resúmenes se actualizan con triggers: en la misma transacción que la
+# escritura en pqrs, también cuando un radicado se actualiza (se resta la
+# versión anterior y se suma la nueva)
+TRIGGERS_RESUMEN = (
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_resumen_insertar AFTER INSERT ON pqrs BEGIN
+    {_sql_sumar('NEW', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_resumen_actualizar AFTER UPDATE ON pqrs BEGIN
+    {_sql_sumar('OLD', -1)}
+    {_sql_sumar('NEW', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_resumen_eliminar AFTER DELETE ON pqrs BEGIN
+    {_sql_sumar('OLD', -1)}
+    END"""
+)
+
+# Búsqueda de texto completo: índice FTS5 de contenido externo sobre pqrs (no
+# duplica el texto), con tildes y mayúsculas plegadas. Los triggers lo
+# mantienen al día en la misma transacción que cada escritura.
+COLUMNAS_BUSQUEDA = ('radicado', 'nombre_cliente', 'direccion', 'numero_medidor', 'texto')
+# Peso de cada columna en bm25 (mismo orden): un acierto en el radicado o el
+# medidor pesa más que uno en el cuerpo de la carta
+PESOS_BUSQUEDA = (10.0, 5.0, 2.0, 8.0, 1.0)
+
+ESQUEMA_BUSQUEDA = f"""CREATE VIRTUAL TABLE pqrs_fts USING fts5(
+    {', '.join(COLUMNAS_BUSQUEDA)},
+    content='pqrs', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)"""
+
+
+def _sql_fts(fila, accion):
+    """Sentencia que agrega una fila de pqrs al índice FTS o ('delete') la retira"""
+    columnas = ', '.join(COLUMNAS_BUSQUEDA)
+    valores = ', '.join(f'{fila}.{c}' for c in COLUMNAS_BUSQUEDA)
+    if accion == 'delete':
+        return f"INSERT INTO pqrs_fts (pqrs_fts, rowid, {columnas}) VALUES ('delete', {fila}.id, {valores});"
+    return f"INSERT INTO pqrs_fts (rowid, {columnas}) VALUES ({fila}.id, {valores});"
+
+
+TRIGGERS_BUSQUEDA = (
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_fts_insertar AFTER INSERT ON pqrs BEGIN
+    {_sql_fts('NEW', 'insert')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_fts_actualizar AFTER UPDATE OF {', '.join(COLUMNAS_BUSQUEDA)} ON pqrs BEGIN
+    {_sql_fts('OLD', 'delete')}
+    {_sql_fts('NEW', 'insert')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS pqrs_fts_eliminar AFTER DELETE ON pqrs BEGIN
+    {_sql_fts('OLD', 'delete')}
+    END"""
+)
+
+# Marcas de snippet(); la interfaz escapa el HTML y luego las reemplaza por <mark>
+MARCA_INICIO = '\x02'
+MARCA_FIN = '\x03'
+
+COLUMNAS_HISTORIAL = ('radicado', 'fecha', 'tipo', 'numero_contrato', 'nombre_cliente',
+                      'estado', 'tiempo_total_ms')
+
+# Columnas de la exportación del historial (auditoría)
+COLUMNAS_EXPORTACION = ('radicado', 'fecha', 'tipo', 'numero_contrato', 'nombre_cliente', 'direccion',
+                        'numero_medidor', 'estado', 'modelo', 'desde_cache', 'tiempo_total_ms',
+                        'tiempo_primer_token_ms', 'error', 'texto')
+
+# PQRS que sirven de precedente a casos similares: cartas escritas por el
+# modelo (las servidas desde caché o reutilizadas son copias de otra)
+CONDICION_CASO_RESUELTO = "estado = 'Completada' AND desde_cache = 0 AND texto IS NOT NULL"
+
+
+def _fecha_texto(valor):
+    """Convierte date/datetime a texto ISO ordenable"""
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return valor.strftime('%Y-%m-%d 00:00:00')
+
+
+def _dia_texto(valor):
+    """Convierte date/datetime al día 'YYYY-MM-DD' de los resúmenes"""
+    return valor.strftime('%Y-%m-%d')
+
+
+def consulta_fts(texto):
+    """Convierte lo escrito en la caja de búsqueda en una consulta FTS5 válida
+
+    Cada palabra o "frase entre comillas" es una frase FTS (así MED-00123 o
+    VEO-R-2025... buscan sus partes seguidas) y todas deben aparecer, salvo
+    que se unan con OR o se excluyan con NOT. Una palabra terminada en *
+    busca por prefijo. Retorna '' si no queda nada que buscar.
+    """
+    partes = []
+    for frase, palabra in re.findall(r'"([^"]*)"|(\S+)', texto):
+        if palabra in ('OR', 'NOT'):
+            # Un operador necesita un término a cada lado
+            if partes and partes[-1] not in ('OR', 'NOT'):
+                partes.append(palabra)
+            continue
+        termino = frase or palabra.rstrip('*')
+        if not any(c.isalnum() for c in termino):
+            continue
+        prefijo = '*' if palabra.endswith('*') else ''
+        partes.append('"' + termino.replace('"', '""') + '"' + prefijo)
+    while partes and partes[-1] in ('OR', 'NOT'):
+        partes.pop()
+    return ' '.join(partes)
+
+
+def _tupla(valores):
+    """Lista de filtros como tupla ordenada (hashable para el cache); None se conserva"""
+    return None if valores is None else tuple(sorted(valores))
+
+
+def _sin_resultados(tipos, estados):
+    """Un filtro de tipos o estados vacío (no None) no deja pasar ninguna PQRS"""
+    return (tipos is not None and not tipos) or (estados is not None and not estados)
+
+
+def _filtros_historial(fecha_inicio, fecha_fin, tipos=None, estados=None, numero_contrato=None):
+    """Condiciones WHERE, parámetros e índice de los filtros del historial (fechas inclusive)
+
+    El índice elegido entrega las filas ya en orden (fecha, id) para que
+    LIMIT corte sin ordenar: el del contrato (pocas filas por contrato), el
+    del estado o del tipo si se filtra por uno solo (los errores son pocos y
+    recorrer por fecha hasta encontrarlos sería lento), y si no, el de
+    fecha. Con varios valores, un índice por tipo o estado obligaría a
+    ordenar todo el resto del rango en cada página.
+    """
+    condiciones = ["fecha >= ?", "fecha < ?"]
+    parametros = [_fecha_texto(fecha_inicio), _fecha_texto(fecha_fin + timedelta(days=1))]
+    if numero_contrato:
+        condiciones.append("numero_contrato = ?")
+        parametros.append(numero_contrato)
+    if tipos is not None:
+        condiciones.append(f"tipo IN ({', '.join('?' * len(tipos))})")
+        parametros.extend(tipos)
+    if estados is not None:
+        condiciones.append(f"estado IN ({', '.join('?' * len(estados))})")
+        parametros.extend(estados)
+    if numero_contrato:
+        indice = 'idx_pqrs_contrato_fecha'
+    elif estados is not None and len(estados) == 1:
+        indice = 'idx_pqrs_estado_fecha'
+    elif tipos is not None and len(tipos) == 1:
+        indice = 'idx_pqrs_tipo_fecha'
+    else:
+        indice = 'idx_pqrs_fecha'
+    return condiciones, parametros, indice
+
+
+class AlmacenPQRS:
+    """Persistencia de radicados con consultas indexadas por fecha, tipo y contrato"""
+
+    def __init__(self, ruta_db):
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+        # Páginas y conteos del historial por filtros; se invalidan con cada
+        # escritura de este proceso y, las de otros procesos, al vencer el TTL
+        self._consultas = OrderedDict()
+        self._version = 0
+        self._lock_consultas = threading.Lock()
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        self._conexion().executescript(ESQUEMA)
+        self._crear_resumenes()
+        self._crear_busqueda()
+
+    def _conexion(self):
+        """Retorna la conexión del hilo actual, creándola si no existe"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute("PRAGMA busy_timeout=30000")
+            self._local.conexion = conexion
+        return conexion
+
+    def _crear_resumenes(self):
+        """Crea los triggers de resumen; en una base anterior a ellos, calcula los resúmenes una vez"""
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            existian = conexion.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'pqrs_resumen_%'"
+            ).fetchone()[0]
+            if not existian:
+                conexion.execute("DELETE FROM resumen_diario")
+                conexion.execute("DELETE FROM histograma_latencia")
+                conexion.execute(
+                    """INSERT INTO resumen_diario
+                        SELECT substr(fecha, 1, 10), tipo, estado, COUNT(*), SUM(desde_cache),
+                               COALESCE(SUM(tiempo_total_ms), 0), COUNT(tiempo_total_ms)
+                        FROM pqrs GROUP BY 1, 2, 3"""
+                )
+                conexion.execute(
+                    f"""INSERT INTO histograma_latencia
+                        SELECT substr(fecha, 1, 10), tipo, {_sql_cubeta('tiempo_total_ms')}, COUNT(*)
+                        FROM pqrs WHERE estado = 'Completada' AND tiempo_total_ms IS NOT NULL
+                        GROUP BY 1, 2, 3"""
+                )
+            for sentencia in TRIGGERS_RESUMEN:
+                conexion.execute(sentencia)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def _crear_busqueda(self):
+        """Crea el índice FTS y sus triggers; si el índice es nuevo, lo llena con 'rebuild'"""
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            existia = conexion.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'pqrs_fts'"
+            ).fetchone()[0]
+            if not existia:
+                conexion.execute(ESQUEMA_BUSQUEDA)
+                conexion.execute(
+                    "INSERT INTO pqrs_fts (pqrs_fts, rank) VALUES ('rank', ?)",
+                    (f"bm25({', '.join(map(str, PESOS_BUSQUEDA))})",)
+                )
+                conexion.execute("INSERT INTO pqrs_fts (pqrs_fts) VALUES ('rebuild')")
+            for sentencia in TRIGGERS_BUSQUEDA:
+                conexion.execute(sentencia)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def guardar_pqrs(self, registro):
+        """Inserta o actualiza (por radicado) una PQRS generada
+
+        Un error no reemplaza una carta ya completada del mismo radicado (por
+        ejemplo, una regeneración fallida dentro de la ventana del radicado).
+        """
+        datos_cliente = registro['datos_cliente']
+        valores = {
+            'radicado': registro['radicado'],
+            'fecha': _fecha_texto(registro.get('fecha') or datetime.now()),
+            'tipo': registro['tipo'],
+            'numero_contrato': datos_cliente['numero_contrato'],
+            'nombre_cliente': datos_cliente.get('nombre_completo'),
+            'direccion': datos_cliente.get('direccion'),
+            'numero_medidor': datos_cliente.get('numero_medidor'),
+            'datos_cliente': json.dumps(datos_cliente, ensure_ascii=False),
+            'texto': registro.get('texto'),
+            'modelo': registro.get('modelo'),
+            'estado': registro['estado'],
+            'error': registro.get('error'),
+            'desde_cache': int(bool(registro.get('desde_cache'))),
+            'tiempo_total_ms': registro.get('tiempo_total_ms'),
+            'tiempo_primer_token_ms': registro.get('tiempo_primer_token_ms')
+        }
+        columnas = ', '.join(valores)
+        marcadores = ', '.join(f':{c}' for c in valores)
+        actualizacion = ', '.join(f'{c} = excluded.{c}' for c in valores if c != 'radicado')
+        self._conexion().execute(
+            f"INSERT INTO pqrs ({columnas}) VALUES ({marcadores}) "
+            f"ON CONFLICT (radicado) DO UPDATE SET {actualizacion} "
+            f"WHERE NOT (pqrs.estado = 'Completada' AND excluded.estado = 'Error')",
+            valores
+        )
+        with self._lock_consultas:
+            self._version += 1
+
+    def obtener(self, radicado):
+        """Retorna la PQRS completa de un radicado, o None"""
+        fila = self._conexion().execute("SELECT * FROM pqrs WHERE radicado = ?", (radicado,)).fetchone()
+        if fila is None:
+            return None
+        registro = dict(fila)
+        registro['datos_cliente'] = json.loads(registro['datos_cliente'])
+        return registro
+
+    def inicio_casos_recientes(self, cantidad):
+        """Id a partir del cual (exclusive) quedan las cantidad PQRS resueltas más recientes"""
+        # NOT INDEXED: por estado, SQLite ordenaría todas las completadas por id
+        fila = self._conexion().execute(
+            f"""SELECT MIN(id) FROM (
+                    SELECT id FROM pqrs NOT INDEXED WHERE {CONDICION_CASO_RESUELTO} ORDER BY id DESC LIMIT ?
+                )""",
+            (cantidad,)
+        ).fetchone()
+        return fila[0] - 1 if fila[0] is not None else 0
+
+    def casos_resueltos(self, despues_de, limite=1000):
+        """PQRS resueltas con id mayor que despues_de, en orden de id: id, radicado, tipo y datos_cliente
+
+        Recorre la clave primaria desde despues_de: sin casos nuevos no lee nada.
+        """
+        filas = self._conexion().execute(
+            f"""SELECT id, radicado, tipo, datos_cliente FROM pqrs NOT INDEXED
+                WHERE id > ? AND {CONDICION_CASO_RESUELTO} ORDER BY id LIMIT ?""",
+            (despues_de, limite)
+        ).fetchall()
+        return [dict(f, datos_cliente=json.loads(f['datos_cliente'])) for f in filas]
+
+    def guardar_documento(self, clave, contenido):
+        """Guarda los bytes de un documento con su clave de artefacto (uno por radicado y formato)"""
+        formato, radicado, hash_texto, version_plantilla = clave
+        self._conexion().execute(
+            """INSERT INTO documentos (radicado, formato, hash_texto, version_plantilla, contenido)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (radicado, formato) DO UPDATE SET hash_texto = excluded.hash_texto,
+                   version_plantilla = excluded.version_plantilla, contenido = excluded.contenido""",
+            (radicado, formato, hash_texto, version_plantilla, contenido)
+        )
+
+    def obtener_documento(self, clave):
+        """Retorna los bytes guardados si corresponden al mismo texto y plantilla, o None"""
+        formato, radicado, hash_texto, version_plantilla = clave
+        fila = self._conexion().execute(
+            """SELECT contenido FROM documentos
+               WHERE radicado = ? AND formato = ? AND hash_texto = ? AND version_plantilla = ?""",
+            (radicado, formato, hash_texto, version_plantilla)
+        ).fetchone()
+        return fila[0] if fila is not None else None
+
+    def _cacheado(self, clave, calcular):
+        """Resultado de calcular() por clave, reutilizado hasta la próxima escritura o el TTL"""
+        ahora = time.monotonic()
+        with self._lock_consultas:
+            version = self._version
+            entrada = self._consultas.get(clave)
+            vigente = entrada is not None and ahora - entrada[1] < configuracion.HISTORIAL_CACHE_TTL_SEGUNDOS
+            if vigente and entrada[0] == version:
+                self._consultas.move_to_end(clave)
+                return entrada[2]
+        valor = calcular()
+        with self._lock_consultas:
+            self._consultas[clave] = (version, ahora, valor)
+            self._consultas.move_to_end(clave)
+            while len(self._consultas) > configuracion.HISTORIAL_CACHE_MAX_ENTRADAS:
+                self._consultas.popitem(last=False)
+        return valor
+
+    def _pagina(self, columnas, filtros, despues_de, limite):
+        """Filas (id, *columnas) que siguen a despues_de = (fecha, id) en orden descendente"""
+        condiciones, parametros, indice = _filtros_historial(*filtros)
+        if despues_de is not None:
+            fecha, id_fila = despues_de
+            condiciones.append("(fecha < ? OR (fecha = ? AND id < ?))")
+            parametros.extend([fecha, fecha, id_fila])
+        return self._conexion().execute(
+            f"SELECT id, {', '.join(columnas)} FROM pqrs INDEXED BY {indice} "
+            f"WHERE {' AND '.join(condiciones)} ORDER BY fecha DESC, id DESC LIMIT ?",
+            parametros + [limite]
+        ).fetchall()
+
+    def consultar_historial(self, fecha_inicio, fecha_fin, tipos=None, limite=100, estados=None, numero_contrato=None):
+        """PQRS que cumplen los filtros (fechas inclusive), de la más reciente a la más antigua"""
+        if _sin_resultados(tipos, estados):
+            return []
+        filtros = (fecha_inicio, fecha_fin, tipos, estados, numero_contrato)
+        return [dict(f) for f in self._pagina(COLUMNAS_HISTORIAL, filtros, None, limite)]
+
+    def pagina_historial(self, fecha_inicio, fecha_fin, tipos=None, estados=None, numero_contrato=None,
+                         despues_de=None, tamano=25):
+        """Una página del historial filtrado y el cursor de la siguiente
+
+        despues_de es el cursor (fecha, id) retornado por la página anterior
+        (None para la primera). Retorna {'filas': [...], 'siguiente': cursor o
+        None si es la última}. Cada página es una búsqueda en el índice que
+        empieza en el cursor: su costo no depende de cuántas páginas se hayan
+        pasado ni del tamaño del historial.
+        """
+        filtros = (fecha_inicio, fecha_fin, _tupla(tipos), _tupla(estados), numero_contrato or None)
+
+        def calcular():
+            if _sin_resultados(filtros[2], filtros[3]):
+                return {'filas': [], 'siguiente': None}
+            # Una fila de más indica si hay página siguiente
+            filas = self._pagina(COLUMNAS_HISTORIAL, filtros, despues_de, tamano + 1)
+            siguiente = (filas[tamano - 1]['fecha'], filas[tamano - 1]['id']) if len(filas) > tamano else None
+            return {'filas': [dict(f) for f in filas[:tamano]], 'siguiente': siguiente}
+
+        return self._cacheado(('pagina', filtros, despues_de, tamano), calcular)
+
+    def iterar_historial(self, fecha_inicio, fecha_fin, tipos=None, estados=None, numero_contrato=None,
+                         columnas=COLUMNAS_EXPORTACION, tamano_bloque=2000):
+        """Recorre el historial filtrado en bloques (listas de tuplas en el orden de columnas)
+
+        Cada bloque es una consulta corta que continúa desde la última
+        (fecha, id) vista: no se usa OFFSET ni se mantiene una lectura abierta
+        entre bloques, así que la memoria no depende del total de filas.
+        """
+        if _sin_resultados(tipos, estados):
+            return
+        filtros = (fecha_inicio, fecha_fin, tipos, estados, numero_contrato)
+        filas = self._pagina(columnas, filtros, None, tamano_bloque)
+        while filas:
+            yield [tuple(f)[1:] for f in filas]
+            if len(filas) < tamano_bloque:
+                return
+            filas = self._pagina(columnas, filtros, (filas[-1]['fecha'], filas[-1]['id']), tamano_bloque)
+
+    def contar_historial(self, fecha_inicio, fecha_fin, tipos=None, estados=None, numero_contrato=None):
+        """Cantidad de PQRS que cumplen los filtros (fechas inclusive)
+
+        Sin contrato se suma resumen_diario (un registro por día, tipo y
+        estado); con contrato se cuenta sobre idx_pqrs_contrato_fecha.
+        """
+        filtros = (fecha_inicio, fecha_fin, _tupla(tipos), _tupla(estados), numero_contrato or None)
+
+        def calcular():
+            if _sin_resultados(filtros[2], filtros[3]):
+                return 0
+            if numero_contrato:
+                condiciones, parametros, indice = _filtros_historial(*filtros)
+                consulta = f"SELECT COUNT(*) FROM pqrs INDEXED BY {indice} WHERE {' AND '.join(condiciones)}"
+            else:
+                consulta = "SELECT COALESCE(SUM(total), 0) FROM resumen_diario WHERE dia BETWEEN ? AND ?"
+                parametros = [_dia_texto(fecha_inicio), _dia_texto(fecha_fin)]
+                for columna, valores in (('tipo', filtros[2]), ('estado', filtros[3])):
+                    if valores is not None:
+                        consulta += f" AND {columna} IN ({', '.join('?' * len(valores))})"
+                        parametros.extend(valores)
+            return self._conexion().execute(consulta, parametros).fetchone()[0]
+
+        return self._cacheado(('conteo', filtros), calcular)
+
+    def buscar(self, texto, fecha_inicio, fecha_fin, tipos=None, estados=None, numero_contrato=None, limite=50):
+        """PQRS que contienen lo buscado y cumplen los filtros, de la más a la menos relevante (bm25)
+
+        Se ordenan por relevancia las BUSQUEDA_MAX_CANDIDATOS coincidencias
+        más recientes que cumplen los filtros: con un término que aparece en
+        casi todas las cartas, calcular bm25 sobre millones de filas no cabe
+        en una consulta interactiva. Cada resultado trae 'fragmento': el trozo
+        de la columna más relevante con los términos encontrados entre
+        MARCA_INICIO y MARCA_FIN.
+        """
+        consulta = consulta_fts(texto)
+        filtros = (fecha_inicio, fecha_fin, _tupla(tipos), _tupla(estados), numero_contrato or None)
+
+        def calcular():
+            if not consulta or _sin_resultados(filtros[2], filtros[3]):
+                return []
+            # Las columnas de los filtros no existen en pqrs_fts: no hay ambigüedad en el JOIN
+            condiciones, parametros, _ = _filtros_historial(*filtros)
+            filas = self._conexion().execute(
+                f"""WITH candidatos AS (
+                        SELECT pqrs_fts.rowid AS id, pqrs_fts.rank AS rango
+                        FROM pqrs_fts CROSS JOIN pqrs ON pqrs.id = pqrs_fts.rowid
+                        WHERE pqrs_fts MATCH ? AND {' AND '.join(condiciones)}
+                        ORDER BY pqrs_fts.rowid DESC LIMIT ?
+                    ), mejores AS (
+                        SELECT id, rango FROM candidatos ORDER BY rango LIMIT ?
+                    )
+                    SELECT {', '.join(f'p.{c}' for c in COLUMNAS_HISTORIAL)},
+                           snippet(pqrs_fts, -1, ?, ?, '…', 16) AS fragmento
+                    FROM mejores
+                    CROSS JOIN pqrs_fts ON pqrs_fts.rowid = mejores.id
+                    CROSS JOIN pqrs p ON p.id = mejores.id
+                    WHERE pqrs_fts MATCH ?
+                    ORDER BY mejores.rango""",
+                [consulta] + parametros + [configuracion.BUSQUEDA_MAX_CANDIDATOS, limite,
+                                           MARCA_INICIO, MARCA_FIN, consulta]
+            ).fetchall()
+            return [dict(f) for f in filas]
+
+        return self._cacheado(('busqueda', consulta, filtros, limite), calcular)
+
+    def ultimas(self, limite=10):
+        """Últimas PQRS registradas"""
+        filas = self._conexion().execute(
+            f"SELECT {', '.join(COLUMNAS_HISTORIAL)} FROM pqrs ORDER BY fecha DESC, id DESC LIMIT ?",
+            (limite,)
+        ).fetchall()
+        return [dict(f) for f in filas]
+
+    def resumen_periodo(self, fecha_inicio, fecha_fin):
+        """Total, completadas y tiempo promedio de generación entre dos fechas (inclusive)
+
+        Se lee de resumen_diario: el costo depende de los días del periodo,
+        no de cuántas PQRS haya.
+        """
+        fila = self._conexion().execute(
+            """SELECT COALESCE(SUM(total), 0) AS total,
+                      COALESCE(SUM(CASE WHEN estado = 'Completada' THEN total END), 0) AS completadas,
+                      SUM(CASE WHEN estado = 'Completada' THEN suma_tiempo_ms END) * 1.0
+                          / NULLIF(SUM(CASE WHEN estado = 'Completada' THEN con_tiempo END), 0) AS tiempo_promedio_ms
+               FROM resumen_diario WHERE dia BETWEEN ? AND ?""",
+            (_dia_texto(fecha_inicio), _dia_texto(fecha_fin))
+        ).fetchone()
+        return dict(fila)
+
+    def conteo_por_tipo(self, fecha_inicio, fecha_fin):
+        """Cantidad de PQRS por tipo entre dos fechas (inclusive)"""
+        filas = self._conexion().execute(
+            "SELECT tipo, SUM(total) FROM resumen_diario WHERE dia BETWEEN ? AND ? GROUP BY tipo HAVING SUM(total) > 0",
+            (_dia_texto(fecha_inicio), _dia_texto(fecha_fin))
+        ).fetchall()
+        return {tipo: cantidad for tipo, cantidad in filas}
+
+    def conteo_por_mes(self, fecha_inicio, fecha_fin):
+        """Cantidad de PQRS por mes ('YYYY-MM') entre dos fechas (inclusive)"""
+        filas = self._conexion().execute(
+            """SELECT substr(dia, 1, 7) AS mes, SUM(total) FROM resumen_diario
+               WHERE dia BETWEEN ? AND ? GROUP BY mes HAVING SUM(total) > 0 ORDER BY mes""",
+            (_dia_texto(fecha_inicio), _dia_texto(fecha_fin))
+        ).fetchall()
+        return {mes: cantidad for mes, cantidad in filas}
+
+    def histograma_latencia(self, fecha_inicio, fecha_fin):
+        """Cantidad de PQRS completadas por cubeta de CUBETAS_LATENCIA_MS entre dos fechas (inclusive)"""
+        filas = self._conexion().execute(
+            "SELECT cubeta, SUM(cantidad) FROM histograma_latencia WHERE dia BETWEEN ? AND ? GROUP BY cubeta",
+            (_dia_texto(fecha_inicio), _dia_texto(fecha_fin))
+        ).fetchall()
+        histograma = [0] * (len(CUBETAS_LATENCIA_MS) + 1)
+        for cubeta, cantidad in filas:
+            histograma[cubeta] = cantidad
+        return histograma
+
+    def percentil_latencia(self, fecha_inicio, fecha_fin, fraccion):
+        """Cota superior (ms) del percentil de tiempo según el histograma; None si no hay datos
+
+        Si el percentil cae en la última cubeta, que no tiene cota, se retorna
+        el último límite.
+        """
+        histograma = self.histograma_latencia(fecha_inicio, fecha_fin)
+        total = sum(histograma)
+        if not total:
+            return None
+        acumulado = 0
+        for cubeta, cantidad in enumerate(histograma):
+            acumulado += cantidad
+            if acumulado >= fraccion * total:
+                return CUBETAS_LATENCIA_MS[min(cubeta, len(CUBETAS_LATENCIA_MS) - 1)]
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_almacen():
+    """Retorna el almacén compartido del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = AlmacenPQRS(configuracion.ALMACEN_RUTA)
+    return _instancia
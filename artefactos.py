@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import configuracion
+
+# ============================================================================
+# CACHE DE DOCUMENTOS GENERADOS
+# ============================================================================
+# Guarda los bytes de cada documento ya renderizado, por (formato, radicado,
+# hash del texto, versión de plantilla). El límite es en bytes, no en número
+# de entradas, porque un documento pesa decenas de KB.
+
+
+def clave_artefacto(formato, radicado, texto, version_plantilla):
+    """Clave de un documento: cambia si cambia el texto o la plantilla"""
+    hash_texto = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+    return (formato, radicado, hash_texto, version_plantilla)
+
+
+class CacheArtefactos:
+    """LRU de documentos en bytes con límite de memoria total"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave):
+        """Retorna los bytes del documento, o None si no está"""
+        with self._lock:
+            contenido = self._entradas.get(clave)
+            if contenido is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return contenido
+
+    def guardar(self, clave, contenido):
+        """Guarda un documento, expulsando los menos usados si se supera el límite"""
+        if len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes_usados -= len(anterior)
+            self._entradas[clave] = contenido
+            self.bytes_usados += len(contenido)
+            while self.bytes_usados > self.max_bytes:
+                _, expulsado = self._entradas.popitem(last=False)
+                self.bytes_usados -= len(expulsado)
+
+    def obtener_o_generar(self, clave, generar):
+        """Retorna el documento cacheado o lo genera con generar() y lo guarda"""
+        contenido = self.obtener(clave)
+        if contenido is None:
+            contenido = generar()
+            self.guardar(clave, contenido)
+        return contenido
+
+    def estadisticas(self):
+        """Contadores de uso del cache"""
+        with self._lock:
+            return {
+                'documentos': len(self._entradas),
+                'bytes_usados': self.bytes_usados,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_cache_artefactos():
+    """Retorna el cache de documentos compartido del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = CacheArtefactos(int(configuracion.ARTEFACTOS_MAX_MB * 1024 * 1024))
+    return _instancia
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import configuracion
+
+# ============================================================================
+# CLIENTE BEDROCK COMPARTIDO
+# ============================================================================
+# Streamlit vuelve a ejecutar el script en cada interacción, pero los módulos
+# importados se conservan en memoria. Por eso el cliente vive aquí y no en
+# llm_pt2.py: se crea una sola vez por proceso y lo comparten todas las
+# sesiones. Los clientes de boto3 son seguros para usar desde varios hilos;
+# lo que no es seguro es crearlos en paralelo, de ahí el lock. boto3 se
+# importa al crear el primer cliente, no al cargar la aplicación.
+
+_lock = threading.Lock()
+_clientes = {}
+_creado_en = {}
+_clientes_creados = 0
+
+
+def _config_botocore():
+    """Configuración de pool, keep-alive y timeouts para el cliente"""
+    from botocore.config import Config
+
+    return Config(
+        region_name=configuracion.BEDROCK_REGION,
+        max_pool_connections=configuracion.BEDROCK_MAX_CONEXIONES,
+        connect_timeout=configuracion.BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=configuracion.BEDROCK_READ_TIMEOUT,
+        tcp_keepalive=configuracion.BEDROCK_TCP_KEEPALIVE,
+        # Con la capa de resiliencia activa botocore no reintenta: evita reintentos dobles
+        retries={
+            'max_attempts': 1 if configuracion.RESILIENCIA_HABILITADA else configuracion.BEDROCK_REINTENTOS,
+            'mode': 'standard'
+        }
+    )
+
+
+def obtener_cliente_bedrock(aws_access_key_id=None, aws_secret_access_key=None):
+    """Retorna el cliente bedrock-runtime del proceso, creándolo solo la primera vez"""
+    global _clientes_creados
+
+    clave = (configuracion.BEDROCK_BACKEND, configuracion.BEDROCK_REGION, aws_access_key_id, aws_secret_access_key)
+    cliente = _clientes.get(clave)
+    if cliente is not None:
+        return cliente
+
+    with _lock:
+        cliente = _clientes.get(clave)
+        if cliente is None:
+            if configuracion.BEDROCK_BACKEND == 'stub':
+                # Sustituto local: sin credenciales ni red
+                from bedrock_stub import BedrockStub
+                cliente = BedrockStub()
+            else:
+                import boto3
+
+                # Sesión propia: la sesión por defecto de boto3 no es segura entre hilos
+                sesion = boto3.session.Session(
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key,
+                    region_name=configuracion.BEDROCK_REGION
+                )
+                cliente = sesion.client('bedrock-runtime', config=_config_botocore())
+            _clientes[clave] = cliente
+            _creado_en[clave] = time.time()
+            _clientes_creados += 1
+    return cliente
+
+
+class ClienteBedrockDiferido:
+    """Representa al cliente del proceso y lo crea solo cuando se usa por primera vez"""
+
+    def __init__(self, aws_access_key_id=None, aws_secret_access_key=None):
+        self._credenciales = (aws_access_key_id, aws_secret_access_key)
+
+    def cliente_creado(self):
+        """Retorna el cliente real si ya se creó, sin crearlo"""
+        clave = (configuracion.BEDROCK_BACKEND, configuracion.BEDROCK_REGION) + self._credenciales
+        return _clientes.get(clave)
+
+    def __getattr__(self, nombre):
+        # invoke_model, invoke_model_with_response_stream, etc. del cliente real
+        return getattr(obtener_cliente_bedrock(*self._credenciales), nombre)
+
+
+def estadisticas_pool(cliente):
+    """Retorna estadísticas del pool de conexiones HTTP de un cliente"""
+    estadisticas = {
+        'clientes_creados': _clientes_creados,
+        'max_conexiones': configuracion.BEDROCK_MAX_CONEXIONES,
+        'hosts': 0,
+        'conexiones_abiertas': 0,
+        'conexiones_libres': 0,
+        'solicitudes': 0,
+        'edad_segundos': 0
+    }
+    if isinstance(cliente, ClienteBedrockDiferido):
+        cliente = cliente.cliente_creado()
+    if cliente is None:
+        return estadisticas
+
+    for clave, existente in list(_clientes.items()):
+        if existente is cliente:
+            estadisticas['edad_segundos'] = int(time.time() - _creado_en[clave])
+
+    # botocore no expone el pool públicamente; se lee de urllib3 sin romper si cambia
+    try:
+        manager = cliente._endpoint.http_session._manager
+        for host in list(manager.pools.keys()):
+            pool = manager.pools.get(host)
+            if pool is None:
+                continue
+            estadisticas['hosts'] += 1
+            estadisticas['conexiones_abiertas'] += pool.num_connections
+            estadisticas['solicitudes'] += pool.num_requests
+            estadisticas['conexiones_libres'] += sum(1 for c in list(pool.pool.queue) if c is not None)
+    except Exception:
+        pass
+
+    return estadisticas
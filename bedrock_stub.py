@@ -0,0 +1,219 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+import configuracion
+
+# ============================================================================
+# SUSTITUTO LOCAL DE BEDROCK
+# ============================================================================
+# Implementa invoke_model e invoke_model_with_response_stream con la misma
+# forma de respuesta que Claude en Bedrock (content/usage y eventos de
+# streaming). Simula el cache de prompt: el prefijo hasta el último bloque con
+# cache_control se cuenta como escritura la primera vez y como lectura después.
+#
+# También simula latencia (lognormal hasta el primer token), velocidad de
+# salida en tokens por segundo, ThrottlingException y timeouts de lectura con
+# las mismas excepciones de botocore. Los sorteos de la llamada número N
+# dependen solo de la semilla y de N, así que una corrida se puede repetir.
+
+TEXTO_RESPUESTA = """Reciba un cordial saludo de parte de Veolia Colombia. Hemos recibido su solicitud y agradecemos la confianza que deposita en nosotros.
+
+De acuerdo con lo establecido en la Ley 142 de 1994 y la Resolución CRA 413 de 2006, su caso ha sido revisado por nuestro equipo, que verificó la información de su cuenta y los antecedentes del servicio.
+
+Le informamos que daremos trámite a su solicitud dentro de los términos legales y que cualquier novedad le será comunicada por los canales registrados. Puede comunicarse con nosotros a través de la línea gratuita nacional 01 8000 123 456 o en www.veolia.com.co.
+
+Veolia Colombia reitera su compromiso con la calidad del servicio y el cuidado del medio ambiente."""
+
+
+def estimar_tokens(texto):
+    """Estimación simple de tokens (unos 4 caracteres por token)"""
+    return max(1, len(texto) // 4) if texto else 0
+
+
+def _bloques(valor):
+    """Normaliza un system o content (texto o lista de bloques) a lista de bloques"""
+    if isinstance(valor, str):
+        return [{'type': 'text', 'text': valor}]
+    return list(valor or [])
+
+
+class _Cuerpo:
+    """Imita el StreamingBody de botocore"""
+
+    def __init__(self, contenido):
+        self._contenido = contenido
+
+    def read(self):
+        return self._contenido
+
+
+def _evento(datos):
+    return {'chunk': {'bytes': json.dumps(datos).encode('utf-8')}}
+
+
+class BedrockStub:
+    """Cliente bedrock-runtime local que responde con cuerpos al estilo de Anthropic"""
+
+    def __init__(self, texto_respuesta=TEXTO_RESPUESTA, min_tokens_cache=None, ttl_cache_segundos=None,
+                 latencia_mediana_ms=None, latencia_sigma=None, tokens_por_segundo=None,
+                 tasa_throttling=None, tasa_timeout=None, timeout_segundos=None, semilla=None):
+        def valor(dado, defecto):
+            return defecto if dado is None else dado
+
+        self.texto_respuesta = texto_respuesta
+        self.min_tokens_cache = valor(min_tokens_cache, configuracion.STUB_MIN_TOKENS_CACHE)
+        self.ttl_cache_segundos = valor(ttl_cache_segundos, configuracion.STUB_TTL_CACHE_SEGUNDOS)
+        self.latencia_mediana_ms = valor(latencia_mediana_ms, configuracion.STUB_LATENCIA_MEDIANA_MS)
+        self.latencia_sigma = valor(latencia_sigma, configuracion.STUB_LATENCIA_SIGMA)
+        self.tokens_por_segundo = valor(tokens_por_segundo, configuracion.STUB_TOKENS_POR_SEGUNDO)
+        self.tasa_throttling = valor(tasa_throttling, configuracion.STUB_TASA_THROTTLING)
+        self.tasa_timeout = valor(tasa_timeout, configuracion.STUB_TASA_TIMEOUT)
+        self.timeout_segundos = valor(timeout_segundos, configuracion.STUB_TIMEOUT_SEGUNDOS)
+        self.semilla = valor(semilla, configuracion.STUB_SEMILLA)
+        self._prefijos = {}
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.throttlings = 0
+        self.timeouts = 0
+
+    def estadisticas(self):
+        """Llamadas recibidas y fallos simulados"""
+        with self._lock:
+            return {'llamadas': self.llamadas, 'throttlings': self.throttlings, 'timeouts': self.timeouts}
+
+    def _sortear(self):
+        """Numera la llamada y sortea su latencia y su fallo, si lo hay"""
+        with self._lock:
+            self.llamadas += 1
+            numero = self.llamadas
+        rng = random.Random(f"{self.semilla}:{numero}")
+
+        latencia = 0.0
+        if self.latencia_mediana_ms > 0:
+            latencia = rng.lognormvariate(math.log(self.latencia_mediana_ms / 1000), self.latencia_sigma)
+
+        sorteo = rng.random()
+        fallo = None
+        if sorteo < self.tasa_throttling:
+            fallo = 'throttling'
+        elif sorteo < self.tasa_throttling + self.tasa_timeout:
+            fallo = 'timeout'
+        return numero, latencia, fallo
+
+    def _fallar(self, fallo, operacion, model_id):
+        """Lanza la excepción de botocore que corresponde al fallo sorteado"""
+        from botocore.exceptions import ClientError, ReadTimeoutError
+
+        if fallo == 'throttling':
+            with self._lock:
+                self.throttlings += 1
+            raise ClientError({
+                'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests, please wait before trying again.'},
+                'ResponseMetadata': {'HTTPStatusCode': 429}
+            }, operacion)
+
+        with self._lock:
+            self.timeouts += 1
+        time.sleep(self.timeout_segundos)
+        ruta = 'invoke-with-response-stream' if operacion == 'InvokeModelWithResponseStream' else 'invoke'
+        raise ReadTimeoutError(
+            endpoint_url=f"https://bedrock-runtime.{configuracion.BEDROCK_REGION}.amazonaws.com/model/{model_id}/{ruta}"
+        )
+
+    def _segundos_salida(self, tokens):
+        return tokens / self.tokens_por_segundo if self.tokens_por_segundo > 0 else 0.0
+
+    def _calcular_uso(self, solicitud):
+        """Cuenta tokens de entrada separando lo leído/escrito en el cache de prompt"""
+        bloques = _bloques(solicitud.get('system'))
+        for mensaje in solicitud.get('messages', []):
+            bloques.extend(_bloques(mensaje.get('content')))
+
+        textos = [b.get('text', '') for b in bloques]
+        total = sum(estimar_tokens(t) for t in textos)
+
+        # Prefijo cacheable: hasta el último bloque marcado con cache_control
+        corte = max((i for i, b in enumerate(bloques) if b.get('cache_control')), default=-1)
+        prefijo = "".join(textos[:corte + 1])
+        tokens_prefijo = sum(estimar_tokens(t) for t in textos[:corte + 1])
+
+        uso = {'input_tokens': total, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+        if corte < 0 or tokens_prefijo < self.min_tokens_cache:
+            return uso
+
+        clave = (solicitud.get('_model_id'), hashlib.sha256(prefijo.encode('utf-8')).hexdigest())
+        ahora = time.time()
+        with self._lock:
+            vence = self._prefijos.get(clave)
+            if vence is not None and vence > ahora:
+                uso['cache_read_input_tokens'] = tokens_prefijo
+            else:
+                uso['cache_creation_input_tokens'] = tokens_prefijo
+            # Igual que en Bedrock, cada acierto renueva el TTL
+            self._prefijos[clave] = ahora + self.ttl_cache_segundos
+        uso['input_tokens'] = total - tokens_prefijo
+        return uso
+
+    def _preparar(self, body, model_id, operacion):
+        numero, latencia, fallo = self._sortear()
+        if fallo:
+            self._fallar(fallo, operacion, model_id)
+
+        solicitud = json.loads(body)
+        solicitud['_model_id'] = model_id
+
+        # Se respeta max_tokens recortando el texto
+        max_caracteres = solicitud.get('max_tokens', 4096) * 4
+        texto = self.texto_respuesta[:max_caracteres]
+        uso = self._calcular_uso(solicitud)
+        uso['output_tokens'] = estimar_tokens(texto)
+        razon = 'end_turn' if len(texto) == len(self.texto_respuesta) else 'max_tokens'
+        return numero, latencia, texto, uso, razon
+
+    def invoke_model(self, body, modelId, accept='application/json', contentType='application/json', **kwargs):
+        """Equivalente local de bedrock-runtime.invoke_model"""
+        numero, latencia, texto, uso, razon = self._preparar(body, modelId, 'InvokeModel')
+        # Sin streaming la respuesta llega cuando termina de generarse
+        time.sleep(latencia + self._segundos_salida(uso['output_tokens']))
+        respuesta = {
+            'id': f"msg_stub_{numero}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': modelId,
+            'content': [{'type': 'text', 'text': texto}],
+            'stop_reason': razon,
+            'usage': uso
+        }
+        return {
+            'body': _Cuerpo(json.dumps(respuesta).encode('utf-8')),
+            'contentType': 'application/json'
+        }
+
+    def invoke_model_with_response_stream(self, body, modelId, accept='application/json', contentType='application/json', **kwargs):
+        """Equivalente local de bedrock-runtime.invoke_model_with_response_stream"""
+        numero, latencia, texto, uso, razon = self._preparar(body, modelId, 'InvokeModelWithResponseStream')
+        time.sleep(latencia)
+        return {'body': self._eventos(numero, texto, uso, razon, modelId), 'contentType': 'application/json'}
+
+    def _eventos(self, numero, texto, uso, razon, model_id):
+        uso_inicial = dict(uso, output_tokens=1)
+        pausa = self._segundos_salida(1)
+        yield _evento({'type': 'message_start', 'message': {
+            'id': f"msg_stub_{numero}", 'type': 'message', 'role': 'assistant',
+            'model': model_id, 'content': [], 'usage': uso_inicial
+        }})
+        yield _evento({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+        # Fragmentos del tamaño aproximado de un token
+        for inicio in range(0, len(texto), 4):
+            if pausa:
+                time.sleep(pausa)
+            yield _evento({'type': 'content_block_delta', 'index': 0,
+                           'delta': {'type': 'text_delta', 'text': texto[inicio:inicio + 4]}})
+        yield _evento({'type': 'content_block_stop', 'index': 0})
+        yield _evento({'type': 'message_delta', 'delta': {'stop_reason': razon},
+                       'usage': {'output_tokens': uso['output_tokens']}})
+        yield _evento({'type': 'message_stop'})
@@ -0,0 +1,160 @@
+"""Tiempo de arranque en frío y memoria de la aplicación
+
+Mide, en procesos nuevos:
+  1. El costo de importación de los módulos que llm_pt2.py importa al cargar
+     (python -X importtime), agrupado por paquete de primer nivel.
+  2. La primera ejecución completa de llm_pt2.py con AppTest (backend stub):
+     tiempo, memoria residente máxima del proceso y librerías pesadas cargadas.
+
+Con --precargar también se mide el arranque importando antes las librerías
+pesadas, como hacía la aplicación cuando las importaba todas al inicio.
+Con --guardar el resultado se agrega a benchmarks/historial_arranque.jsonl
+para seguir la evolución entre commits.
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 5 --precargar --guardar
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APLICACION = os.path.join(RAIZ, 'llm_pt2.py')
+HISTORIAL = os.path.join(RAIZ, 'benchmarks', 'historial_arranque.jsonl')
+
+LIBRERIAS_PESADAS = ('pandas', 'numpy', 'plotly', 'boto3', 'botocore', 'docx', 'reportlab', 'PIL')
+
+SCRIPT_APLICACION = """
+import json, resource, sys, time
+inicio = time.perf_counter()
+for modulo in {precarga!r}:
+    __import__(modulo)
+from streamlit.testing.v1 import AppTest
+prueba = AppTest.from_file({aplicacion!r}, default_timeout=120)
+prueba.run()
+segundos = time.perf_counter() - inicio
+print(json.dumps({{
+    'segundos': segundos,
+    'rss_max_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'excepciones': len(prueba.exception),
+    'pesadas_cargadas': [m for m in {pesadas!r} if m in sys.modules]
+}}))
+"""
+
+
+def _modulos_importados(ruta):
+    """Módulos que un script importa a nivel de módulo"""
+    with open(ruta, encoding='utf-8') as archivo:
+        arbol = ast.parse(archivo.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos.extend(alias.name for alias in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module and not nodo.level:
+            modulos.append(nodo.module)
+    return list(dict.fromkeys(modulos))
+
+
+def _entorno(directorio_datos):
+    entorno = dict(os.environ, PQRS_BEDROCK_BACKEND='stub', PQRS_DATOS_DIR=directorio_datos)
+    entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [RAIZ, entorno.get('PYTHONPATH')]))
+    return entorno
+
+
+def medir_importaciones(directorio_datos):
+    """Microsegundos acumulados por paquete de primer nivel al importar los módulos del arranque"""
+    modulos = _modulos_importados(APLICACION)
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {', '.join(modulos)}"],
+        capture_output=True, text=True, cwd=RAIZ, env=_entorno(directorio_datos), check=True
+    )
+    por_paquete = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea.split(':', 1)[1].split('|')
+        # Solo las importaciones de primer nivel (sin sangría) cuentan su árbol completo
+        if nombre.startswith(' ') and not nombre.startswith('  '):
+            paquete = nombre.strip().split('.')[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + int(acumulado)
+    return por_paquete
+
+
+def medir_aplicacion(directorio_datos, precarga=()):
+    """Primera ejecución de la aplicación en un proceso nuevo"""
+    script = SCRIPT_APLICACION.format(precarga=tuple(precarga), aplicacion=APLICACION, pesadas=LIBRERIAS_PESADAS)
+    proceso = subprocess.run(
+        [sys.executable, '-c', script],
+        capture_output=True, text=True, cwd=RAIZ, env=_entorno(directorio_datos), check=True
+    )
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def _resumir(mediciones):
+    return {
+        'segundos_mediana': statistics.median(m['segundos'] for m in mediciones),
+        'rss_max_mb_mediana': statistics.median(m['rss_max_mb'] for m in mediciones),
+        'excepciones': max(m['excepciones'] for m in mediciones),
+        'pesadas_cargadas': mediciones[-1]['pesadas_cargadas']
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=RAIZ, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--precargar', action='store_true',
+                        help='medir también importando antes las librerías pesadas')
+    parser.add_argument('--guardar', action='store_true', help=f'agregar el resultado a {HISTORIAL}')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio_datos:
+        importaciones = medir_importaciones(directorio_datos)
+        resultado = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_actual(),
+            'python': sys.version.split()[0],
+            'importacion_ms': round(sum(importaciones.values()) / 1000, 1),
+            'importacion_por_paquete_ms': {
+                paquete: round(microsegundos / 1000, 1)
+                for paquete, microsegundos in sorted(importaciones.items(), key=lambda p: -p[1])[:10]
+            },
+            'diferida': _resumir([medir_aplicacion(directorio_datos) for _ in range(args.repeticiones)])
+        }
+        if args.precargar:
+            resultado['precargando'] = _resumir([
+                medir_aplicacion(directorio_datos, LIBRERIAS_PESADAS) for _ in range(args.repeticiones)
+            ])
+
+    print(f"Importación de los módulos del arranque: {resultado['importacion_ms']:,.1f} ms")
+    for paquete, milisegundos in resultado['importacion_por_paquete_ms'].items():
+        print(f"  {paquete:<30}{milisegundos:>10,.1f} ms")
+    for nombre in ('diferida', 'precargando'):
+        if nombre not in resultado:
+            continue
+        medicion = resultado[nombre]
+        print(f"Primera ejecución ({nombre}): {medicion['segundos_mediana']:.2f} s, "
+              f"RSS máx. {medicion['rss_max_mb_mediana']:.0f} MB, "
+              f"pesadas cargadas: {', '.join(medicion['pesadas_cargadas']) or 'ninguna'}")
+
+    if args.guardar:
+        with open(HISTORIAL, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        print(f"Resultado agregado a {os.path.relpath(HISTORIAL, RAIZ)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Búsqueda de texto completo: costo de indexar y latencia de consultas
+
+Inserta N PQRS sintéticas con cartas armadas de frases típicas (los
+triggers mantienen el índice FTS en cada inserción, como en producción) y
+mide consultas de términos raros, frecuentes, frases, prefijos y con
+filtros, sin el cache de consultas. Reporta también el tamaño del índice.
+
+Uso:
+    python benchmarks/bench_busqueda.py --filas 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuracion
+from almacen_pqrs import AlmacenPQRS
+
+FRASES = [
+    "En atención a su solicitud radicada, le informamos que hemos revisado el estado de su cuenta.",
+    "De acuerdo con la Resolución CRA {n} de {anio}, el prestador debe verificar el funcionamiento del medidor.",
+    "Se programó una visita técnica para revisar el medidor {medidor} instalado en su predio.",
+    "El consumo facturado corresponde a la lectura registrada en el periodo de {mes}.",
+    "Hemos identificado una posible fuga interna; le recomendamos revisar las instalaciones.",
+    "Conforme al artículo {n} de la Ley 142 de 1994, usted puede interponer recurso de reposición.",
+    "Agradecemos su sugerencia sobre los canales de atención, que será evaluada por el área de servicio.",
+    "La suspensión del servicio obedeció a trabajos de mantenimiento en la red de acueducto.",
+    "Se realizó el ajuste en la factura por valor de ${valor} a favor del suscriptor.",
+    "Lamentamos los inconvenientes ocasionados por la demora en la reconexión del servicio.",
+]
+MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'octubre']
+NOMBRES = ['José Pérez', 'Ana Gómez', 'Luis Rodríguez', 'María Fernández', 'Carlos Muñoz', 'Lucía Ramírez']
+CALLES = ['Calle', 'Carrera', 'Avenida', 'Diagonal', 'Transversal']
+
+
+def _carta(aleatorio, medidor):
+    frases = aleatorio.sample(FRASES, 5)
+    return ' '.join(f.format(n=aleatorio.randint(100, 999), anio=aleatorio.randint(1995, 2024), medidor=medidor,
+                             mes=aleatorio.choice(MESES), valor=aleatorio.randint(10, 900) * 1000)
+                    for f in frases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+    configuracion.HISTORIAL_CACHE_TTL_SEGUNDOS = 0
+    aleatorio = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'pqrs.sqlite3')
+        almacen = AlmacenPQRS(ruta)
+        conexion = almacen._conexion()
+        inicio_fechas = datetime(2025, 1, 1)
+
+        inicio = time.perf_counter()
+        conexion.execute("BEGIN")
+        for i in range(args.filas):
+            medidor = f"MED-{i:07d}"
+            conexion.execute(
+                """INSERT INTO pqrs (radicado, fecha, tipo, numero_contrato, nombre_cliente, direccion,
+                                     numero_medidor, datos_cliente, texto, estado, desde_cache)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, '{}', ?, 'Completada', 0)""",
+                (f"VEO-{'PQRS'[i % 4]}-{i:09d}", (inicio_fechas + timedelta(seconds=i * 60)).strftime('%Y-%m-%d %H:%M:%S'),
+                 'PQRS'[i % 4], f"{1000000000 + i % 50000}", aleatorio.choice(NOMBRES),
+                 f"{aleatorio.choice(CALLES)} {aleatorio.randint(1, 200)} # {aleatorio.randint(1, 99)}-{aleatorio.randint(1, 99)}",
+                 medidor, _carta(aleatorio, medidor))
+            )
+            if i % 10000 == 9999:
+                conexion.execute("COMMIT")
+                conexion.execute("BEGIN")
+        conexion.execute("COMMIT")
+        segundos = time.perf_counter() - inicio
+        print(f"{args.filas} PQRS insertadas e indexadas en {segundos:.1f} s "
+              f"({args.filas / segundos:.0f}/s), base de {os.path.getsize(ruta) / 1e6:.0f} MB")
+
+        desde, hasta = date(2000, 1, 1), date.today() + timedelta(days=3650)
+        consultas = {
+            'medidor exacto': ('MED-0012345', {}),
+            'radicado': (f"VEO-R-{args.filas // 2 + 2:09d}", {}),
+            'frase rara': ('"Resolución CRA 413"', {}),
+            'frase rara + tipo': ('"Resolución CRA 413"', {'tipos': ['R']}),
+            'nombre y calle': ('jose perez carrera', {}),
+            'prefijo': ('reconex*', {}),
+            'muy frecuente': ('servicio', {}),
+            'frecuente + mes': ('servicio', {'fecha_inicio': date(2025, 3, 1), 'fecha_fin': date(2025, 3, 31)}),
+        }
+        print(f"{'consulta':>20}{'resultados':>12}{'p50 ms':>9}{'máx ms':>9}")
+        for nombre, (texto, filtros) in consultas.items():
+            filtros = dict({'fecha_inicio': desde, 'fecha_fin': hasta}, **filtros)
+            tiempos = []
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                resultados = almacen.buscar(texto, **filtros, limite=configuracion.BUSQUEDA_MAX_RESULTADOS)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            print(f"{nombre:>20}{len(resultados):>12}{tiempos[len(tiempos) // 2]:>9.1f}{tiempos[-1]:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Casos similares: carga del índice, latencia por consulta y llamadas a Bedrock evitadas
+
+Llena un almacén temporal con N PQRS resueltas de clientes sintéticos (la
+carta cita los datos del cliente, como las del modelo), carga el índice
+como al arrancar y luego consulta --consultas clientes nuevos con el mismo
+camino que el generador: top-k, lectura del caso y carta adaptada. Reporta
+la memoria de los vectores, los percentiles por consulta y qué fracción
+tendría una carta para ofrecer al agente (reutilizable), un ejemplo para el
+prompt o ningún caso.
+
+Uso:
+    python benchmarks/bench_casos.py --filas 80000 --consultas 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuracion
+from almacen_pqrs import AlmacenPQRS
+from casos_similares import IndiceCasos, personalizar_carta
+from clientes_sinteticos import cliente_desde_columnas, generar_clientes_masivo, generar_contexto_pqrs
+
+TIPOS = 'PQRS'
+
+
+def _carta(tipo, cliente, radicado):
+    return (f"Bogotá, 5 de octubre de 2026\n\nRadicado: {radicado}\n\nRespetado(a) {cliente['nombre_completo']}, "
+            f"identificado(a) con cédula {cliente['cedula']} y contrato {cliente['numero_contrato']}:\n\n"
+            f"En atención a su solicitud: {' '.join(generar_contexto_pqrs(tipo, cliente).split())}\n\n"
+            "De acuerdo con la Ley 142 de 1994 y la Resolución CRA 413 de 2006, le daremos respuesta "
+            "en un término de 15 días hábiles.\n\nAtentamente,\nServicio al Cliente - Veolia Colombia")
+
+
+def _llenar(almacen, filas):
+    columnas = generar_clientes_masivo(filas, semilla=1)
+    inicio = datetime(2025, 1, 1)
+    conexion = almacen._conexion()
+    conexion.execute("BEGIN")
+    for i in range(filas):
+        cliente = cliente_desde_columnas(columnas, i)
+        tipo = TIPOS[i % 4]
+        radicado = f"VEO-{tipo}-{i:09d}"
+        almacen.guardar_pqrs({'radicado': radicado, 'fecha': inicio + timedelta(seconds=i * 60), 'tipo': tipo,
+                              'datos_cliente': cliente, 'texto': _carta(tipo, cliente, radicado),
+                              'estado': 'Completada', 'tiempo_total_ms': 9000})
+    conexion.execute("COMMIT")
+
+
+def _percentil(ordenados, fraccion):
+    return ordenados[min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=80000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--max-por-tipo', type=int, default=configuracion.CASOS_MAX_POR_TIPO)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenPQRS(os.path.join(directorio, 'pqrs.sqlite3'))
+        _llenar(almacen, args.filas)
+
+        indice = IndiceCasos(almacen, max_por_tipo=args.max_por_tipo, n_features=configuracion.CASOS_N_FEATURES)
+        inicio = time.perf_counter()
+        cargados = indice.actualizar()
+        segundos = time.perf_counter() - inicio
+        for tipo in TIPOS:
+            indice.similares(tipo, cliente_desde_columnas(generar_clientes_masivo(1, semilla=2), 0), k=0)
+        bytes_vectores = sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in indice._matrices.values())
+        print(f"{cargados} casos cargados en {segundos:.1f} s ({cargados / segundos:.0f}/s), "
+              f"{indice.estadisticas()['casos']} en el índice, vectores {bytes_vectores / 1e6:.1f} MB")
+
+        nuevos = generar_clientes_masivo(args.consultas, semilla=3)
+        tiempos = []
+        resultados = {'reutilizable': 0, 'ejemplo': 0, 'sin caso': 0}
+        for i in range(args.consultas):
+            cliente = cliente_desde_columnas(nuevos, i)
+            tipo = TIPOS[i % 4]
+            inicio = time.perf_counter()
+            resultado = 'sin caso'
+            for candidato in indice.similares(tipo, cliente, configuracion.CASOS_TOP_K):
+                if candidato['similitud'] < configuracion.CASOS_UMBRAL_EJEMPLO:
+                    break
+                if personalizar_carta(almacen.obtener(candidato['radicado']), cliente, f"VEO-{tipo}-NUEVO") is None:
+                    continue
+                reutilizable = candidato['similitud'] >= configuracion.CASOS_UMBRAL_REUTILIZAR
+                resultado = 'reutilizable' if reutilizable else 'ejemplo'
+                break
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[resultado] += 1
+
+        tiempos.sort()
+        print(f"consulta: p50 {_percentil(tiempos, 0.5):.2f} ms, p95 {_percentil(tiempos, 0.95):.2f} ms, "
+              f"máx {tiempos[-1]:.2f} ms")
+        print(' · '.join(f"{nombre}: {cantidad / args.consultas:.0%}" for nombre, cantidad in resultados.items())
+              + f"  (umbrales {configuracion.CASOS_UMBRAL_REUTILIZAR:g} / {configuracion.CASOS_UMBRAL_EJEMPLO:g})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Lote contra el sustituto de Bedrock con latencia y fallos simulados
+
+Procesa N filas con procesar_lote para varios tamaños de pool y reporta
+filas por segundo, percentiles de latencia por fila y errores por tipo.
+La latencia, la velocidad de salida y las tasas de throttling y timeout
+del sustituto son argumentos; con la misma semilla cada corrida sortea
+los mismos fallos y latencias. Con --resiliencia las llamadas pasan por la
+capa de reintentos, límite AIMD y circuit breaker.
+
+Uso:
+    python benchmarks/bench_concurrencia.py --filas 200 --workers 1 4 8 16 \\
+        --latencia-ms 800 --tokens-por-segundo 400 --throttling 0.05 --timeout 0.01 --resiliencia
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_stub import BedrockStub
+from generador_pqrs import VeoliaPQRSGenerator
+from lote_pqrs import procesar_lote
+from radicados import GeneradorRadicados
+from resiliencia import ResilienciaBedrock
+
+
+def _percentil(ordenados, fraccion):
+    return ordenados[min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))]
+
+
+def _tipo_error(error):
+    if 'ThrottlingException' in error:
+        return 'throttling'
+    if 'timeout' in error.lower():
+        return 'timeout'
+    return 'otro'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--latencia-ms', type=float, default=500.0, help='mediana hasta el primer token')
+    parser.add_argument('--sigma', type=float, default=0.5, help='dispersión lognormal de la latencia')
+    parser.add_argument('--tokens-por-segundo', type=float, default=0.0)
+    parser.add_argument('--throttling', type=float, default=0.0, help='fracción de llamadas con ThrottlingException')
+    parser.add_argument('--timeout', type=float, default=0.0, help='fracción de llamadas con timeout de lectura')
+    parser.add_argument('--timeout-segundos', type=float, default=1.0)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--resiliencia', action='store_true', help='reintentos, límite AIMD y circuit breaker')
+    args = parser.parse_args()
+
+    filas = [{'fila': i + 1, 'tipo': 'PQRS'[i % 4], 'numero_contrato': f"{1000000000 + i}"}
+             for i in range(args.filas)]
+
+    print(f"{'workers':>8}{'filas/s':>10}{'p50 s':>9}{'p95 s':>9}{'máx s':>9}"
+          f"{'throttling':>12}{'timeout':>9}{'otros':>7}{'reintentos':>12}{'límite':>8}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for workers in args.workers:
+            stub = BedrockStub(
+                latencia_mediana_ms=args.latencia_ms,
+                latencia_sigma=args.sigma,
+                tokens_por_segundo=args.tokens_por_segundo,
+                tasa_throttling=args.throttling,
+                tasa_timeout=args.timeout,
+                timeout_segundos=args.timeout_segundos,
+                semilla=args.semilla
+            )
+            resiliencia = ResilienciaBedrock() if args.resiliencia else None
+            generador = VeoliaPQRSGenerator(
+                stub,
+                radicados=GeneradorRadicados(os.path.join(directorio, f"radicados_{workers}.sqlite3")),
+                resiliencia=resiliencia
+            )
+
+            inicio = time.perf_counter()
+            resultados = list(procesar_lote(generador, filas, max_workers=workers))
+            segundos = time.perf_counter() - inicio
+
+            latencias = sorted(r['segundos'] for r in resultados)
+            errores = {'throttling': 0, 'timeout': 0, 'otro': 0}
+            for resultado in resultados:
+                if resultado['error']:
+                    errores[_tipo_error(resultado['error'])] += 1
+            print(f"{workers:>8}{len(resultados) / segundos:>10.1f}{_percentil(latencias, 0.5):>9.2f}"
+                  f"{_percentil(latencias, 0.95):>9.2f}{latencias[-1]:>9.2f}"
+                  f"{errores['throttling']:>12}{errores['timeout']:>9}{errores['otro']:>7}", end='')
+            if resiliencia is not None:
+                metricas = resiliencia.metricas()
+                print(f"{metricas['reintentos']:>12}{metricas['limite_concurrencia']:>8g}")
+            else:
+                print(f"{'-':>12}{'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
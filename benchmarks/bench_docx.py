@@ -0,0 +1,68 @@
+"""Benchmark de generación de documentos Word
+
+Compara documentos por segundo entre generar_documento_word (árbol
+python-docx completo) y el renderizador por plantilla de plantilla_word, y
+verifica que ambos produzcan las mismas partes del paquete .docx.
+
+Uso:
+    python benchmarks/bench_docx.py --documentos 300
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_stub import TEXTO_RESPUESTA
+from generador_pqrs import VeoliaPQRSGenerator, VERSION_PLANTILLA_WORD
+from plantilla_word import obtener_plantilla_word, renderizar_documento_word
+
+
+def _medir(nombre, cantidad, generar):
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        generar(i)
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:<28} {cantidad / duracion:>10,.1f} docs/s   {duracion / cantidad * 1000:>8.2f} ms/doc")
+    return cantidad / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documentos', type=int, default=300)
+    args = parser.parse_args()
+
+    generador = VeoliaPQRSGenerator()
+    clientes = [generador.generar_datos_cliente(str(1000000000 + i)) for i in range(50)]
+    radicados = [f"VEO-{'PQRS'[i % 4]}-20250101-120000-{i:06d}" for i in range(50)]
+
+    inicio = time.perf_counter()
+    obtener_plantilla_word(generador, VERSION_PLANTILLA_WORD)
+    print(f"Compilación de plantilla (una vez por proceso): {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    # Mismo resultado en ambos caminos
+    docx_completo = generador.generar_documento_word(TEXTO_RESPUESTA, radicados[0], clientes[0]).getvalue()
+    docx_plantilla = renderizar_documento_word(generador, VERSION_PLANTILLA_WORD, TEXTO_RESPUESTA,
+                                               radicados[0], clientes[0])
+    paquete_completo = zipfile.ZipFile(io.BytesIO(docx_completo))
+    paquete_plantilla = zipfile.ZipFile(io.BytesIO(docx_plantilla))
+    identico = (sorted(paquete_completo.namelist()) == sorted(paquete_plantilla.namelist()) and all(
+        paquete_completo.read(parte) == paquete_plantilla.read(parte) for parte in paquete_completo.namelist()
+    ))
+    print(f"Partes del paquete idénticas: {'sí' if identico else 'NO'}")
+
+    base = _medir("python-docx (actual)", args.documentos, lambda i: generador.generar_documento_word(
+        TEXTO_RESPUESTA, radicados[i % 50], clientes[i % 50]).getvalue())
+    nuevo = _medir("plantilla + parche XML", args.documentos, lambda i: renderizar_documento_word(
+        generador, VERSION_PLANTILLA_WORD, TEXTO_RESPUESTA, radicados[i % 50], clientes[i % 50]))
+    print(f"Aceleración: {nuevo / base:.1f}x")
+
+    if not identico:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
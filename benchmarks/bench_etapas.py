@@ -0,0 +1,193 @@
+"""Microbenchmarks de cada etapa del pipeline PQRS
+
+Ejecuta cada etapa sin Streamlit, con datos realistas y Bedrock sustituido
+por bedrock_stub, y reporta operaciones por segundo y percentiles de
+latencia. Los resultados se pueden guardar como línea base en JSON y
+comparar contra ella: con --comparar el proceso termina con código 1 si la
+mediana de alguna etapa empeora más que la tolerancia.
+
+Uso:
+    python benchmarks/bench_etapas.py
+    python benchmarks/bench_etapas.py --guardar benchmarks/baseline.json
+    python benchmarks/bench_etapas.py --comparar benchmarks/baseline.json --tolerancia 1.5
+    python benchmarks/bench_etapas.py --etapas datos_cliente construir_body
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Antes de importar configuracion: nada de lo que se mida debe tocar datos/
+_DIRECTORIO_DATOS = tempfile.mkdtemp(prefix='bench_etapas_')
+atexit.register(shutil.rmtree, _DIRECTORIO_DATOS, ignore_errors=True)
+os.environ['PQRS_DATOS_DIR'] = _DIRECTORIO_DATOS
+os.environ['PQRS_BEDROCK_BACKEND'] = 'stub'
+
+import configuracion
+from bedrock_stub import BedrockStub, TEXTO_RESPUESTA
+from generador_pqrs import VERSION_PLANTILLA_WORD, VeoliaPQRSGenerator
+from graficas import crear_grafica_consumos
+from plantilla_word import renderizar_documento_word
+from radicados import GeneradorRadicados
+
+CONTRATOS = [f"{1000000000 + i * 7919}" for i in range(500)]
+TIPOS = 'PQRS'
+
+
+def _percentil(ordenados, fraccion):
+    return ordenados[min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))]
+
+
+def medir(funcion, iteraciones, calentamiento):
+    """Llama funcion(i) y retorna las latencias por llamada en segundos"""
+    for i in range(calentamiento):
+        funcion(i)
+    latencias = []
+    for i in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion(i)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def resumir(latencias):
+    ordenadas = sorted(latencias)
+    return {
+        'iteraciones': len(latencias),
+        'ops_por_segundo': round(len(latencias) / sum(latencias), 1),
+        'p50_ms': round(_percentil(ordenadas, 0.50) * 1000, 4),
+        'p90_ms': round(_percentil(ordenadas, 0.90) * 1000, 4),
+        'p99_ms': round(_percentil(ordenadas, 0.99) * 1000, 4),
+        'max_ms': round(ordenadas[-1] * 1000, 4)
+    }
+
+
+def construir_etapas():
+    """Retorna {nombre: (funcion(i), factor de iteraciones)} con sus datos ya preparados"""
+    generador = VeoliaPQRSGenerator(
+        BedrockStub(),
+        logo_path=configuracion.LOGO_PATH,
+        radicados=GeneradorRadicados(os.path.join(_DIRECTORIO_DATOS, 'radicados.sqlite3'))
+    )
+    clientes = [generador.generar_datos_cliente(c) for c in CONTRATOS]
+    radicados = [f"VEO-{TIPOS[i % 4]}-20240101-000000-{i:06d}" for i in range(len(CONTRATOS))]
+    respuesta_bedrock = BedrockStub().invoke_model(
+        body=generador.construir_body('P', clientes[0], radicados[0]), modelId=generador.model_id
+    )['body'].read()
+
+    def cliente(i):
+        return clientes[i % len(clientes)]
+
+    def radicado(i):
+        return radicados[i % len(radicados)]
+
+    def respuesta_stream(i):
+        streaming = generador.generar_respuesta_bedrock_stream(TIPOS[i % 4], cliente(i))
+        for _ in streaming:
+            pass
+        return streaming.resultado()
+
+    # El factor reduce las iteraciones de las etapas lentas
+    return {
+        'datos_cliente': (lambda i: generador.generar_datos_cliente(CONTRATOS[i % len(CONTRATOS)]), 1.0),
+        'contexto_pqrs': (lambda i: generador.generar_contexto_pqrs(TIPOS[i % 4], cliente(i)), 1.0),
+        'construir_body': (lambda i: generador.construir_body(TIPOS[i % 4], cliente(i), radicado(i)), 1.0),
+        'json_decodificar_respuesta': (lambda i: json.loads(respuesta_bedrock), 1.0),
+        'bedrock_stub_invoke': (lambda i: generador.generar_respuesta_bedrock(TIPOS[i % 4], cliente(i)), 0.2),
+        'bedrock_stub_stream': (respuesta_stream, 0.2),
+        'documento_word_python_docx': (
+            lambda i: generador.generar_documento_word(TEXTO_RESPUESTA, radicado(i), cliente(i)), 0.05
+        ),
+        'documento_word_plantilla': (
+            lambda i: renderizar_documento_word(generador, VERSION_PLANTILLA_WORD, TEXTO_RESPUESTA,
+                                                radicado(i), cliente(i)), 0.2
+        ),
+        'documento_pdf': (
+            lambda i: generador.escribir_documento_pdf(BytesIO(), TEXTO_RESPUESTA, radicado(i), cliente(i)), 0.05
+        ),
+        'grafica_consumos': (lambda i: crear_grafica_consumos(cliente(i)), 0.05),
+        # Lo que st.plotly_chart serializa en cada rerun
+        'grafica_consumos_json': (lambda i: crear_grafica_consumos(cliente(i)).to_json(), 0.05)
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=RAIZ, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(resultado, ruta_base, tolerancia):
+    """Imprime la comparación con la línea base y retorna las etapas que empeoraron"""
+    with open(ruta_base, encoding='utf-8') as archivo:
+        base = json.load(archivo)['etapas']
+    regresiones = []
+    print(f"\nComparación con {os.path.relpath(ruta_base, RAIZ)} (p50 actual / p50 base):")
+    for nombre, medicion in resultado['etapas'].items():
+        if nombre not in base:
+            continue
+        razon = medicion['p50_ms'] / base[nombre]['p50_ms'] if base[nombre]['p50_ms'] else 1.0
+        marca = '  REGRESIÓN' if razon > tolerancia else ''
+        print(f"  {nombre:<30}{razon:>8.2f}x{marca}")
+        if razon > tolerancia:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iteraciones', type=int, default=2000, help='iteraciones de las etapas rápidas')
+    parser.add_argument('--etapas', nargs='*', help='solo estas etapas')
+    parser.add_argument('--guardar', help='ruta del JSON donde guardar el resultado')
+    parser.add_argument('--comparar', help='ruta de la línea base JSON')
+    parser.add_argument('--tolerancia', type=float, default=1.5,
+                        help='razón máxima de p50 frente a la línea base antes de marcar regresión')
+    args = parser.parse_args()
+
+    etapas = construir_etapas()
+    seleccion = args.etapas or list(etapas)
+    desconocidas = set(seleccion) - set(etapas)
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': sys.version.split()[0],
+        'plataforma': platform.platform(),
+        'etapas': {}
+    }
+    print(f"{'etapa':<30}{'ops/s':>12}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'máx ms':>11}")
+    for nombre in seleccion:
+        funcion, factor = etapas[nombre]
+        iteraciones = max(20, int(args.iteraciones * factor))
+        medicion = resumir(medir(funcion, iteraciones, calentamiento=max(3, iteraciones // 20)))
+        resultado['etapas'][nombre] = medicion
+        print(f"{nombre:<30}{medicion['ops_por_segundo']:>12,.1f}{medicion['p50_ms']:>11.3f}"
+              f"{medicion['p90_ms']:>11.3f}{medicion['p99_ms']:>11.3f}{medicion['max_ms']:>11.3f}")
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+            archivo.write('\n')
+        print(f"\nResultado guardado en {args.guardar}")
+
+    if args.comparar and comparar(resultado, args.comparar, args.tolerancia):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
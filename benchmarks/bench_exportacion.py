@@ -0,0 +1,85 @@
+"""Exportación del historial: filas por segundo y memoria pico por formato
+
+Llena un almacén temporal con N PQRS sintéticas (con texto de carta) y
+exporta todo el rango en cada formato con el mismo camino que la interfaz
+(bloques paginados por (fecha, id) y escritura en streaming). Con
+--memoria se mide la memoria pico con tracemalloc, que no debería crecer con
+--filas; tracemalloc hace más lentas las asignaciones, así que los tiempos
+de esa corrida no son comparables.
+
+Uso:
+    python benchmarks/bench_exportacion.py --filas 200000 --formatos xlsx csv parquet
+    python benchmarks/bench_exportacion.py --filas 200000 --memoria
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuracion
+from almacen_pqrs import AlmacenPQRS
+from exportacion_historial import Exportacion, exportar, formatos_disponibles
+
+TEXTO = ("Respetado(a) cliente, en atención a su solicitud le informamos que hemos revisado "
+         "el estado de su cuenta y los consumos registrados en el periodo. ") * 12
+
+
+def _llenar(almacen, filas):
+    inicio = datetime(2025, 1, 1)
+    conexion = almacen._conexion()
+    conexion.execute("BEGIN")
+    conexion.executemany(
+        """INSERT INTO pqrs (radicado, fecha, tipo, numero_contrato, nombre_cliente, direccion, numero_medidor,
+                             datos_cliente, texto, modelo, estado, desde_cache, tiempo_total_ms)
+           VALUES (?, ?, ?, ?, ?, ?, ?, '{}', ?, 'stub', 'Completada', 0, ?)""",
+        ((f"VEO-{'PQRS'[i % 4]}-{i:09d}", (inicio + timedelta(seconds=i * 97)).strftime('%Y-%m-%d %H:%M:%S'),
+          'PQRS'[i % 4], f"{1000000000 + i}", f"Cliente {i}", f"Calle {i % 200} # {i % 90}-{i % 50}",
+          f"MED-{i:08d}", TEXTO, 800 + i % 5000) for i in range(filas))
+    )
+    conexion.execute("COMMIT")
+    return inicio.date(), (inicio + timedelta(seconds=filas * 97)).date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--formatos', nargs='+', default=formatos_disponibles())
+    parser.add_argument('--sin-texto', action='store_true', help='excluye la columna con la carta')
+    parser.add_argument('--memoria', action='store_true', help='mide la memoria pico con tracemalloc')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configuracion.EXPORTACION_DIR = directorio
+        almacen = AlmacenPQRS(os.path.join(directorio, 'pqrs.sqlite3'))
+        desde, hasta = _llenar(almacen, args.filas)
+        total = almacen.contar_historial(desde, hasta)
+
+        print(f"{'formato':>9}{'filas':>10}{'segundos':>10}{'filas/s':>10}{'MB':>8}{'pico MB':>9}")
+        for formato in args.formatos:
+            exportacion = Exportacion(formato, total, f"historial.{formato}")
+            if args.memoria:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            exportar(almacen, {'fecha_inicio': desde, 'fecha_fin': hasta}, formato, exportacion,
+                     incluir_texto=not args.sin_texto)
+            segundos = time.perf_counter() - inicio
+            pico = None
+            if args.memoria:
+                pico = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+            if exportacion.error:
+                print(f"{formato:>9}  {exportacion.error}")
+                continue
+            print(f"{formato:>9}{exportacion.filas:>10}{segundos:>10.1f}{exportacion.filas / segundos:>10.0f}"
+                  f"{os.path.getsize(exportacion.ruta) / 1e6:>8.1f}"
+                  f"{f'{pico:.1f}' if pico is not None else '-':>9}")
+            exportacion.descartar()
+
+
+if __name__ == '__main__':
+    main()
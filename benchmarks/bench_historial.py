@@ -0,0 +1,89 @@
+"""Páginas del historial: latencia por página según filtros y tamaño del historial
+
+Llena un almacén temporal con N PQRS sintéticas y recorre las primeras
+--paginas páginas (cursor a cursor, como los botones de la interfaz) con
+varias combinaciones de filtros, sin el cache de consultas. Reporta el
+tiempo del conteo y los percentiles por página; ninguno debería crecer con
+--filas.
+
+Uso:
+    python benchmarks/bench_historial.py --filas 500000 --paginas 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuracion
+from almacen_pqrs import AlmacenPQRS
+
+CONTRATOS = 20000
+
+
+def _llenar(almacen, filas):
+    inicio = datetime(2025, 1, 1)
+    conexion = almacen._conexion()
+    conexion.execute("BEGIN")
+    conexion.executemany(
+        """INSERT INTO pqrs (radicado, fecha, tipo, numero_contrato, nombre_cliente, datos_cliente,
+                             estado, desde_cache, tiempo_total_ms)
+           VALUES (?, ?, ?, ?, ?, '{}', ?, 0, ?)""",
+        ((f"VEO-{'PQRS'[i % 4]}-{i:09d}", (inicio + timedelta(seconds=i * 60)).strftime('%Y-%m-%d %H:%M:%S'),
+          'PQRS'[i % 4], f"{1000000000 + i % CONTRATOS}", f"Cliente {i}",
+          'Error' if i % 50 == 0 else 'Completada', 800 + i % 5000) for i in range(filas))
+    )
+    conexion.execute("COMMIT")
+    return inicio.date(), (inicio + timedelta(seconds=filas * 60)).date()
+
+
+def _percentil(ordenados, fraccion):
+    return ordenados[min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--paginas', type=int, default=50)
+    parser.add_argument('--tamano', type=int, default=configuracion.HISTORIAL_TAMANO_PAGINA)
+    args = parser.parse_args()
+    # Sin cache: cada página y cada conteo van a SQLite
+    configuracion.HISTORIAL_CACHE_TTL_SEGUNDOS = 0
+
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenPQRS(os.path.join(directorio, 'pqrs.sqlite3'))
+        desde, hasta = _llenar(almacen, args.filas)
+        casos = {
+            'todo': {},
+            'un tipo': {'tipos': ['Q']},
+            'solo errores': {'estados': ['Error']},
+            'contrato': {'numero_contrato': f"{1000000000 + 7}"},
+            'último mes': {'fecha_inicio': hasta - timedelta(days=30)}
+        }
+
+        print(f"{'filtro':>14}{'total':>10}{'conteo ms':>11}{'páginas':>9}{'p50 ms':>8}{'p95 ms':>8}{'máx ms':>8}")
+        for nombre, filtro in casos.items():
+            filtros = dict({'fecha_inicio': desde, 'fecha_fin': hasta}, **filtro)
+            inicio = time.perf_counter()
+            total = almacen.contar_historial(**filtros)
+            conteo_ms = (time.perf_counter() - inicio) * 1000
+
+            tiempos = []
+            cursor = None
+            for _ in range(args.paginas):
+                inicio = time.perf_counter()
+                pagina = almacen.pagina_historial(**filtros, despues_de=cursor, tamano=args.tamano)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                cursor = pagina['siguiente']
+                if cursor is None:
+                    break
+            tiempos.sort()
+            print(f"{nombre:>14}{total:>10}{conteo_ms:>11.2f}{len(tiempos):>9}{_percentil(tiempos, 0.5):>8.2f}"
+                  f"{_percentil(tiempos, 0.95):>8.2f}{tiempos[-1]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Prueba de estrés del generador de radicados
+
+Lanza varios procesos con varios hilos cada uno contra el mismo archivo de
+secuencias y verifica que no haya radicados repetidos y que cada hilo los
+reciba en orden creciente. Reporta radicados por segundo.
+
+Uso:
+    python benchmarks/bench_radicados.py --procesos 4 --hilos 8 --por-hilo 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from radicados import GeneradorRadicados
+
+
+def _secuencia(radicado):
+    return int(radicado.rsplit('-', 1)[1])
+
+
+def _trabajo_proceso(argumentos):
+    ruta_db, hilos, por_hilo = argumentos
+    generador = GeneradorRadicados(ruta_db)
+
+    def trabajo_hilo(indice):
+        tipo = 'PQRS'[indice % 4]
+        return [generador.siguiente(tipo) for _ in range(por_hilo)]
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return list(pool.map(trabajo_hilo, range(hilos)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--por-hilo', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_db = os.path.join(directorio, 'radicados.sqlite3')
+        GeneradorRadicados(ruta_db)
+
+        inicio = time.perf_counter()
+        with Pool(args.procesos) as pool:
+            resultados = pool.map(_trabajo_proceso, [(ruta_db, args.hilos, args.por_hilo)] * args.procesos)
+        duracion = time.perf_counter() - inicio
+
+    por_hilo = [lista for proceso in resultados for lista in proceso]
+    todos = [radicado for lista in por_hilo for radicado in lista]
+    repetidos = len(todos) - len(set(todos))
+    desordenados = sum(
+        1 for lista in por_hilo
+        for anterior, actual in zip(lista, lista[1:])
+        if _secuencia(actual) <= _secuencia(anterior)
+    )
+    secuencias = sorted(_secuencia(r) for r in todos)
+    huecos = secuencias != list(range(secuencias[0], secuencias[0] + len(secuencias)))
+
+    print(f"Radicados emitidos:   {len(todos)}")
+    print(f"Repetidos:            {repetidos}")
+    print(f"Fuera de orden:       {desordenados}")
+    print(f"Secuencia con huecos: {'sí' if huecos else 'no'}")
+    print(f"Tiempo:               {duracion:.2f} s")
+    print(f"Radicados/segundo:    {len(todos) / duracion:,.0f}")
+
+    if repetidos or desordenados or huecos:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import configuracion
+
+# ============================================================================
+# CACHE DE RESPUESTAS
+# ============================================================================
+# Dos niveles: un LRU acotado en memoria y una tabla SQLite en disco que
+# sobrevive a reinicios. La clave es un hash de las entradas del prompt que
+# determinan el texto; la fecha y el radicado se excluyen a propósito.
+
+
+def clave_cache(tipo_pqrs, model_id, parametros, campos_prompt):
+    """Calcula la clave del cache a partir de las entradas normalizadas del prompt"""
+    normalizado = {
+        'tipo': tipo_pqrs,
+        'modelo': model_id,
+        'parametros': parametros,
+        'campos': {k: str(v).strip() for k, v in campos_prompt.items()}
+    }
+    contenido = json.dumps(normalizado, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheRespuestas:
+    """Cache de respuestas con LRU en memoria respaldado por SQLite"""
+
+    def __init__(self, ruta_db, max_entradas=500, ttl_segundos=86400, ventana_radicado_segundos=900):
+        self.ruta_db = ruta_db
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.ventana_radicado_segundos = ventana_radicado_segundos
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.radicados_reutilizados = 0
+
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_db, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute("PRAGMA busy_timeout=30000")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                texto TEXT NOT NULL,
+                radicado TEXT NOT NULL,
+                creado REAL NOT NULL
+            )
+        """)
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS radicados_recientes (
+                numero_contrato TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                radicado TEXT NOT NULL,
+                creado REAL NOT NULL,
+                PRIMARY KEY (numero_contrato, tipo)
+            )
+        """)
+
+    def obtener(self, clave):
+        """Retorna {'texto', 'radicado'} si la clave está vigente, o None"""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                if ahora - entrada['creado'] <= self.ttl_segundos:
+                    self._memoria.move_to_end(clave)
+                    self.hits_memoria += 1
+                    return entrada
+                del self._memoria[clave]
+
+            fila = self._conexion.execute(
+                "SELECT texto, radicado, creado FROM respuestas WHERE clave = ? AND creado >= ?",
+                (clave, ahora - self.ttl_segundos)
+            ).fetchone()
+            if fila is None:
+                self.misses += 1
+                return None
+
+            entrada = {'texto': fila[0], 'radicado': fila[1], 'creado': fila[2]}
+            self._guardar_en_memoria(clave, entrada)
+            self.hits_disco += 1
+            return entrada
+
+    def guardar(self, clave, texto, radicado):
+        """Guarda una respuesta en ambos niveles"""
+        entrada = {'texto': texto, 'radicado': radicado, 'creado': time.time()}
+        with self._lock:
+            self._guardar_en_memoria(clave, entrada)
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, texto, radicado, creado) VALUES (?, ?, ?, ?)",
+                (clave, texto, radicado, entrada['creado'])
+            )
+            self._escrituras += 1
+            # Limpieza ocasional de entradas vencidas en disco
+            if self._escrituras % 100 == 0:
+                self._purgar(entrada['creado'])
+
+    def asignar_radicado(self, numero_contrato, tipo_pqrs, nuevo_radicado):
+        """Retorna el radicado del contrato y tipo dentro de la ventana o registra uno nuevo
+
+        nuevo_radicado() solo se llama si no hay uno vigente. La consulta y el
+        registro van en una sola transacción BEGIN IMMEDIATE: dos reenvíos
+        simultáneos, aunque vengan de procesos distintos, reciben el mismo radicado.
+        """
+        if self.ventana_radicado_segundos <= 0:
+            return nuevo_radicado()
+        with self._lock:
+            ahora = time.time()
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                fila = self._conexion.execute(
+                    "SELECT radicado FROM radicados_recientes WHERE numero_contrato = ? AND tipo = ? AND creado >= ?",
+                    (numero_contrato, tipo_pqrs, ahora - self.ventana_radicado_segundos)
+                ).fetchone()
+                if fila is None:
+                    fila = self._conexion.execute(
+                        """INSERT INTO radicados_recientes (numero_contrato, tipo, radicado, creado) VALUES (?, ?, ?, ?)
+                           ON CONFLICT (numero_contrato, tipo) DO UPDATE SET
+                               radicado = excluded.radicado, creado = excluded.creado
+                           RETURNING radicado""",
+                        (numero_contrato, tipo_pqrs, nuevo_radicado(), ahora)
+                    ).fetchone()
+                else:
+                    self.radicados_reutilizados += 1
+                self._conexion.execute("COMMIT")
+            except Exception:
+                self._conexion.execute("ROLLBACK")
+                raise
+            return fila[0]
+
+    def estadisticas(self):
+        """Retorna contadores de aciertos y fallos"""
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_disco + self.misses
+            return {
+                'hits_memoria': self.hits_memoria,
+                'hits_disco': self.hits_disco,
+                'misses': self.misses,
+                'tasa_acierto': (self.hits_memoria + self.hits_disco) / consultas if consultas else 0.0,
+                'entradas_memoria': len(self._memoria),
+                'radicados_reutilizados': self.radicados_reutilizados
+            }
+
+    def _guardar_en_memoria(self, clave, entrada):
+        self._memoria[clave] = entrada
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas:
+            self._memoria.popitem(last=False)
+
+    def _purgar(self, ahora):
+        self._conexion.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl_segundos,))
+        self._conexion.execute(
+            "DELETE FROM radicados_recientes WHERE creado < ?", (ahora - self.ventana_radicado_segundos,)
+        )
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_cache_respuestas():
+    """Retorna el cache compartido del proceso, o None si está deshabilitado"""
+    global _instancia
+    if not configuracion.CACHE_HABILITADO:
+        return None
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = CacheRespuestas(
+                    configuracion.CACHE_RUTA,
+                    max_entradas=configuracion.CACHE_MAX_ENTRADAS,
+                    ttl_segundos=configuracion.CACHE_TTL_SEGUNDOS,
+                    ventana_radicado_segundos=configuracion.RADICADO_VENTANA_SEGUNDOS
+                )
+    return _instancia
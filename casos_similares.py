@@ -0,0 +1,375 @@
+import logging
+import re
+import threading
+from datetime import datetime
+
+import configuracion
+from almacen_pqrs import obtener_almacen
+from clientes_sinteticos import generar_contexto_pqrs
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CASOS SIMILARES
+# ============================================================================
+# Índice local de las PQRS ya resueltas por el modelo para encontrar, antes
+# de llamar a Bedrock, el caso más parecido del mismo tipo. Cada caso es el
+# contexto de la PQRS sin cifras más atributos discretos (estrato, tipo de
+# usuario, barrio, consumo frente al promedio) vectorizados con
+# HashingVectorizer: no hay vocabulario que ajustar, así que los casos nuevos
+# se agregan sin reentrenar. Los vectores van normalizados (L2) y la
+# similitud coseno es un producto matriz-vector disperso.
+#
+# El índice es una proyección del almacén: se llena en un hilo de fondo con
+# los CASOS_MAX_POR_TIPO casos más recientes y en cada consulta lee los que
+# se hayan guardado después (también los de otras réplicas). En memoria solo
+# quedan vectores y radicados; la carta se lee del almacén para el mejor caso.
+#
+# La carta adaptada solo cambia los datos literales del cliente (nombre,
+# contrato, cifras, fechas): las cifras derivadas (diferencias, porcentajes,
+# valores en letras) siguen siendo las del caso anterior. Por eso nunca se
+# entrega sola: va como ejemplo en el prompt o, si el agente la revisa y la
+# confirma en la interfaz, se usa en lugar de llamar a Bedrock.
+# La carga empieza con la primera consulta, no al arrancar el proceso: numpy,
+# scipy y scikit-learn se importan en ese hilo de carga.
+
+# Veces que se repiten los atributos para que pesen frente al texto del contexto
+PESO_ATRIBUTOS = 3
+
+# Casos que se leen del almacén por consulta
+TAMANO_BLOQUE = 1000
+
+# Razón consumo actual / promedio: límite superior de cada rango
+RANGOS_CONSUMO = ((0.7, 'bajo'), (1.3, 'normal'), (2.0, 'alto'), (3.0, 'muy_alto'))
+
+# Nombres fijos: strftime('%B') depende del locale del servidor
+MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+         'septiembre', 'octubre', 'noviembre', 'diciembre']
+
+# Campos del cliente que se reemplazan tal cual en la carta de otro caso
+CAMPOS_TEXTO = ('nombre_completo', 'direccion', 'correo', 'telefono', 'cedula', 'numero_contrato',
+                'numero_medidor', 'barrio', 'tipo_usuario')
+# Cifras del cliente: solo se reemplazan junto a su unidad ("18 m³") o su
+# signo ("$54.000"). Una cifra suelta puede ser otra cosa ("15 días hábiles")
+CAMPOS_CONSUMO = ('consumo_actual', 'consumo_promedio')
+CAMPOS_VALOR = ('valor_factura', 'valor_m3')
+UNIDAD_CONSUMO = r'\s?(?:m³|m3|metros\s+c[úu]bicos)\b'
+CAMPOS_FECHA = ('fecha_ultima_lectura', 'fecha_instalacion')
+
+# Datos que identifican al cliente anterior: si alguno sigue en la carta
+# adaptada, no se puede reutilizar
+CAMPOS_IDENTIFICACION = ('nombre_completo', 'direccion', 'cedula', 'numero_contrato', 'numero_medidor')
+
+
+def _simbolo(valor):
+    """Valor como una sola palabra para el vectorizador ('Santa Bárbara' -> 'santa_bárbara')"""
+    return re.sub(r'\W+', '_', str(valor).strip().lower())
+
+
+def _rango_consumo(datos_cliente):
+    promedio = datos_cliente.get('consumo_promedio')
+    actual = datos_cliente.get('consumo_actual')
+    if not promedio or actual is None:
+        return 'sin_dato'
+    razon = actual / promedio
+    for limite, nombre in RANGOS_CONSUMO:
+        if razon < limite:
+            return nombre
+    return 'extremo'
+
+
+def documento_caso(tipo_pqrs, datos_cliente):
+    """Texto con el que se indexa un caso: el contexto sin cifras y los atributos del cliente
+
+    Las cifras (consumos, valores, fechas, contrato) cambian de un cliente a
+    otro sin cambiar el caso; lo que sí lo distingue entra como atributo.
+    """
+    contexto = re.sub(r'\d+(?:[.,:/-]\d+)*', ' ', generar_contexto_pqrs(tipo_pqrs, datos_cliente))
+    atributos = [
+        f"estrato_{datos_cliente.get('estrato')}",
+        f"usuario_{_simbolo(datos_cliente.get('tipo_usuario'))}",
+        f"barrio_{_simbolo(datos_cliente.get('barrio'))}",
+        f"consumo_{_rango_consumo(datos_cliente)}"
+    ]
+    return f"{contexto} {' '.join(atributos * PESO_ATRIBUTOS)}"
+
+
+def _variantes_fecha(valor):
+    """Formas en que una fecha puede aparecer en una carta"""
+    if isinstance(valor, str):
+        valor = datetime.strptime(valor[:10], '%Y-%m-%d')
+    variantes = [valor.strftime('%Y-%m-%d'), valor.strftime('%d/%m/%Y')]
+    for mes in (MESES[valor.month - 1], MESES[valor.month - 1].capitalize()):
+        variantes += [f"{valor.day} de {mes} de {valor.year}", f"{valor.day:02d} de {mes} de {valor.year}"]
+    return variantes
+
+
+def _variantes_numero(valor):
+    """Formas en que una cifra puede aparecer en una carta: 1,234.5 / 1.234,5 / 1234.5 (18.0 también como 18)"""
+    variantes = []
+    for forma in (valor, int(valor) if isinstance(valor, float) and valor.is_integer() else valor):
+        miles = f"{forma:,}"
+        variantes += [miles, miles.translate(str.maketrans(',.', '.,')), str(forma)]
+    return variantes
+
+
+def _reemplazos(anterior, nuevo, radicado_anterior, radicado, fecha_anterior, fecha):
+    """{texto del caso anterior: texto para el cliente nuevo}, en formas equivalentes"""
+    pares = [(radicado_anterior, radicado)]
+    pares += zip(_variantes_fecha(fecha_anterior), _variantes_fecha(fecha))
+    for campo in CAMPOS_FECHA:
+        if anterior.get(campo) and nuevo.get(campo):
+            pares += zip(_variantes_fecha(anterior[campo]), _variantes_fecha(nuevo[campo]))
+    for campo in CAMPOS_TEXTO:
+        if anterior.get(campo) and nuevo.get(campo):
+            pares.append((str(anterior[campo]), str(nuevo[campo])))
+    # Nombres de igual número de palabras: también "nombre apellido" y otras partes seguidas
+    palabras_anterior = str(anterior.get('nombre_completo', '')).split()
+    palabras_nuevo = str(nuevo.get('nombre_completo', '')).split()
+    if len(palabras_anterior) == len(palabras_nuevo):
+        for largo in range(len(palabras_anterior) - 1, 1, -1):
+            for inicio in range(len(palabras_anterior) - largo + 1):
+                pares.append((' '.join(palabras_anterior[inicio:inicio + largo]),
+                              ' '.join(palabras_nuevo[inicio:inicio + largo])))
+
+    reemplazos = {}
+    for viejo, actual in pares:
+        # Las cifras de un dígito (días, estrato) aparecen por todas partes
+        if len(viejo) > 1 and viejo != actual:
+            reemplazos.setdefault(viejo, actual)
+    return reemplazos
+
+
+def _cifras(anterior, nuevo, campos):
+    """{cifra del cliente anterior: cifra del nuevo} de los campos dados, en formas equivalentes"""
+    cifras = {}
+    for campo in campos:
+        if anterior.get(campo) is not None and nuevo.get(campo) is not None:
+            for viejo, actual in zip(_variantes_numero(anterior[campo]), _variantes_numero(nuevo[campo])):
+                if viejo != actual:
+                    cifras.setdefault(viejo, actual)
+    return cifras
+
+
+def _reemplazar_cifras(texto, anterior, nuevo):
+    """Cambia consumos seguidos de su unidad y valores precedidos de $; las demás cifras no se tocan"""
+    consumos = _cifras(anterior, nuevo, CAMPOS_CONSUMO)
+    if consumos:
+        alternativas = '|'.join(re.escape(c) for c in sorted(consumos, key=len, reverse=True))
+        texto = re.sub(rf'(?<![\w.,])({alternativas})({UNIDAD_CONSUMO})',
+                       lambda m: consumos[m.group(1)] + m.group(2), texto)
+    valores = _cifras(anterior, nuevo, CAMPOS_VALOR)
+    if valores:
+        alternativas = '|'.join(re.escape(v) for v in sorted(valores, key=len, reverse=True))
+        texto = re.sub(rf'(\$\s?)({alternativas})(?!\w|[.,]\d)',
+                       lambda m: m.group(1) + valores[m.group(2)], texto)
+    return texto
+
+
+def _patron(textos):
+    """Regex que encuentra cualquiera de los textos como palabra o cifra completa"""
+    alternativas = '|'.join(re.escape(t) for t in sorted(textos, key=len, reverse=True))
+    return re.compile(rf'(?<![\w.,])(?:{alternativas})(?!\w|[.,]\d)')
+
+
+def _restos_de(anterior, nuevo, texto):
+    """Datos del cliente anterior que siguen en el texto (salvo los que comparte con el nuevo)"""
+    restos = [str(anterior[c]) for c in CAMPOS_IDENTIFICACION if anterior.get(c)]
+    palabras = str(anterior.get('nombre_completo', '')).split()
+    restos += [' '.join(palabras[i:i + 2]) for i in range(len(palabras) - 1)]
+    propios = ' | '.join(str(nuevo.get(c, '')) for c in CAMPOS_IDENTIFICACION)
+    restos = [r for r in restos if r not in propios]
+    # El valor de la factura es lo bastante largo para no confundirse con otra
+    # cifra: si quedó sin reemplazar (sin $), la carta cita al cliente anterior
+    if anterior.get('valor_factura') is not None and anterior.get('valor_factura') != nuevo.get('valor_factura'):
+        restos += [v for v in _variantes_numero(anterior['valor_factura']) if len(v) >= 4]
+    return _patron(restos).findall(texto) if restos else []
+
+
+def personalizar_carta(previo, datos_cliente, radicado, fecha=None):
+    """Carta de un caso anterior con los datos de este cliente, o None si no se puede adaptar
+
+    previo es el registro del almacén (texto, radicado, fecha y datos_cliente).
+    Se reemplazan en una sola pasada radicado, fechas y datos del cliente, y
+    luego consumos y valores solo donde la carta los cita con su unidad o con
+    $. Si después queda algún dato que identifique al cliente anterior (por
+    ejemplo, su nombre escrito de otra forma o el valor de su factura sin $),
+    se descarta.
+    """
+    anterior = previo['datos_cliente']
+    fecha = fecha or datetime.now()
+    reemplazos = _reemplazos(anterior, datos_cliente, previo['radicado'], radicado,
+                             previo['fecha'], fecha)
+    texto = previo['texto']
+    if reemplazos:
+        texto = _patron(reemplazos).sub(lambda m: reemplazos[m.group(0)], texto)
+    texto = _reemplazar_cifras(texto, anterior, datos_cliente)
+    estrato_anterior, estrato = anterior.get('estrato'), datos_cliente.get('estrato')
+    if estrato_anterior is not None and estrato is not None and estrato_anterior != estrato:
+        texto = re.sub(rf'(\bestrato\s+){estrato_anterior}\b', rf'\g<1>{estrato}', texto, flags=re.IGNORECASE)
+
+    # El cliente anterior podría ser el mismo (mismo contrato, otro radicado)
+    mismo_cliente = anterior.get('numero_contrato') == datos_cliente.get('numero_contrato')
+    if not mismo_cliente and _restos_de(anterior, datos_cliente, texto):
+        return None
+    return texto
+
+
+class IndiceCasos:
+    """Vectores de los casos resueltos por tipo, alimentado desde el almacén"""
+
+    def __init__(self, almacen, max_por_tipo=20000, n_features=2 ** 18):
+        self.almacen = almacen
+        self.max_por_tipo = max_por_tipo
+        self.n_features = n_features
+        self._vectorizador = None
+        self.listo = False
+        self.cargando = False
+        self._matrices = {}
+        self._radicados = {}
+        self._pendientes = {}
+        self._ultimo_id = None
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._contadores = {'consultas': 0, 'ofrecidas': 0, 'reutilizadas': 0, 'ejemplos': 0, 'sin_caso': 0}
+
+    def vectorizar(self, casos):
+        """Matriz dispersa (una fila normalizada por caso) de [(tipo, datos_cliente)]"""
+        if self._vectorizador is None:
+            import numpy as np
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._vectorizador = HashingVectorizer(
+                n_features=self.n_features, ngram_range=(1, 2), strip_accents='unicode',
+                alternate_sign=False, norm='l2', dtype=np.float32
+            )
+        return self._vectorizador.transform([documento_caso(tipo, datos) for tipo, datos in casos])
+
+    def iniciar_carga(self):
+        """Lanza una sola vez la carga inicial en un hilo de fondo"""
+        with self._lock:
+            if self.cargando or self.listo:
+                return
+            self.cargando = True
+        # scikit-learn importa pandas: si eso pasa en el hilo de carga, plotly
+        # (que mira sys.modules sin importar) puede ver un pandas a medio importar
+        import pandas  # noqa: F401
+        threading.Thread(target=_cargar, args=(self,), name='pqrs-casos', daemon=True).start()
+
+    def actualizar(self, esperar=True):
+        """Agrega los casos guardados en el almacén desde la última vez; retorna cuántos
+
+        La primera vez carga los max_por_tipo más recientes. Con esperar=False
+        no hace nada si otro hilo ya está actualizando.
+        """
+        if not self._lock_carga.acquire(blocking=esperar):
+            return 0
+        try:
+            if self._ultimo_id is None:
+                self._ultimo_id = self.almacen.inicio_casos_recientes(self.max_por_tipo * 4)
+            agregados = 0
+            while True:
+                casos = self.almacen.casos_resueltos(self._ultimo_id, TAMANO_BLOQUE)
+                if not casos:
+                    break
+                vectores = self.vectorizar([(c['tipo'], c['datos_cliente']) for c in casos])
+                por_tipo = {}
+                for indice, caso in enumerate(casos):
+                    por_tipo.setdefault(caso['tipo'], ([], []))
+                    por_tipo[caso['tipo']][0].append(indice)
+                    por_tipo[caso['tipo']][1].append(caso['radicado'])
+                with self._lock:
+                    for tipo, (filas, radicados) in por_tipo.items():
+                        self._pendientes.setdefault(tipo, []).append((vectores[filas], radicados))
+                self._ultimo_id = casos[-1]['id']
+                agregados += len(casos)
+            self.listo = True
+            return agregados
+        finally:
+            self._lock_carga.release()
+
+    def _consolidar(self, tipo_pqrs):
+        """Matriz y radicados del tipo con los pendientes incorporados (llamar con _lock)"""
+        pendientes = self._pendientes.pop(tipo_pqrs, None)
+        if pendientes:
+            import scipy.sparse as sp
+            matriz = self._matrices.get(tipo_pqrs)
+            bloques = ([matriz] if matriz is not None else []) + [v for v, _ in pendientes]
+            radicados = self._radicados.get(tipo_pqrs, []) + [r for _, lista in pendientes for r in lista]
+            matriz = sp.vstack(bloques, format='csr')
+            if matriz.shape[0] > self.max_por_tipo:
+                matriz = matriz[-self.max_por_tipo:]
+                radicados = radicados[-self.max_por_tipo:]
+            self._matrices[tipo_pqrs] = matriz
+            self._radicados[tipo_pqrs] = radicados
+        return self._matrices.get(tipo_pqrs), self._radicados.get(tipo_pqrs, [])
+
+    def similares(self, tipo_pqrs, datos_cliente, k=3):
+        """Los k casos del tipo más parecidos: [{'radicado', 'similitud'}] de mayor a menor
+
+        La primera consulta lanza la carga inicial; mientras no termina
+        retorna [] (se genera sin caso).
+        """
+        with self._lock:
+            self._contadores['consultas'] += 1
+        if not self.listo:
+            self.iniciar_carga()
+            return []
+        import numpy as np
+        self.actualizar(esperar=False)
+        vector = self.vectorizar([(tipo_pqrs, datos_cliente)])
+        with self._lock:
+            matriz, radicados = self._consolidar(tipo_pqrs)
+        if matriz is None or not k:
+            return []
+        puntajes = matriz @ vector.toarray().ravel()
+        k = min(k, len(puntajes))
+        mejores = np.argpartition(-puntajes, k - 1)[:k]
+        # A igual similitud, el caso más reciente
+        mejores = sorted(mejores, key=lambda i: (-puntajes[i], -i))
+        return [{'radicado': radicados[i], 'similitud': float(puntajes[i])} for i in mejores]
+
+    def registrar(self, resultado):
+        """Cuenta el uso de una consulta: 'ofrecidas', 'reutilizadas', 'ejemplos' o 'sin_caso'"""
+        with self._lock:
+            self._contadores[resultado] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            estadisticas = dict(self._contadores)
+            casos = sum(m.shape[0] for m in self._matrices.values())
+            casos += sum(v.shape[0] for pendientes in self._pendientes.values() for v, _ in pendientes)
+        estadisticas.update({'casos': casos, 'listo': self.listo, 'cargando': self.cargando and not self.listo})
+        return estadisticas
+
+
+def _cargar(indice):
+    try:
+        cantidad = indice.actualizar()
+        logger.info("Índice de casos similares listo con %s casos", cantidad)
+    except Exception:
+        logger.exception("No se pudo cargar el índice de casos similares")
+        # La siguiente consulta lo vuelve a intentar
+        indice.cargando = False
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_indice_casos():
+    """Retorna el índice de casos del proceso, o None si está deshabilitado
+
+    Se crea vacío: la primera consulta lanza su carga en segundo plano.
+    """
+    global _instancia
+    if not configuracion.CASOS_HABILITADO:
+        return None
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = IndiceCasos(
+                    obtener_almacen(),
+                    max_por_tipo=configuracion.CASOS_MAX_POR_TIPO,
+                    n_features=configuracion.CASOS_N_FEATURES
+                )
+    return _instancia
@@ -0,0 +1,190 @@
+import random
+from datetime import datetime, timedelta
+
+# ============================================================================
+# CLIENTES SINTÉTICOS
+# ============================================================================
+# Datos ficticios de clientes derivados del número de contrato. Cada llamada
+# usa su propio random.Random sembrado con el contrato: el resultado es el
+# mismo para un contrato sin tocar el módulo random global, así que varias
+# sesiones e hilos pueden generar clientes a la vez.
+#
+# generar_clientes_masivo produce N clientes como columnas NumPy para pruebas
+# de carga. Sigue las mismas distribuciones pero con otro generador, por lo
+# que un contrato no obtiene los mismos datos que en generar_datos_cliente.
+
+BARRIOS = ["Santa Bárbara", "Chapinero Alto", "Usaquén", "Cedritos", "La Castellana",
+           "Salitre", "Teusaquillo", "Chicó", "Rosales", "Colina Campestre"]
+
+NOMBRES = ["Ana María", "Juan Carlos", "Patricia", "Luis Alberto", "Carolina",
+           "José Manuel", "Martha Lucía", "Carlos Andrés", "María José", "Diego Alejandro"]
+
+APELLIDOS = ["González", "Rodríguez", "Martínez", "López", "Sánchez",
+             "Ramírez", "Torres", "Herrera", "Jiménez", "Morales"]
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio"]
+
+TIPOS_USUARIO = ["Residencial", "Comercial"]
+
+TARIFAS_M3 = {1: 2000, 2: 2500, 3: 3000, 4: 3500, 5: 4000, 6: 4500}
+
+AÑO_CONSUMOS = 2024
+
+_SIN_TILDES = str.maketrans('áéíóú', 'aeiou')
+
+
+def _correo(nombre, apellido):
+    """Correo ficticio a partir del nombre y el primer apellido"""
+    nombre_limpio = nombre.lower().replace(' ', '').translate(_SIN_TILDES)
+    return f"{nombre_limpio}.{apellido.lower().translate(_SIN_TILDES)}@gmail.com"
+
+
+def _consumos_historicos(consumos):
+    return [{'mes': mes, 'consumo': consumo, 'año': AÑO_CONSUMOS} for mes, consumo in zip(MESES, consumos)]
+
+
+def generar_datos_cliente(numero_contrato, hoy=None):
+    """Genera datos ficticios del cliente basados en el número de contrato"""
+    rng = random.Random(int(numero_contrato))
+    hoy = hoy or datetime.now()
+
+    # El orden de las llamadas a rng fija los datos de cada contrato: no cambiarlo
+    nombre = rng.choice(NOMBRES)
+    apellido1 = rng.choice(APELLIDOS)
+    apellido2 = rng.choice(APELLIDOS)
+
+    consumo_base = rng.randint(15, 35)
+    consumos = [max(10, consumo_base + rng.randint(-3, 3)) for _ in MESES]
+    ultimo_consumo = consumos[-1]
+
+    estrato = rng.randint(1, 6)
+    valor_m3 = TARIFAS_M3[estrato]
+
+    return {
+        "numero_contrato": numero_contrato,
+        "nombre_completo": f"{nombre} {apellido1} {apellido2}",
+        "cedula": f"{rng.randint(80000000, 99999999)}",
+        "direccion": f"Calle {rng.randint(1, 150)} #{rng.randint(1, 99)}-{rng.randint(1, 99)}, {rng.choice(BARRIOS)}",
+        "correo": _correo(nombre, apellido1),
+        "telefono": f"3{rng.randint(10, 50)}{rng.randint(1000000, 9999999)}",
+        "estrato": estrato,
+        "consumo_actual": ultimo_consumo,
+        "consumo_promedio": round(sum(consumos) / len(consumos), 1),
+        "consumos_historicos": _consumos_historicos(consumos),
+        "valor_m3": valor_m3,
+        "valor_factura": round(ultimo_consumo * valor_m3, -2),
+        "fecha_ultima_lectura": (hoy - timedelta(days=rng.randint(1, 15))).strftime('%Y-%m-%d'),
+        "numero_medidor": f"MED-{rng.randint(10000, 99999)}",
+        "tipo_usuario": rng.choice(TIPOS_USUARIO),
+        "fecha_instalacion": (hoy - timedelta(days=rng.randint(365, 3650))).strftime('%Y-%m-%d'),
+        "barrio": rng.choice(BARRIOS),
+        "ciclo_facturacion": rng.randint(1, 6)
+    }
+
+
+def generar_contexto_pqrs(tipo_pqrs, datos_cliente):
+    """Genera el contexto específico según el tipo de PQRS"""
+    contextos = {
+        'P': f"""El usuario solicita información detallada sobre su cuenta de servicios con número de contrato {datos_cliente['numero_contrato']}. 
+                    Requiere conocer el histórico de consumos de los últimos 6 meses, las tarifas aplicadas según su estrato {datos_cliente['estrato']},
+                    y aclaración sobre los componentes de la factura. También solicita información sobre programas de ahorro de agua disponibles.""",
+
+        'Q': f"""El usuario presenta una queja formal por la atención recibida durante la visita técnica realizada el {datos_cliente['fecha_ultima_lectura']} 
+                    en su predio ubicado en {datos_cliente['direccion']}. El técnico no siguió los protocolos de servicio, no presentó identificación 
+                    y dejó el área de trabajo en desorden. Solicita medidas correctivas y una nueva visita técnica.""",
+
+        'R': f"""El usuario presenta un reclamo por el alto consumo facturado en el último periodo. El consumo registrado de {datos_cliente['consumo_actual']} m³ 
+                    es significativamente mayor al promedio histórico de {datos_cliente['consumo_promedio']} m³. El valor facturado de ${datos_cliente['valor_factura']:,} 
+                    no corresponde con el patrón de consumo habitual. Solicita revisión técnica del medidor {datos_cliente['numero_medidor']} y ajuste en la factura.""",
+
+        'S': f"""El usuario, cliente desde {datos_cliente['fecha_instalacion']}, sugiere implementar mejoras en el sistema de notificación de lecturas 
+                    y en la aplicación móvil. Propone incluir alertas de consumo inusual, gráficas comparativas mensuales y la opción de programar 
+                    visitas técnicas directamente desde la app. También sugiere implementar un sistema de puntos por ahorro de agua."""
+    }
+
+    return contextos.get(tipo_pqrs, "")
+
+
+def generar_clientes_masivo(cantidad, semilla=0, primer_contrato=None):
+    """Genera cantidad clientes como columnas NumPy (un arreglo por campo)
+
+    Los campos de texto se entregan como índices en NOMBRES, APELLIDOS,
+    BARRIOS y TIPOS_USUARIO; 'consumos' es una matriz (cantidad, 6). Con
+    primer_contrato los contratos son consecutivos; si no, aleatorios.
+    Use cliente_desde_columnas para obtener un cliente como dict.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(semilla)
+
+    if primer_contrato is None:
+        contratos = rng.integers(10 ** 9, 10 ** 10, size=cantidad, dtype=np.int64)
+    else:
+        contratos = np.arange(int(primer_contrato), int(primer_contrato) + cantidad, dtype=np.int64)
+
+    def enteros(minimo, maximo, tipo=np.int32):
+        # Rango inclusivo, como random.randint
+        return rng.integers(minimo, maximo + 1, size=cantidad, dtype=tipo)
+
+    consumo_base = enteros(15, 35, np.int16)
+    variaciones = rng.integers(-3, 4, size=(cantidad, len(MESES)), dtype=np.int16)
+    consumos = np.maximum(10, consumo_base[:, None] + variaciones).astype(np.int16)
+    estrato = enteros(1, 6, np.int8)
+    tarifas = np.array([0] + [TARIFAS_M3[e] for e in range(1, 7)], dtype=np.int32)
+    valor_m3 = tarifas[estrato]
+    consumo_actual = consumos[:, -1]
+
+    return {
+        'numero_contrato': contratos,
+        'nombre': enteros(0, len(NOMBRES) - 1, np.int8),
+        'apellido1': enteros(0, len(APELLIDOS) - 1, np.int8),
+        'apellido2': enteros(0, len(APELLIDOS) - 1, np.int8),
+        'cedula': enteros(80000000, 99999999),
+        'calle': enteros(1, 150, np.int16),
+        'numero': enteros(1, 99, np.int8),
+        'placa': enteros(1, 99, np.int8),
+        'barrio_direccion': enteros(0, len(BARRIOS) - 1, np.int8),
+        'telefono_prefijo': enteros(10, 50, np.int8),
+        'telefono': enteros(1000000, 9999999),
+        'estrato': estrato,
+        'consumos': consumos,
+        'consumo_actual': consumo_actual,
+        'consumo_promedio': np.round(consumos.mean(axis=1), 1),
+        'valor_m3': valor_m3,
+        'valor_factura': np.round(consumo_actual.astype(np.int64) * valor_m3, -2),
+        'dias_ultima_lectura': enteros(1, 15, np.int16),
+        'numero_medidor': enteros(10000, 99999),
+        'tipo_usuario': enteros(0, len(TIPOS_USUARIO) - 1, np.int8),
+        'dias_instalacion': enteros(365, 3650, np.int16),
+        'barrio': enteros(0, len(BARRIOS) - 1, np.int8),
+        'ciclo_facturacion': enteros(1, 6, np.int8)
+    }
+
+
+def cliente_desde_columnas(columnas, indice, hoy=None):
+    """Arma el cliente de la fila indice con la misma forma que generar_datos_cliente"""
+    hoy = hoy or datetime.now()
+    nombre = NOMBRES[columnas['nombre'][indice]]
+    apellido1 = APELLIDOS[columnas['apellido1'][indice]]
+    apellido2 = APELLIDOS[columnas['apellido2'][indice]]
+    return {
+        "numero_contrato": f"{int(columnas['numero_contrato'][indice]):010d}",
+        "nombre_completo": f"{nombre} {apellido1} {apellido2}",
+        "cedula": f"{int(columnas['cedula'][indice])}",
+        "direccion": (f"Calle {int(columnas['calle'][indice])} #{int(columnas['numero'][indice])}-"
+                      f"{int(columnas['placa'][indice])}, {BARRIOS[columnas['barrio_direccion'][indice]]}"),
+        "correo": _correo(nombre, apellido1),
+        "telefono": f"3{int(columnas['telefono_prefijo'][indice])}{int(columnas['telefono'][indice])}",
+        "estrato": int(columnas['estrato'][indice]),
+        "consumo_actual": int(columnas['consumo_actual'][indice]),
+        "consumo_promedio": float(columnas['consumo_promedio'][indice]),
+        "consumos_historicos": _consumos_historicos(int(c) for c in columnas['consumos'][indice]),
+        "valor_m3": int(columnas['valor_m3'][indice]),
+        "valor_factura": int(columnas['valor_factura'][indice]),
+        "fecha_ultima_lectura": (hoy - timedelta(days=int(columnas['dias_ultima_lectura'][indice]))).strftime('%Y-%m-%d'),
+        "numero_medidor": f"MED-{int(columnas['numero_medidor'][indice])}",
+        "tipo_usuario": TIPOS_USUARIO[columnas['tipo_usuario'][indice]],
+        "fecha_instalacion": (hoy - timedelta(days=int(columnas['dias_instalacion'][indice]))).strftime('%Y-%m-%d'),
+        "barrio": BARRIOS[columnas['barrio'][indice]],
+        "ciclo_facturacion": int(columnas['ciclo_facturacion'][indice])
+    }
@@ -0,0 +1,381 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import configuracion
+from resiliencia import PERMANENTE, clasificar_error
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# COLA DE TRABAJOS DURABLE
+# ============================================================================
+# Cada generación encolada es una fila en SQLite que pasa por
+# en_cola → en_proceso → completado / fallido. El radicado se asigna al
+# encolar, así que el agente lo conoce de inmediato y puede consultar el
+# estado aunque cierre la pestaña. Un trabajador toma un trabajo con un
+# arriendo (lease) que renueva mientras lo procesa; si el proceso muere, el
+# arriendo vence y otro trabajador lo retoma. Un throttling o error
+# transitorio de Bedrock devuelve el trabajo a la cola con una espera
+# (disponible_desde) hasta agotar los intentos; un error permanente lo deja
+# fallido de inmediato. Los trabajadores pueden correr
+# dentro de la aplicación o como proceso aparte:
+#
+#     python cola_trabajos.py --hilos 8
+#
+# Al completar, la carta queda en el almacén (la guarda el generador) y el
+# documento Word en su tabla de documentos. Cada fila de un lote apunta a su
+# radicado en filas_lote: si el radicado se reutiliza (fila repetida o
+# solicitud reciente del mismo contrato y tipo), varias filas comparten el
+# mismo trabajo.
+
+EN_COLA = 'en_cola'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+ESTADOS_FINALES = (COMPLETADO, FALLIDO)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY,
+    radicado TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    numero_contrato TEXT NOT NULL,
+    datos_cliente TEXT NOT NULL,
+    regenerar INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    trabajador TEXT,
+    arrendado_hasta REAL,
+    disponible_desde REAL,
+    error TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_trabajos_radicado ON trabajos (radicado);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, id);
+CREATE TABLE IF NOT EXISTS filas_lote (
+    lote TEXT NOT NULL,
+    fila INTEGER NOT NULL,
+    radicado TEXT NOT NULL,
+    PRIMARY KEY (lote, fila)
+) WITHOUT ROWID;
+"""
+
+
+class ColaTrabajos:
+    """Cola persistente de generaciones con arriendos para trabajadores de varios procesos"""
+
+    def __init__(self, ruta_db, arriendo_segundos=None, max_intentos=None):
+        self.ruta_db = ruta_db
+        self.arriendo_segundos = arriendo_segundos or configuracion.COLA_ARRIENDO_SEGUNDOS
+        self.max_intentos = max_intentos or configuracion.COLA_MAX_INTENTOS
+        self._local = threading.local()
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        conexion = self._conexion()
+        conexion.executescript(ESQUEMA)
+        # Bases creadas antes de los reintentos con espera
+        columnas = {fila['name'] for fila in conexion.execute("PRAGMA table_info(trabajos)")}
+        if 'disponible_desde' not in columnas:
+            conexion.execute("ALTER TABLE trabajos ADD COLUMN disponible_desde REAL")
+
+    def _conexion(self):
+        """Retorna la conexión del hilo actual, creándola si no existe"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute("PRAGMA busy_timeout=30000")
+            self._local.conexion = conexion
+        return conexion
+
+    def encolar(self, radicado, tipo_pqrs, datos_cliente, regenerar=False, lote=None, fila=None):
+        """Encola la generación de un radicado y retorna su trabajo
+
+        Si el radicado ya tiene trabajo (reenvío dentro de la ventana del
+        radicado) se conserva, salvo que haya fallado o se pida regenerar
+        una carta ya completada: entonces vuelve a la cola. Con lote, la fila
+        queda enlazada al radicado aunque el trabajo sea uno ya existente.
+        """
+        ahora = time.time()
+        conexion = self._conexion()
+        conexion.execute(
+            """INSERT INTO trabajos (radicado, tipo, numero_contrato, datos_cliente, regenerar,
+                                     estado, creado, actualizado)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (radicado) DO UPDATE SET
+                   estado = excluded.estado, regenerar = excluded.regenerar, intentos = 0,
+                   trabajador = NULL, arrendado_hasta = NULL, disponible_desde = NULL, error = NULL,
+                   actualizado = excluded.actualizado
+               WHERE trabajos.estado = 'fallido' OR (excluded.regenerar = 1 AND trabajos.estado = 'completado')""",
+            (radicado, tipo_pqrs, datos_cliente['numero_contrato'], json.dumps(datos_cliente, ensure_ascii=False),
+             int(bool(regenerar)), EN_COLA, ahora, ahora)
+        )
+        if lote is not None:
+            conexion.execute(
+                """INSERT INTO filas_lote (lote, fila, radicado) VALUES (?, ?, ?)
+                   ON CONFLICT (lote, fila) DO UPDATE SET radicado = excluded.radicado""",
+                (lote, fila, radicado)
+            )
+        return self.obtener(radicado)
+
+    def tomar(self, trabajador):
+        """Toma el trabajo más antiguo disponible (en cola o con arriendo vencido), o None
+
+        Los devueltos a la cola para reintentar esperan hasta disponible_desde.
+        """
+        ahora = time.time()
+        conexion = self._conexion()
+        # Los que agotaron sus intentos con el arriendo vencido ya no se retoman
+        conexion.execute(
+            """UPDATE trabajos SET estado = 'fallido', error = 'Se agotaron los intentos', actualizado = ?
+               WHERE estado = 'en_proceso' AND arrendado_hasta < ? AND intentos >= ?""",
+            (ahora, ahora, self.max_intentos)
+        )
+        fila = conexion.execute(
+            """UPDATE trabajos SET estado = 'en_proceso', trabajador = ?, arrendado_hasta = ?,
+                   intentos = intentos + 1, actualizado = ?
+               WHERE id = (SELECT id FROM trabajos
+                           WHERE (estado = 'en_cola' AND (disponible_desde IS NULL OR disponible_desde <= ?))
+                              OR (estado = 'en_proceso' AND arrendado_hasta < ?)
+                           ORDER BY id LIMIT 1)
+               RETURNING *""",
+            (trabajador, ahora + self.arriendo_segundos, ahora, ahora, ahora)
+        ).fetchone()
+        return self._registro(fila)
+
+    def renovar(self, trabajador):
+        """Extiende el arriendo de todos los trabajos en proceso de un trabajador"""
+        self._conexion().execute(
+            "UPDATE trabajos SET arrendado_hasta = ? WHERE trabajador = ? AND estado = 'en_proceso'",
+            (time.time() + self.arriendo_segundos, trabajador)
+        )
+
+    def terminar(self, id_trabajo, trabajador, error=None):
+        """Marca el trabajo completado o fallido si el trabajador aún tiene su arriendo"""
+        cursor = self._conexion().execute(
+            """UPDATE trabajos SET estado = ?, error = ?, arrendado_hasta = NULL, actualizado = ?
+               WHERE id = ? AND trabajador = ? AND estado = 'en_proceso'""",
+            (FALLIDO if error else COMPLETADO, error, time.time(), id_trabajo, trabajador)
+        )
+        return cursor.rowcount == 1
+
+    def reintentar(self, id_trabajo, trabajador, error, espera_segundos):
+        """Devuelve el trabajo a la cola tras espera_segundos; si agotó los intentos queda fallido
+
+        Retorna el estado en que quedó, o None si el trabajador ya no tenía el arriendo.
+        """
+        ahora = time.time()
+        fila = self._conexion().execute(
+            """UPDATE trabajos SET estado = CASE WHEN intentos < ? THEN 'en_cola' ELSE 'fallido' END,
+                   error = ?, arrendado_hasta = NULL, disponible_desde = ?, actualizado = ?
+               WHERE id = ? AND trabajador = ? AND estado = 'en_proceso'
+               RETURNING estado""",
+            (self.max_intentos, error, ahora + espera_segundos, ahora, id_trabajo, trabajador)
+        ).fetchone()
+        return fila['estado'] if fila else None
+
+    def obtener(self, radicado):
+        """Retorna el trabajo de un radicado, o None"""
+        fila = self._conexion().execute("SELECT * FROM trabajos WHERE radicado = ?", (radicado,)).fetchone()
+        return self._registro(fila)
+
+    def trabajos_lote(self, lote):
+        """Un registro por fila del lote, en orden, con el trabajo de su radicado
+
+        Las filas que comparten radicado repiten el mismo trabajo.
+        """
+        filas = self._conexion().execute(
+            """SELECT f.lote, f.fila, t.id, t.radicado, t.tipo, t.numero_contrato, t.datos_cliente, t.estado,
+                      t.intentos, t.error, t.creado, t.actualizado
+               FROM filas_lote f JOIN trabajos t ON t.radicado = f.radicado
+               WHERE f.lote = ? ORDER BY f.fila""",
+            (lote,)
+        ).fetchall()
+        return [self._registro(f) for f in filas]
+
+    def conteo_por_estado(self):
+        filas = self._conexion().execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado").fetchall()
+        conteo = {EN_COLA: 0, EN_PROCESO: 0, COMPLETADO: 0, FALLIDO: 0}
+        conteo.update({estado: cantidad for estado, cantidad in filas})
+        return conteo
+
+    @staticmethod
+    def _registro(fila):
+        if fila is None:
+            return None
+        registro = dict(fila)
+        registro['datos_cliente'] = json.loads(registro['datos_cliente'])
+        return registro
+
+
+def encolar_generacion(cola, generador, tipo_pqrs, datos_cliente, regenerar=False, lote=None, fila=None):
+    """Asigna el radicado con las reglas del generador y encola su trabajo"""
+    radicado = generador.asignar_radicado(tipo_pqrs, datos_cliente)
+    return cola.encolar(radicado, tipo_pqrs, datos_cliente, regenerar=regenerar, lote=lote, fila=fila)
+
+
+class TrabajadorCola:
+    """Pool de hilos que toma trabajos de la cola y genera sus cartas"""
+
+    def __init__(self, cola, generador, hilos=None, motor=None, nombre=None, espera_segundos=None):
+        self.cola = cola
+        self.generador = generador
+        self.hilos = hilos or configuracion.COLA_HILOS
+        # Con motor, las llamadas comparten su tope de generaciones en vuelo
+        self.motor = motor
+        self.nombre = nombre or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.espera_segundos = espera_segundos or configuracion.COLA_ESPERA_SEGUNDOS
+        self._detener = threading.Event()
+        self._hilos = []
+
+    def iniciar(self):
+        for i in range(self.hilos):
+            hilo = threading.Thread(target=self._trabajar, name=f'pqrs-cola-{i}', daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        # Un solo latido renueva los arriendos de todos los hilos
+        latido = threading.Thread(target=self._latir, name='pqrs-cola-latido', daemon=True)
+        latido.start()
+        self._hilos.append(latido)
+        return self
+
+    def detener(self, esperar=True):
+        self._detener.set()
+        if esperar:
+            for hilo in self._hilos:
+                hilo.join()
+
+    def _latir(self):
+        while not self._detener.wait(self.cola.arriendo_segundos / 3):
+            try:
+                self.cola.renovar(self.nombre)
+            except Exception:
+                logger.exception("No se pudieron renovar los arriendos de %s", self.nombre)
+
+    def _trabajar(self):
+        while not self._detener.is_set():
+            try:
+                trabajo = self.cola.tomar(self.nombre)
+            except Exception:
+                logger.exception("No se pudo tomar un trabajo de la cola")
+                trabajo = None
+            if trabajo is None:
+                self._detener.wait(self.espera_segundos)
+                continue
+            self.atender(trabajo)
+
+    def atender(self, trabajo):
+        """Procesa un trabajo tomado y lo termina, o lo devuelve a la cola si el error es reintentable"""
+        if self.motor is not None:
+            error, clase = self.motor.ejecutar(self.procesar, trabajo).result()
+        else:
+            error, clase = self.procesar(trabajo)
+        if error and clase != PERMANENTE:
+            espera = self.espera_reintento(trabajo['intentos'])
+            estado = self.cola.reintentar(trabajo['id'], self.nombre, error, espera)
+            if estado == EN_COLA:
+                logger.warning("Trabajo %s (%s) se reintenta en %.0f s: %s",
+                               trabajo['radicado'], clase, espera, error)
+        else:
+            self.cola.terminar(trabajo['id'], self.nombre, error)
+
+    @staticmethod
+    def espera_reintento(intentos):
+        """Espera antes de retomar un trabajo que falló por throttling o error transitorio"""
+        return min(configuracion.COLA_REINTENTO_BASE_SEGUNDOS * 2 ** max(intentos - 1, 0),
+                   configuracion.COLA_REINTENTO_MAX_SEGUNDOS)
+
+    def procesar(self, trabajo):
+        """Genera la carta y el documento de un trabajo
+
+        Retorna (error, clase): (None, None) si terminó bien; si no, el
+        mensaje y la clase del error según resiliencia.clasificar_error.
+        """
+        try:
+            texto, radicado, error = self.generador.generar_respuesta_bedrock(
+                trabajo['tipo'], trabajo['datos_cliente'],
+                regenerar=bool(trabajo['regenerar']), radicado=trabajo['radicado'], lanzar=True
+            )
+        except Exception as e:
+            return f"Error generando respuesta: {str(e)}", clasificar_error(e)
+        if error:
+            return error, PERMANENTE
+        try:
+            self.generador.archivar_documento_word(texto, radicado, trabajo['datos_cliente'])
+            return None, None
+        except Exception as e:
+            logger.exception("Falló el trabajo %s", trabajo['radicado'])
+            return f"Error inesperado: {str(e)}", PERMANENTE
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+_trabajador = None
+
+
+def obtener_cola():
+    """Retorna la cola de trabajos compartida del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = ColaTrabajos(configuracion.COLA_RUTA)
+    return _instancia
+
+
+def iniciar_trabajador(generador, motor=None):
+    """Inicia una sola vez los trabajadores dentro del proceso (si están habilitados)"""
+    global _trabajador
+    if _trabajador is None and configuracion.COLA_TRABAJADORES_EN_PROCESO:
+        with _lock_instancia:
+            if _trabajador is None:
+                _trabajador = TrabajadorCola(obtener_cola(), generador, motor=motor).iniciar()
+    return _trabajador
+
+
+def main():
+    from almacen_pqrs import obtener_almacen
+    from bedrock_cliente import ClienteBedrockDiferido
+    from cache_respuestas import obtener_cache_respuestas
+    from casos_similares import obtener_indice_casos
+    from generador_pqrs import VeoliaPQRSGenerator
+    from resiliencia import obtener_resiliencia
+    from uso_tokens import obtener_contabilidad
+
+    parser = argparse.ArgumentParser(description="Trabajadores de la cola de generación PQRS")
+    parser.add_argument('--hilos', type=int, default=configuracion.COLA_HILOS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # Credenciales de la cadena por defecto de boto3 (variables de entorno, perfil, rol)
+    generador = VeoliaPQRSGenerator(
+        ClienteBedrockDiferido(),
+        logo_path=configuracion.LOGO_PATH,
+        cache=obtener_cache_respuestas(),
+        almacen=obtener_almacen(),
+        resiliencia=obtener_resiliencia() if configuracion.RESILIENCIA_HABILITADA else None,
+        contabilidad=obtener_contabilidad(),
+        casos=obtener_indice_casos()
+    )
+    trabajador = TrabajadorCola(obtener_cola(), generador, hilos=args.hilos).iniciar()
+    logger.info("Trabajador %s con %d hilos sobre %s", trabajador.nombre, trabajador.hilos, configuracion.COLA_RUTA)
+    try:
+        while True:
+            time.sleep(60)
+            logger.info("Trabajos: %s", obtener_cola().conteo_por_estado())
+    except KeyboardInterrupt:
+        trabajador.detener()
+
+
+if __name__ == '__main__':
+    main()
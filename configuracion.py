@@ -0,0 +1,211 @@
+import json
+import os
+
+# ============================================================================
+# CONFIGURACIÓN DEL SISTEMA PQRS
+# ============================================================================
+# Todos los valores se pueden sobrescribir con variables de entorno PQRS_*
+
+
+def _texto(nombre, defecto):
+    """Lee una variable de entorno de texto"""
+    return os.environ.get(nombre, defecto)
+
+
+def _entero(nombre, defecto):
+    """Lee una variable de entorno entera, usando el valor por defecto si no es válida"""
+    try:
+        return int(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _decimal(nombre, defecto):
+    """Lee una variable de entorno decimal, usando el valor por defecto si no es válida"""
+    try:
+        return float(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _json(nombre, defecto):
+    """Lee una variable de entorno JSON, usando el valor por defecto si no es válida"""
+    try:
+        return json.loads(os.environ[nombre])
+    except (KeyError, ValueError):
+        return defecto
+
+
+def _booleano(nombre, defecto):
+    """Lee una variable de entorno booleana (1/true/si/yes)"""
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+# AWS Bedrock
+BEDROCK_REGION = _texto("PQRS_BEDROCK_REGION", "us-east-1")
+BEDROCK_MODEL_ID = _texto("PQRS_BEDROCK_MODEL_ID", "us.anthropic.claude-sonnet-4-20250514-v1:0")
+# "aws" usa Bedrock real; "stub" usa el sustituto local de bedrock_stub.py
+BEDROCK_BACKEND = _texto("PQRS_BEDROCK_BACKEND", "aws").strip().lower()
+
+# Parámetros de generación; max_tokens también limita la latencia de cada carta
+BEDROCK_MAX_TOKENS = _entero("PQRS_BEDROCK_MAX_TOKENS", 3000)
+
+# Pool de conexiones HTTP del cliente compartido
+BEDROCK_MAX_CONEXIONES = _entero("PQRS_BEDROCK_MAX_CONEXIONES", 50)
+BEDROCK_CONNECT_TIMEOUT = _decimal("PQRS_BEDROCK_CONNECT_TIMEOUT", 5.0)
+BEDROCK_READ_TIMEOUT = _decimal("PQRS_BEDROCK_READ_TIMEOUT", 120.0)
+BEDROCK_TCP_KEEPALIVE = _booleano("PQRS_BEDROCK_TCP_KEEPALIVE", True)
+BEDROCK_REINTENTOS = _entero("PQRS_BEDROCK_REINTENTOS", 3)
+
+# Resiliencia ante throttling y errores transitorios de Bedrock. Cuando está
+# habilitada, los reintentos los hace la aplicación y no botocore.
+RESILIENCIA_HABILITADA = _booleano("PQRS_RESILIENCIA_HABILITADA", True)
+RESILIENCIA_REINTENTOS = _entero("PQRS_RESILIENCIA_REINTENTOS", 4)
+RESILIENCIA_BACKOFF_BASE_MS = _decimal("PQRS_RESILIENCIA_BACKOFF_BASE_MS", 250.0)
+RESILIENCIA_BACKOFF_MAX_MS = _decimal("PQRS_RESILIENCIA_BACKOFF_MAX_MS", 8000.0)
+# Límite adaptativo de llamadas simultáneas (AIMD)
+RESILIENCIA_CONCURRENCIA_MIN = _entero("PQRS_RESILIENCIA_CONCURRENCIA_MIN", 1)
+RESILIENCIA_CONCURRENCIA_INICIAL = _entero("PQRS_RESILIENCIA_CONCURRENCIA_INICIAL", 8)
+RESILIENCIA_CONCURRENCIA_MAX = _entero("PQRS_RESILIENCIA_CONCURRENCIA_MAX", 32)
+RESILIENCIA_ESPERA_RANURA_SEGUNDOS = _decimal("PQRS_RESILIENCIA_ESPERA_RANURA_SEGUNDOS", 60.0)
+# Circuit breaker: fallos seguidos para abrir y segundos antes de volver a probar
+RESILIENCIA_CIRCUITO_FALLOS = _entero("PQRS_RESILIENCIA_CIRCUITO_FALLOS", 5)
+RESILIENCIA_CIRCUITO_ESPERA_SEGUNDOS = _decimal("PQRS_RESILIENCIA_CIRCUITO_ESPERA_SEGUNDOS", 30.0)
+
+# Motor de generación: generaciones simultáneas en vuelo (las demás esperan en
+# cola sin ocupar hilos). Cada una ocupa un hilo del executor mientras lee su
+# stream, así que el motor lo limita a BEDROCK_MAX_CONEXIONES.
+MOTOR_MAX_EN_VUELO = _entero("PQRS_MOTOR_MAX_EN_VUELO", BEDROCK_MAX_CONEXIONES)
+
+# Generación masiva (lotes)
+LOTE_MAX_WORKERS = _entero("PQRS_LOTE_MAX_WORKERS", 8)
+LOTE_MAX_FILAS = _entero("PQRS_LOTE_MAX_FILAS", 2000)
+
+# Directorio de datos locales (cache, base de datos)
+DATOS_DIR = _texto("PQRS_DATOS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos"))
+
+# Cache de respuestas
+CACHE_HABILITADO = _booleano("PQRS_CACHE_HABILITADO", True)
+CACHE_RUTA = _texto("PQRS_CACHE_RUTA", os.path.join(DATOS_DIR, "cache_respuestas.sqlite3"))
+CACHE_MAX_ENTRADAS = _entero("PQRS_CACHE_MAX_ENTRADAS", 500)
+CACHE_TTL_SEGUNDOS = _entero("PQRS_CACHE_TTL_SEGUNDOS", 24 * 3600)
+# Reenvíos del mismo contrato y tipo dentro de esta ventana conservan el radicado
+RADICADO_VENTANA_SEGUNDOS = _entero("PQRS_RADICADO_VENTANA_SEGUNDOS", 15 * 60)
+
+# Casos similares: índice local de las PQRS resueltas por tipo. Desde
+# CASOS_UMBRAL_EJEMPLO (similitud coseno) la carta del caso más parecido va en
+# el prompt como ejemplo; desde CASOS_UMBRAL_REUTILIZAR la interfaz además
+# ofrece al agente usarla adaptada, sin llamar a Bedrock, si él la confirma
+CASOS_HABILITADO = _booleano("PQRS_CASOS_HABILITADO", True)
+CASOS_UMBRAL_REUTILIZAR = _decimal("PQRS_CASOS_UMBRAL_REUTILIZAR", 0.95)
+CASOS_UMBRAL_EJEMPLO = _decimal("PQRS_CASOS_UMBRAL_EJEMPLO", 0.8)
+CASOS_TOP_K = _entero("PQRS_CASOS_TOP_K", 3)
+CASOS_MAX_POR_TIPO = _entero("PQRS_CASOS_MAX_POR_TIPO", 20000)
+CASOS_N_FEATURES = _entero("PQRS_CASOS_N_FEATURES", 2 ** 18)
+
+# Cache de prompt de Bedrock (cache_control en el prefijo fijo del prompt).
+# Por fragmento del modelId, el mínimo de tokens del prefijo que Bedrock cachea:
+# con un prefijo menor el cache_control no tiene efecto y no se envía.
+PROMPT_CACHE_HABILITADO = _booleano("PQRS_PROMPT_CACHE_HABILITADO", True)
+PROMPT_CACHE_MODELOS = _json("PQRS_PROMPT_CACHE_MODELOS", {
+    "claude-sonnet-4": 1024,
+    "claude-opus-4": 1024,
+    "claude-3-7-sonnet": 1024,
+    "claude-3-5-haiku": 2048,
+    "claude-haiku-4": 4096
+})
+
+# Sustituto local de Bedrock
+# Bedrock solo cachea prefijos desde cierto tamaño (1024 tokens en Claude Sonnet)
+STUB_MIN_TOKENS_CACHE = _entero("PQRS_STUB_MIN_TOKENS_CACHE", 1024)
+STUB_TTL_CACHE_SEGUNDOS = _entero("PQRS_STUB_TTL_CACHE_SEGUNDOS", 300)
+# Latencia hasta el primer token: lognormal con esta mediana y dispersión (0 = sin espera)
+STUB_LATENCIA_MEDIANA_MS = _decimal("PQRS_STUB_LATENCIA_MEDIANA_MS", 0.0)
+STUB_LATENCIA_SIGMA = _decimal("PQRS_STUB_LATENCIA_SIGMA", 0.5)
+# Velocidad de generación de la salida (0 = instantánea)
+STUB_TOKENS_POR_SEGUNDO = _decimal("PQRS_STUB_TOKENS_POR_SEGUNDO", 0.0)
+# Fracción de llamadas que fallan con ThrottlingException o con timeout de lectura
+STUB_TASA_THROTTLING = _decimal("PQRS_STUB_TASA_THROTTLING", 0.0)
+STUB_TASA_TIMEOUT = _decimal("PQRS_STUB_TASA_TIMEOUT", 0.0)
+STUB_TIMEOUT_SEGUNDOS = _decimal("PQRS_STUB_TIMEOUT_SEGUNDOS", 1.0)
+# Semilla de los sorteos: la llamada número N se comporta igual en cada corrida
+STUB_SEMILLA = _entero("PQRS_STUB_SEMILLA", 0)
+
+# Almacén de PQRS (SQLite en modo WAL)
+ALMACEN_RUTA = _texto("PQRS_ALMACEN_RUTA", os.path.join(DATOS_DIR, "pqrs.sqlite3"))
+
+# Secuencia de radicados compartida por todos los procesos del servidor
+RADICADOS_RUTA = _texto("PQRS_RADICADOS_RUTA", os.path.join(DATOS_DIR, "radicados.sqlite3"))
+
+# Cola de trabajos durable (SQLite). Con COLA_TRABAJADORES_EN_PROCESO=0 la
+# aplicación solo encola y los trabajos los procesa `python cola_trabajos.py`.
+COLA_RUTA = _texto("PQRS_COLA_RUTA", os.path.join(DATOS_DIR, "cola_trabajos.sqlite3"))
+COLA_TRABAJADORES_EN_PROCESO = _booleano("PQRS_COLA_TRABAJADORES_EN_PROCESO", True)
+COLA_HILOS = _entero("PQRS_COLA_HILOS", 4)
+# Un trabajo cuyo arriendo vence sin renovarse vuelve a tomarse (el trabajador murió)
+COLA_ARRIENDO_SEGUNDOS = _decimal("PQRS_COLA_ARRIENDO_SEGUNDOS", 60.0)
+COLA_MAX_INTENTOS = _entero("PQRS_COLA_MAX_INTENTOS", 3)
+# Un throttling o error transitorio devuelve el trabajo a la cola con espera
+# exponencial (base, 2×base, ...) acotada por el máximo
+COLA_REINTENTO_BASE_SEGUNDOS = _decimal("PQRS_COLA_REINTENTO_BASE_SEGUNDOS", 15.0)
+COLA_REINTENTO_MAX_SEGUNDOS = _decimal("PQRS_COLA_REINTENTO_MAX_SEGUNDOS", 300.0)
+COLA_ESPERA_SEGUNDOS = _decimal("PQRS_COLA_ESPERA_SEGUNDOS", 1.0)
+
+# Contabilidad de tokens y costos. Precios en USD por millón de tokens:
+# [entrada, salida, lectura de caché, escritura en caché], por fragmento del modelId.
+USO_RUTA = _texto("PQRS_USO_RUTA", os.path.join(DATOS_DIR, "uso_tokens.sqlite3"))
+PRECIOS_MODELOS = _json("PQRS_PRECIOS_MODELOS", {
+    "claude-opus-4": [15.0, 75.0, 1.5, 18.75],
+    "claude-sonnet-4": [3.0, 15.0, 0.3, 3.75],
+    "claude-3-7-sonnet": [3.0, 15.0, 0.3, 3.75],
+    "claude-haiku-4": [1.0, 5.0, 0.1, 1.25],
+    "claude-3-5-haiku": [0.8, 4.0, 0.08, 1.0]
+})
+# Presupuestos diarios en USD (0 = sin límite): total y por tipo, p. ej. {"R": 20}
+PRESUPUESTO_DIARIO_USD = _decimal("PQRS_PRESUPUESTO_DIARIO_USD", 0.0)
+PRESUPUESTOS_TIPO_USD = _json("PQRS_PRESUPUESTOS_TIPO_USD", {})
+# Desde esta fracción del presupuesto se recorta max_tokens; al agotarlo se
+# usa el modelo económico (si está configurado)
+PRESUPUESTO_FRACCION_AVISO = _decimal("PQRS_PRESUPUESTO_FRACCION_AVISO", 0.8)
+MAX_TOKENS_DEGRADADO = _entero("PQRS_MAX_TOKENS_DEGRADADO", 1500)
+MODELO_ECONOMICO = _texto("PQRS_MODELO_ECONOMICO", "us.anthropic.claude-3-5-haiku-20241022-v1:0")
+# Muestras de salida por tipo necesarias para recomendar max_tokens
+MAX_TOKENS_MUESTRAS_MINIMAS = _entero("PQRS_MAX_TOKENS_MUESTRAS_MINIMAS", 50)
+
+# Cache de documentos generados (Word/PDF), compartido entre sesiones
+ARTEFACTOS_MAX_MB = _decimal("PQRS_ARTEFACTOS_MAX_MB", 64.0)
+
+# Fuente TrueType que se incrusta en los PDF (regular y negrita). Si no
+# existe, se usa Bitstream Vera, que viene con reportlab
+PDF_FUENTE = _texto("PQRS_PDF_FUENTE", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PDF_FUENTE_NEGRITA = _texto("PQRS_PDF_FUENTE_NEGRITA", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+
+# Historial: filas por página y cache de páginas y conteos por filtros (las
+# escrituras de otros procesos se ven al vencer el TTL)
+HISTORIAL_TAMANO_PAGINA = _entero("PQRS_HISTORIAL_TAMANO_PAGINA", 25)
+HISTORIAL_CACHE_TTL_SEGUNDOS = _decimal("PQRS_HISTORIAL_CACHE_TTL_SEGUNDOS", 30.0)
+HISTORIAL_CACHE_MAX_ENTRADAS = _entero("PQRS_HISTORIAL_CACHE_MAX_ENTRADAS", 256)
+
+# Resultados de la búsqueda de texto completo: los más relevantes entre las
+# coincidencias más recientes (acota el costo de bm25 con términos frecuentes)
+BUSQUEDA_MAX_RESULTADOS = _entero("PQRS_BUSQUEDA_MAX_RESULTADOS", 50)
+BUSQUEDA_MAX_CANDIDATOS = _entero("PQRS_BUSQUEDA_MAX_CANDIDATOS", 5000)
+
+# Exportación del historial: filas por consulta y directorio de los archivos
+# temporales (se borran al superar el TTL)
+EXPORTACION_DIR = _texto("PQRS_EXPORTACION_DIR", os.path.join(DATOS_DIR, "exportaciones"))
+EXPORTACION_TAMANO_BLOQUE = _entero("PQRS_EXPORTACION_TAMANO_BLOQUE", 2000)
+EXPORTACION_TTL_SEGUNDOS = _entero("PQRS_EXPORTACION_TTL_SEGUNDOS", 3600)
+
+# Métricas por etapa en formato Prometheus: endpoint http://HOST:PUERTO/metrics
+# (0 lo desactiva) y, opcionalmente, un archivo reescrito cada intervalo
+METRICAS_HOST = _texto("PQRS_METRICAS_HOST", "127.0.0.1")
+METRICAS_PUERTO = _entero("PQRS_METRICAS_PUERTO", 9464)
+METRICAS_ARCHIVO = _texto("PQRS_METRICAS_ARCHIVO", "")
+METRICAS_INTERVALO_SEGUNDOS = _decimal("PQRS_METRICAS_INTERVALO_SEGUNDOS", 15.0)
+
+# Logo de Veolia (interfaz, Word y PDF)
+LOGO_PATH = _texto("PQRS_LOGO_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "RGB_VEOLIA_HD-1024x418.webp"))
@@ -0,0 +1,222 @@
+import csv
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import configuracion
+from almacen_pqrs import COLUMNAS_EXPORTACION
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# EXPORTACIÓN DEL HISTORIAL
+# ============================================================================
+# El historial se lee en bloques paginados por (fecha, id) y cada bloque se
+# escribe de inmediato en un archivo temporal: Excel con openpyxl en modo
+# write-only (las filas se vuelcan a disco al agregarlas), CSV o, si pyarrow
+# está instalado, Parquet con un row group por bloque. La memoria depende del
+# tamaño del bloque, no del número de filas. La exportación corre en un hilo
+# propio y la interfaz consulta su progreso; al terminar, el archivo se
+# entrega con st.download_button.
+
+EN_CURSO = 'en_curso'
+COMPLETADA = 'completada'
+ERROR = 'error'
+
+ENCABEZADOS = {
+    'radicado': 'Radicado',
+    'fecha': 'Fecha',
+    'tipo': 'Tipo',
+    'numero_contrato': 'Contrato',
+    'nombre_cliente': 'Cliente',
+    'direccion': 'Dirección',
+    'numero_medidor': 'Medidor',
+    'estado': 'Estado',
+    'modelo': 'Modelo',
+    'desde_cache': 'Desde caché',
+    'tiempo_total_ms': 'Tiempo total (ms)',
+    'tiempo_primer_token_ms': 'Primer token (ms)',
+    'error': 'Error',
+    'texto': 'Respuesta'
+}
+
+NOMBRES_TIPO = {'P': 'Petición', 'Q': 'Queja', 'R': 'Reclamo', 'S': 'Sugerencia'}
+
+# Excel admite 1.048.576 filas por hoja; se deja una para el encabezado
+FILAS_POR_HOJA = 1_048_575
+
+FORMATOS = {
+    'xlsx': ('Excel (.xlsx)', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV (.csv)', 'text/csv'),
+    'parquet': ('Parquet (.parquet)', 'application/vnd.apache.parquet')
+}
+
+
+def parquet_disponible():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def formatos_disponibles():
+    """Formatos que se pueden exportar en este servidor (Parquet requiere pyarrow)"""
+    return [f for f in FORMATOS if f != 'parquet' or parquet_disponible()]
+
+
+def _legible(columnas, fila):
+    """Fila con el tipo por nombre y desde_cache como Sí/No"""
+    valores = list(fila)
+    for indice, columna in enumerate(columnas):
+        if columna == 'tipo':
+            valores[indice] = NOMBRES_TIPO.get(valores[indice], valores[indice])
+        elif columna == 'desde_cache':
+            valores[indice] = 'Sí' if valores[indice] else 'No'
+    return valores
+
+
+def escribir_excel(bloques, columnas, ruta, al_avanzar):
+    """Escribe los bloques en un .xlsx en modo write-only, abriendo otra hoja al llenar una"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    libro = Workbook(write_only=True)
+    encabezado = [ENCABEZADOS.get(c, c) for c in columnas]
+    posicion_fecha = columnas.index('fecha') if 'fecha' in columnas else None
+    hoja = None
+    filas_hoja = FILAS_POR_HOJA
+    for bloque in bloques:
+        for fila in bloque:
+            if filas_hoja == FILAS_POR_HOJA:
+                hoja = libro.create_sheet(f"Historial {len(libro.worksheets) + 1}" if hoja else "Historial")
+                hoja.append(encabezado)
+                filas_hoja = 0
+            valores = _legible(columnas, fila)
+            if posicion_fecha is not None:
+                valores[posicion_fecha] = datetime.fromisoformat(valores[posicion_fecha])
+            # openpyxl rechaza caracteres de control que a veces trae el texto del modelo
+            hoja.append([ILLEGAL_CHARACTERS_RE.sub('', v) if isinstance(v, str) else v for v in valores])
+            filas_hoja += 1
+        al_avanzar(len(bloque))
+    if hoja is None:
+        libro.create_sheet("Historial").append(encabezado)
+    libro.save(ruta)
+
+
+def escribir_csv(bloques, columnas, ruta, al_avanzar):
+    """Escribe los bloques en un CSV UTF-8 con BOM (Excel lo abre con tildes correctas)"""
+    with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow([ENCABEZADOS.get(c, c) for c in columnas])
+        for bloque in bloques:
+            escritor.writerows(_legible(columnas, fila) for fila in bloque)
+            al_avanzar(len(bloque))
+
+
+def escribir_parquet(bloques, columnas, ruta, al_avanzar):
+    """Escribe los bloques en Parquet, un row group por bloque, con los nombres de columna del almacén"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {'desde_cache': pa.bool_(), 'tiempo_total_ms': pa.int64(), 'tiempo_primer_token_ms': pa.int64()}
+    esquema = pa.schema([(c, tipos.get(c, pa.string())) for c in columnas])
+    with pq.ParquetWriter(ruta, esquema, compression='zstd') as escritor:
+        for bloque in bloques:
+            arreglos = [
+                pa.array([bool(v) for v in valores] if columna == 'desde_cache' else valores, esquema.field(columna).type)
+                for columna, valores in zip(columnas, zip(*bloque))
+            ]
+            escritor.write_table(pa.Table.from_arrays(arreglos, schema=esquema))
+            al_avanzar(len(bloque))
+
+
+ESCRITORES = {'xlsx': escribir_excel, 'csv': escribir_csv, 'parquet': escribir_parquet}
+
+
+class Exportacion:
+    """Exportación en curso o terminada; la interfaz la consulta sin bloquearse"""
+
+    def __init__(self, formato, total, nombre_archivo):
+        self.formato = formato
+        self.total = total
+        self.nombre_archivo = nombre_archivo
+        self.mime = FORMATOS[formato][1]
+        self.filas = 0
+        self.estado = EN_CURSO
+        self.error = None
+        self.ruta = None
+        self.inicio = time.perf_counter()
+        self.segundos = None
+
+    def progreso(self):
+        """Fracción escrita; total sale de los resúmenes diarios y puede quedarse corto"""
+        if self.estado == COMPLETADA:
+            return 1.0
+        return min(1.0, self.filas / self.total) if self.total else 0.0
+
+    def contenido(self):
+        """Bytes del archivo, para st.download_button (se leen solo al pulsar descargar)"""
+        with open(self.ruta, 'rb') as archivo:
+            return archivo.read()
+
+    def descartar(self):
+        """Borra el archivo temporal"""
+        if self.ruta and os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+
+def _limpiar_antiguas(directorio):
+    """Borra exportaciones que superan EXPORTACION_TTL_SEGUNDOS (sesiones abandonadas)"""
+    limite = time.time() - configuracion.EXPORTACION_TTL_SEGUNDOS
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def exportar(almacen, filtros, formato, exportacion, incluir_texto=True):
+    """Escribe el historial filtrado en el archivo de la exportación; nunca lanza excepciones
+
+    filtros son los argumentos de AlmacenPQRS.iterar_historial (fecha_inicio,
+    fecha_fin, tipos, estados, numero_contrato).
+    """
+    columnas = COLUMNAS_EXPORTACION if incluir_texto else tuple(c for c in COLUMNAS_EXPORTACION if c != 'texto')
+
+    def al_avanzar(filas):
+        exportacion.filas += filas
+
+    try:
+        os.makedirs(configuracion.EXPORTACION_DIR, exist_ok=True)
+        _limpiar_antiguas(configuracion.EXPORTACION_DIR)
+        descriptor, exportacion.ruta = tempfile.mkstemp(suffix=f'.{formato}', dir=configuracion.EXPORTACION_DIR)
+        os.close(descriptor)
+        bloques = almacen.iterar_historial(**filtros, columnas=columnas,
+                                           tamano_bloque=configuracion.EXPORTACION_TAMANO_BLOQUE)
+        ESCRITORES[formato](bloques, columnas, exportacion.ruta, al_avanzar)
+        exportacion.estado = COMPLETADA
+    except Exception as e:
+        logger.exception("Falló la exportación del historial")
+        exportacion.descartar()
+        exportacion.error = f"Error exportando el historial: {e}"
+        exportacion.estado = ERROR
+    exportacion.segundos = time.perf_counter() - exportacion.inicio
+    return exportacion
+
+
+def iniciar_exportacion_historial(almacen, filtros, formato, incluir_texto=True):
+    """Lanza la exportación en un hilo de fondo y retorna su Exportacion de inmediato"""
+    total = almacen.contar_historial(**filtros)
+    exportacion = Exportacion(
+        formato, total, f"historial_pqrs_{filtros['fecha_inicio']:%Y%m%d}_{filtros['fecha_fin']:%Y%m%d}.{formato}"
+    )
+    threading.Thread(
+        target=exportar,
+        args=(almacen, filtros, formato, exportacion, incluir_texto),
+        name='pqrs-exportacion',
+        daemon=True
+    ).start()
+    return exportacion
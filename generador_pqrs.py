@@ -0,0 +1,811 @@
+import json
+import logging
+import time
+from datetime import datetime
+from io import BytesIO
+
+import configuracion
+from artefactos import clave_artefacto, obtener_cache_artefactos
+from cache_respuestas import clave_cache
+from casos_similares import personalizar_carta
+from clientes_sinteticos import generar_contexto_pqrs, generar_datos_cliente
+from metricas import obtener_metricas
+from plantilla_word import renderizar_documento_word
+from radicados import obtener_generador_radicados
+from recursos import ANCHO_DOCUMENTO, obtener_recursos
+from uso_tokens import registrar_uso
+
+logger = logging.getLogger(__name__)
+
+# Subir cuando cambie el diseño del documento Word o PDF: invalida los ya renderizados
+VERSION_PLANTILLA_WORD = 2
+VERSION_PLANTILLA_PDF = 2
+
+# Radicado en la carta que se ofrece para reutilizar, antes de que el agente la confirme
+RADICADO_POR_ASIGNAR = '[radicado por asignar]'
+
+# ============================================================================
+# PROMPTS
+# ============================================================================
+# SYSTEM_PROMPT e INSTRUCCIONES_RESPUESTA no deben depender de la solicitud:
+# son el prefijo que Bedrock cachea entre llamadas. Cualquier cambio en ellos
+# invalida el cache de prompt, por eso se versionan con VERSION_PROMPT. Bedrock
+# solo cachea un prefijo desde un mínimo de tokens por modelo (1024 en Sonnet):
+# las instrucciones llevan la referencia normativa completa para superarlo.
+
+VERSION_PROMPT = 3
+
+SYSTEM_PROMPT = """Eres un representante experto del servicio al cliente de Veolia Colombia, 
+empresa líder en gestión del agua y servicios ambientales. Tu rol es generar respuestas 
+profesionales, empáticas y completas a las PQRS de los usuarios.
+
+Debes mantener un tono profesional pero cercano, demostrar conocimiento técnico cuando 
+sea necesario y siempre expresar el compromiso de Veolia con la calidad del servicio 
+y el cuidado del medio ambiente."""
+
+INSTRUCCIONES_RESPUESTA = """Vas a redactar la respuesta a una PQRS (petición, queja, reclamo o sugerencia). 
+Los datos de la solicitud vienen al final de este mensaje.
+
+La respuesta debe:
+1. Iniciar con un saludo cordial y acuse de recibo
+2. Abordar específicamente todos los puntos planteados
+3. Proporcionar información técnica cuando sea relevante
+4. Mencionar el marco legal aplicable (Ley 142 de 1994, Resoluciones CRA)
+5. Detallar los pasos a seguir y tiempos de respuesta
+6. Incluir información de contacto y canales de atención
+7. Cerrar con un mensaje de compromiso con el servicio
+8. Mantener un formato de carta formal pero con lenguaje claro y cercano
+
+Información de referencia que puedes citar:
+
+Normativa aplicable:
+- Ley 142 de 1994: régimen de servicios públicos domiciliarios
+- Resolución CRA 413 de 2006: criterios para peticiones, quejas y recursos
+- Decreto 1077 de 2015: decreto único reglamentario del sector vivienda
+- Código de Procedimiento Administrativo: términos para responder
+
+Tiempos de respuesta:
+- Peticiones de información: 10 días hábiles
+- Quejas y reclamos: 15 días hábiles
+- Consultas: 30 días hábiles
+
+Canales de atención de Veolia Colombia:
+- Línea gratuita nacional: 01 8000 123 456
+- Sitio web: www.veolia.com.co
+
+Pautas según el tipo de solicitud:
+- Petición: responde de fondo lo que se solicita (información, un trámite o un servicio). Si la solicitud 
+requiere otro trámite, indica los requisitos, dónde se realiza y en qué plazo.
+- Queja: reconoce la inconformidad con la atención o con el servicio sin culpar al usuario, explica las 
+acciones correctivas adoptadas y quién hará el seguimiento.
+- Reclamo: explica la revisión realizada (lectura del medidor, histórico de consumos, visita técnica si 
+procede), la conclusión y, si hay ajuste, el valor y la factura en que se aplicará.
+- Sugerencia: agradece la propuesta, explica cómo se evaluará y a qué área se remite.
+
+Reclamos por facturación:
+- Artículo 146 de la Ley 142: el consumo se determina con el medidor; cuando no es posible medirlo, se 
+estima con el promedio de consumos anteriores del usuario o de usuarios en circunstancias similares.
+- Artículo 149 de la Ley 142: al preparar las facturas la empresa investiga las desviaciones 
+significativas frente a los consumos anteriores; mientras establece la causa, factura con base en 
+los periodos anteriores.
+- Artículo 150 de la Ley 142: pasados cinco meses desde la expedición de la factura, la empresa no puede 
+cobrar lo que dejó de facturar por error, omisión o investigación de desviaciones.
+- Artículo 155 de la Ley 142: para reclamar o recurrir no se exige el pago de las sumas en discusión, pero 
+sí el de las que no son objeto del reclamo o el del promedio de los últimos cinco periodos.
+
+Recursos y silencio administrativo:
+- Artículo 154 de la Ley 142: contra la decisión procede el recurso de reposición ante la empresa y, en 
+subsidio, el de apelación ante la Superintendencia de Servicios Públicos Domiciliarios. Cuando la 
+respuesta a un reclamo no acceda por completo a lo pedido, informa al usuario estos recursos y que 
+puede presentarlos dentro de los cinco días hábiles siguientes a la notificación.
+- Artículo 158 de la Ley 142: si la empresa no responde dentro de los quince días hábiles siguientes a 
+la presentación, opera el silencio administrativo positivo a favor del usuario.
+
+Términos que el usuario puede no conocer (explícalos con palabras sencillas si los usas):
+- Estrato: clasificación del inmueble de 1 a 6; los estratos 1 a 3 reciben subsidio sobre el consumo 
+básico, y los estratos 5 y 6 y los usuarios comerciales e industriales pagan una contribución.
+- Cargo fijo y cargo por consumo: componentes de la tarifa de acueducto y alcantarillado según la 
+metodología de la CRA; el primero no depende del consumo y el segundo se cobra por metro cúbico.
+- Desviación significativa: aumento o reducción del consumo muy por encima de lo habitual del usuario, 
+que obliga a la empresa a revisar la causa antes de facturar.
+- Visita técnica: inspección en el predio para revisar el medidor y las instalaciones internas en busca 
+de fugas; el usuario puede estar presente y recibe copia del acta.
+
+Estilo:
+- Trata al usuario de usted, con frases cortas y sin tecnicismos innecesarios.
+- Usa solo los datos de la solicitud: no inventes cifras, fechas, nombres de funcionarios ni números de 
+visita, y no prometas compensaciones o plazos distintos de los indicados aquí.
+- Cita los valores de consumo y de facturación tal como vienen en los datos de la solicitud.
+- No incluyas encabezado, destinatario, asunto, despedida final ni firma: la plantilla del documento 
+los agrega.
+
+Genera la respuesta completa sin usar títulos ni numeraciones, manteniendo un flujo natural."""
+
+# Tamaño del prefijo cacheable, estimado por lo bajo (4 caracteres por token;
+# en español el tokenizador produce más tokens, no menos)
+TOKENS_PREFIJO = len(SYSTEM_PROMPT + INSTRUCCIONES_RESPUESTA) // 4
+
+# Carta de un caso resuelto muy parecido, ya adaptada al cliente. Cambia con
+# cada solicitud, así que va después del prefijo cacheable.
+EJEMPLO_CASO_SIMILAR = """Como referencia, esta es la respuesta aprobada a un caso muy parecido, ya adaptada 
+a los datos de este usuario. Úsala como guía de contenido y tono, pero verifica cada dato contra la solicitud 
+y no copies lo que no aplique:
+
+<ejemplo>
+{carta}
+</ejemplo>"""
+
+# ============================================================================
+# CLASES PRINCIPALES
+# ============================================================================
+
+class RespuestaStreaming:
+    """Respuesta de Bedrock que se recibe por fragmentos de texto a medida que se genera"""
+    
+    def __init__(self, radicado, eventos, error=None, texto_cache=None, al_terminar=None, inicio=None,
+                 caso_similar=None):
+        self.radicado = radicado
+        self.eventos = iter(eventos) if eventos is not None else None
+        self.texto = ""
+        self.error = error
+        # Excepción que cortó el stream, para clasificarla (throttling, transitorio...)
+        self.excepcion = None
+        self.texto_cache = texto_cache
+        self.desde_cache = texto_cache is not None
+        # Caso parecido cuya carta adaptada fue en el prompt como ejemplo
+        self.caso_similar = caso_similar
+        self.al_terminar = al_terminar
+        self.uso = {}
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.primer_fragmento = None
+        self.fin = None
+        self.segundos_parseo = 0.0
+        self.razon_fin = None
+    
+    def __iter__(self):
+        """Itera los fragmentos de texto y los acumula en self.texto"""
+        if self.error:
+            return
+        
+        if self.texto_cache is not None:
+            # Respuesta recuperada del cache: se entrega de una vez
+            fragmento, self.texto_cache = self.texto_cache, None
+            self.texto = fragmento
+            self.primer_fragmento = time.perf_counter()
+            yield fragmento
+        elif self.eventos is not None:
+            try:
+                for evento in self.eventos:
+                    chunk = evento.get('chunk')
+                    if not chunk:
+                        continue
+                    inicio_parseo = time.perf_counter()
+                    datos = json.loads(chunk['bytes'])
+                    self.segundos_parseo += time.perf_counter() - inicio_parseo
+                    if datos.get('type') == 'content_block_delta':
+                        fragmento = datos['delta'].get('text', '')
+                        if fragmento:
+                            if self.primer_fragmento is None:
+                                self.primer_fragmento = time.perf_counter()
+                            self.texto += fragmento
+                            yield fragmento
+                    elif datos.get('type') == 'message_start':
+                        self.uso.update(datos['message'].get('usage', {}))
+                    elif datos.get('type') == 'message_delta':
+                        self.uso.update(datos.get('usage', {}))
+                        self.razon_fin = datos.get('delta', {}).get('stop_reason') or self.razon_fin
+            except Exception as e:
+                self.excepcion = e
+                self.error = f"Error generando respuesta: {str(e)}"
+        
+        self._terminar()
+    
+    def _terminar(self):
+        """Invoca al_terminar una sola vez, al agotar el stream o al fallar"""
+        if self.al_terminar is None:
+            return
+        self.fin = time.perf_counter()
+        al_terminar, self.al_terminar = self.al_terminar, None
+        al_terminar(self)
+    
+    def resultado(self):
+        """Retorna la tupla (texto, radicado, error) igual que generar_respuesta_bedrock"""
+        if self.error:
+            return None, None, self.error
+        # Consumir lo que quede si el llamador no iteró hasta el final
+        for _ in self:
+            pass
+        if self.error:
+            return None, None, self.error
+        return self.texto.strip(), self.radicado, None
+
+
+class VeoliaPQRSGenerator:
+    """Generador de respuestas PQRS usando AWS Bedrock"""
+    
+    def __init__(self, bedrock_client=None, logo_path=None, cache=None, almacen=None, radicados=None,
+                 artefactos=None, resiliencia=None, metricas=None, contabilidad=None, casos=None):
+        # Cliente, cache y almacén se inyectan para compartirlos entre sesiones e hilos
+        self.bedrock_client = bedrock_client
+        self.metricas = metricas if metricas is not None else obtener_metricas()
+        self.resiliencia = resiliencia
+        self.contabilidad = contabilidad
+        self.casos = casos
+        self.cache = cache
+        self.almacen = almacen
+        self.radicados = radicados
+        self.artefactos = artefactos
+        self.model_id = configuracion.BEDROCK_MODEL_ID
+        self.ultimo_uso = None
+        self.parametros_modelo = {
+            "max_tokens": configuracion.BEDROCK_MAX_TOKENS,
+            "temperature": 0.7,
+            "top_p": 0.9
+        }
+        self.tipos_pqrs = {
+            'P': 'PETICIÓN',
+            'Q': 'QUEJA',
+            'R': 'RECLAMO',
+            'S': 'SUGERENCIA'
+        }
+        self.logo_path = logo_path
+    
+    def generar_radicado(self, tipo_pqrs):
+        """Genera un número de radicado único"""
+        radicados = self.radicados if self.radicados is not None else obtener_generador_radicados()
+        return radicados.siguiente(tipo_pqrs)
+    
+    def generar_datos_cliente(self, numero_contrato):
+        """Genera datos ficticios del cliente basados en el número de contrato"""
+        with self.metricas.medir('datos_cliente'):
+            return generar_datos_cliente(numero_contrato)
+    
+    def generar_contexto_pqrs(self, tipo_pqrs, datos_cliente):
+        """Genera el contexto específico según el tipo de PQRS"""
+        return generar_contexto_pqrs(tipo_pqrs, datos_cliente)
+    
+    def construir_prompts(self, tipo_pqrs, datos_cliente, radicado):
+        """Construye el prompt en tres partes: system, instrucciones fijas y datos de la PQRS
+
+        Las dos primeras son idénticas en todas las solicitudes y forman el prefijo
+        cacheable; solo la tercera cambia con el cliente y el contexto.
+        """
+        contexto = self.generar_contexto_pqrs(tipo_pqrs, datos_cliente)
+        
+        datos_pqrs = f"""Genera una respuesta formal y completa para la siguiente {self.tipos_pqrs[tipo_pqrs]}:
+
+Radicado: {radicado}
+Fecha: {datetime.now().strftime('%d de %B de %Y')}
+
+Datos del usuario:
+- Nombre: {datos_cliente['nombre_completo']}
+- Cédula: {datos_cliente['cedula']}
+- Contrato: {datos_cliente['numero_contrato']}
+- Dirección: {datos_cliente['direccion']}
+- Estrato: {datos_cliente['estrato']}
+- Tipo de usuario: {datos_cliente['tipo_usuario']}
+
+Contexto de la {self.tipos_pqrs[tipo_pqrs]}:
+{contexto}"""
+        
+        return SYSTEM_PROMPT, INSTRUCCIONES_RESPUESTA, datos_pqrs
+    
+    def campos_prompt(self, tipo_pqrs, datos_cliente):
+        """Retorna los datos del cliente que entran al prompt (sin fecha ni radicado)"""
+        return {
+            'nombre_completo': datos_cliente['nombre_completo'],
+            'cedula': datos_cliente['cedula'],
+            'numero_contrato': datos_cliente['numero_contrato'],
+            'direccion': datos_cliente['direccion'],
+            'estrato': datos_cliente['estrato'],
+            'tipo_usuario': datos_cliente['tipo_usuario'],
+            'contexto': self.generar_contexto_pqrs(tipo_pqrs, datos_cliente)
+        }
+    
+    def usa_cache_de_prompt(self, model_id=None):
+        """Indica si el modelo (por defecto el configurado) cachea el prefijo del prompt
+
+        Requiere que el modelo admita cache_control y que el prefijo alcance su
+        mínimo de tokens; si no, marcarlo no ahorra nada.
+        """
+        model_id = model_id or self.model_id
+        return configuracion.PROMPT_CACHE_HABILITADO and any(
+            modelo in model_id and TOKENS_PREFIJO >= minimo
+            for modelo, minimo in configuracion.PROMPT_CACHE_MODELOS.items()
+        )
+    
+    def planificar(self, tipo_pqrs):
+        """Modelo y max_tokens de la próxima llamada del tipo, degradados si el presupuesto lo exige
+
+        Retorna {'modelo', 'max_tokens', 'degradado'}; degradado es None,
+        'max_tokens' o 'modelo'.
+        """
+        plan = {'modelo': self.model_id, 'max_tokens': self.parametros_modelo['max_tokens'], 'degradado': None}
+        if self.contabilidad is None:
+            return plan
+        try:
+            return self.contabilidad.planificar(tipo_pqrs, plan['modelo'], plan['max_tokens'])
+        except Exception:
+            logger.exception("No se pudo consultar el presupuesto de tokens")
+            return plan
+    
+    def construir_body(self, tipo_pqrs, datos_cliente, radicado, plan=None, ejemplo=None):
+        """Construye el cuerpo JSON de la solicitud a Bedrock
+
+        ejemplo es la carta adaptada de un caso similar, que se incluye como referencia.
+        """
+        with self.metricas.medir('construir_prompt'):
+            return self._construir_body(tipo_pqrs, datos_cliente, radicado, plan, ejemplo)
+    
+    def _construir_body(self, tipo_pqrs, datos_cliente, radicado, plan=None, ejemplo=None):
+        system_prompt, instrucciones, datos_pqrs = self.construir_prompts(tipo_pqrs, datos_cliente, radicado)
+        plan = plan or self.planificar(tipo_pqrs)
+        variables = [datos_pqrs] if ejemplo is None else [EJEMPLO_CASO_SIMILAR.format(carta=ejemplo), datos_pqrs]
+        
+        if self.usa_cache_de_prompt(plan['modelo']):
+            # El punto de corte queda al final de las instrucciones: todo lo anterior se cachea
+            system = [{"type": "text", "text": system_prompt}]
+            contenido = [{"type": "text", "text": instrucciones, "cache_control": {"type": "ephemeral"}}]
+            contenido += [{"type": "text", "text": texto} for texto in variables]
+        else:
+            system = system_prompt
+            contenido = "\n\n".join([instrucciones] + variables)
+        
+        return json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": plan["max_tokens"],
+            "system": system,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": contenido
+                }
+            ],
+            "temperature": self.parametros_modelo["temperature"],
+            "top_p": self.parametros_modelo["top_p"],
+        })
+    
+    def asignar_radicado(self, tipo_pqrs, datos_cliente):
+        """Retorna el radicado de una solicitud
+
+        Un reenvío del mismo contrato y tipo dentro de la ventana configurada
+        conserva el radicado ya asignado.
+        """
+        if self.cache is None:
+            return self.generar_radicado(tipo_pqrs)
+        return self.cache.asignar_radicado(datos_cliente['numero_contrato'], tipo_pqrs,
+                                           lambda: self.generar_radicado(tipo_pqrs))
+    
+    def buscar_caso_similar(self, tipo_pqrs, datos_cliente, radicado, umbral=None):
+        """El caso resuelto más parecido (desde umbral) con su carta adaptada a este cliente, o None
+
+        Retorna {'radicado', 'similitud', 'texto'}; umbral es por defecto
+        CASOS_UMBRAL_EJEMPLO. Los casos cuya carta no se puede adaptar se saltan.
+        """
+        if self.casos is None or self.almacen is None:
+            return None
+        umbral = configuracion.CASOS_UMBRAL_EJEMPLO if umbral is None else umbral
+        try:
+            with self.metricas.medir('casos_similares'):
+                for candidato in self.casos.similares(tipo_pqrs, datos_cliente, configuracion.CASOS_TOP_K):
+                    if candidato['similitud'] < umbral:
+                        break
+                    previo = self.almacen.obtener(candidato['radicado'])
+                    texto = personalizar_carta(previo, datos_cliente, radicado) if previo else None
+                    if texto is not None:
+                        return dict(candidato, texto=texto)
+        except Exception:
+            logger.exception("No se pudo buscar un caso similar para %s", radicado)
+        return None
+    
+    def sugerir_reutilizacion(self, tipo_pqrs, datos_cliente):
+        """Caso casi idéntico (desde CASOS_UMBRAL_REUTILIZAR) que la interfaz puede ofrecer, o None
+
+        La carta adaptada lleva RADICADO_POR_ASIGNAR: es una vista previa para
+        que el agente la revise. Solo reutilizar_caso la entrega.
+        """
+        caso = self.buscar_caso_similar(tipo_pqrs, datos_cliente, RADICADO_POR_ASIGNAR,
+                                        umbral=configuracion.CASOS_UMBRAL_REUTILIZAR)
+        if caso is not None:
+            self.casos.registrar('ofrecidas')
+        return caso
+    
+    def reutilizar_caso(self, tipo_pqrs, datos_cliente, radicado_caso):
+        """Entrega la carta de un caso similar adaptada a este cliente, sin llamar a Bedrock
+
+        Solo se llama cuando el agente confirma la reutilización. Retorna
+        (texto, radicado, error) como generar_respuesta_bedrock; la carta se
+        guarda como copia (desde_cache) y no entra al índice de casos.
+        """
+        fecha = datetime.now()
+        inicio = time.perf_counter()
+        previo = self.almacen.obtener(radicado_caso) if self.almacen is not None else None
+        if previo is None or previo['texto'] is None:
+            return None, None, f"El caso {radicado_caso} ya no está en el almacén"
+        
+        radicado = self.asignar_radicado(tipo_pqrs, datos_cliente)
+        texto = personalizar_carta(previo, datos_cliente, radicado)
+        if texto is None:
+            return None, None, f"La carta del caso {radicado_caso} no se pudo adaptar a este cliente"
+        self._persistir(radicado, tipo_pqrs, datos_cliente, fecha, texto=texto, desde_cache=True,
+                        tiempo_total=time.perf_counter() - inicio, modelo=previo['modelo'])
+        if self.casos is not None:
+            self.casos.registrar('reutilizadas')
+        return texto, radicado, None
+    
+    def _preparar_solicitud(self, tipo_pqrs, datos_cliente, regenerar, radicado, plan):
+        """Asigna el radicado (si no viene ya asignado) y consulta el cache y los casos similares
+
+        Retorna (radicado, clave_cache, texto_cacheado, caso_similar).
+        texto_cacheado es la carta del cache; caso_similar, el caso cuya carta
+        va en el prompt como ejemplo. La clave incluye el modelo y max_tokens
+        del plan: una carta degradada no reemplaza a la completa. Con
+        regenerar no se usa ni el cache ni los casos similares.
+        """
+        radicado = radicado or self.asignar_radicado(tipo_pqrs, datos_cliente)
+        clave = None
+        if self.cache is not None:
+            parametros = dict(self.parametros_modelo, max_tokens=plan['max_tokens'], version_prompt=VERSION_PROMPT)
+            clave = clave_cache(tipo_pqrs, plan['modelo'], parametros, self.campos_prompt(tipo_pqrs, datos_cliente))
+        if regenerar:
+            return radicado, clave, None, None
+        
+        entrada = self.cache.obtener(clave) if clave is not None else None
+        if entrada is not None:
+            # La carta cacheada puede citar el radicado con el que se generó
+            return radicado, clave, entrada['texto'].replace(entrada['radicado'], radicado), None
+        
+        caso = self.buscar_caso_similar(tipo_pqrs, datos_cliente, radicado)
+        if self.casos is not None:
+            self.casos.registrar('ejemplos' if caso is not None else 'sin_caso')
+        return radicado, clave, None, caso
+    
+    def _persistir(self, radicado, tipo_pqrs, datos_cliente, fecha, texto=None, error=None,
+                   desde_cache=False, tiempo_total=None, tiempo_primer_token=None, modelo=None):
+        """Guarda la PQRS en el almacén; un fallo aquí no interrumpe la generación"""
+        if self.almacen is None or radicado is None:
+            return
+        try:
+            self.almacen.guardar_pqrs({
+                'radicado': radicado,
+                'fecha': fecha,
+                'tipo': tipo_pqrs,
+                'datos_cliente': datos_cliente,
+                'texto': texto,
+                'modelo': modelo or self.model_id,
+                'estado': 'Error' if error else 'Completada',
+                'error': error,
+                'desde_cache': desde_cache,
+                'tiempo_total_ms': int(tiempo_total * 1000) if tiempo_total is not None else None,
+                'tiempo_primer_token_ms': int(tiempo_primer_token * 1000) if tiempo_primer_token is not None else None
+            })
+        except Exception:
+            logger.exception("No se pudo guardar la PQRS %s", radicado)
+    
+    def _contabilizar(self, tipo_pqrs, modelo, usage, radicado, razon_fin):
+        """Registra el uso de la llamada en memoria y, si hay contabilidad, en SQLite"""
+        self.ultimo_uso = registrar_uso(tipo_pqrs, modelo, usage, radicado, razon_fin)
+        if self.contabilidad is None:
+            return
+        try:
+            self.contabilidad.registrar(self.ultimo_uso)
+        except Exception:
+            logger.exception("No se pudo contabilizar el uso de %s", radicado)
+    
+    def _invocar(self, llamada):
+        """Ejecuta la llamada a Bedrock a través de la capa de resiliencia, si hay una"""
+        if self.resiliencia is None:
+            return llamada()
+        return self.resiliencia.ejecutar(llamada)
+    
+    def _abrir_stream(self, llamada):
+        """Abre el stream a través de la capa de resiliencia; retorna (respuesta, cerrar o None)
+
+        cerrar(excepcion) libera la ranura de concurrencia al consumir el stream.
+        """
+        if self.resiliencia is None:
+            return llamada(), None
+        return self.resiliencia.abrir_stream(llamada)
+    
+    def generar_respuesta_bedrock(self, tipo_pqrs, datos_cliente, regenerar=False, radicado=None,
+                                  lanzar=False):
+        """Genera la respuesta usando Claude a través de Bedrock
+
+        Con regenerar=True se ignora el cache y se solicita una respuesta nueva.
+        radicado permite usar uno asignado de antemano (cola de trabajos).
+        Con lanzar=True el error se registra igual pero la excepción se
+        propaga, para que quien llama decida si reintentar.
+        """
+        if not self.bedrock_client:
+            return None, None, "Bedrock no está configurado correctamente"
+        
+        fecha = datetime.now()
+        inicio = time.perf_counter()
+        
+        plan = self.planificar(tipo_pqrs)
+        
+        try:
+            radicado, clave, texto_cacheado, caso = self._preparar_solicitud(
+                tipo_pqrs, datos_cliente, regenerar, radicado, plan
+            )
+            if texto_cacheado is not None:
+                self._persistir(radicado, tipo_pqrs, datos_cliente, fecha, texto=texto_cacheado,
+                                desde_cache=True, tiempo_total=time.perf_counter() - inicio,
+                                modelo=plan['modelo'])
+                return texto_cacheado, radicado, None
+            
+            # Configurar la solicitud
+            body = self.construir_body(tipo_pqrs, datos_cliente, radicado, plan,
+                                       ejemplo=caso['texto'] if caso else None)
+            
+            # Invocar el modelo; la lectura del cuerpo también puede fallar por timeout
+            def llamada():
+                response = self.bedrock_client.invoke_model(
+                    body=body,
+                    modelId=plan['modelo'],
+                    accept='application/json',
+                    contentType='application/json'
+                )
+                return response.get('body').read()
+            
+            with self.metricas.medir('bedrock_total'):
+                contenido = self._invocar(llamada)
+            
+            # Procesar respuesta
+            with self.metricas.medir('parseo_respuesta'):
+                response_body = json.loads(contenido)
+                respuesta_texto = response_body['content'][0]['text'].strip()
+            self._contabilizar(tipo_pqrs, plan['modelo'], response_body.get('usage'), radicado,
+                               response_body.get('stop_reason'))
+            
+            if clave is not None:
+                self.cache.guardar(clave, respuesta_texto, radicado)
+            
+            self._persistir(radicado, tipo_pqrs, datos_cliente, fecha, texto=respuesta_texto,
+                            tiempo_total=time.perf_counter() - inicio, modelo=plan['modelo'])
+            return respuesta_texto, radicado, None
+            
+        except Exception as e:
+            error = f"Error generando respuesta: {str(e)}"
+            self._persistir(radicado, tipo_pqrs, datos_cliente, fecha, error=error,
+                            tiempo_total=time.perf_counter() - inicio, modelo=plan['modelo'])
+            if lanzar:
+                raise
+            return None, None, error
+    
+    def generar_respuesta_bedrock_stream(self, tipo_pqrs, datos_cliente, regenerar=False):
+        """Inicia la generación en modo streaming y retorna una RespuestaStreaming"""
+        if not self.bedrock_client:
+            return RespuestaStreaming(None, None, error="Bedrock no está configurado correctamente")
+        
+        fecha = datetime.now()
+        inicio = time.perf_counter()
+        radicado = clave = None
+        inicio_bedrock = None
+        cerrar_stream = None
+        plan = self.planificar(tipo_pqrs)
+        
+        def al_terminar(streaming):
+            if cerrar_stream is not None:
+                cerrar_stream(streaming.excepcion)
+            tiempo_primer_token = None
+            if streaming.primer_fragmento is not None:
+                tiempo_primer_token = streaming.primer_fragmento - streaming.inicio
+            if inicio_bedrock is not None:
+                if streaming.primer_fragmento is not None:
+                    self.metricas.observar('bedrock_primer_token', streaming.primer_fragmento - inicio_bedrock)
+                self.metricas.observar('bedrock_total', streaming.fin - inicio_bedrock)
+                self.metricas.observar('parseo_respuesta', streaming.segundos_parseo)
+            if not streaming.error and not streaming.desde_cache:
+                self._contabilizar(tipo_pqrs, plan['modelo'], streaming.uso, radicado, streaming.razon_fin)
+                if clave is not None:
+                    self.cache.guardar(clave, streaming.texto.strip(), radicado)
+            self._persistir(radicado, tipo_pqrs, datos_cliente, fecha,
+                            texto=None if streaming.error else streaming.texto.strip(),
+                            error=streaming.error, desde_cache=streaming.desde_cache,
+                            tiempo_total=streaming.fin - streaming.inicio,
+                            tiempo_primer_token=tiempo_primer_token, modelo=plan['modelo'])
+        
+        try:
+            radicado, clave, texto_cacheado, caso = self._preparar_solicitud(
+                tipo_pqrs, datos_cliente, regenerar, None, plan
+            )
+            if texto_cacheado is not None:
+                return RespuestaStreaming(radicado, None, texto_cache=texto_cacheado,
+                                          al_terminar=al_terminar, inicio=inicio)
+            
+            body = self.construir_body(tipo_pqrs, datos_cliente, radicado, plan,
+                                       ejemplo=caso['texto'] if caso else None)
+            inicio_bedrock = time.perf_counter()
+            # Los reintentos cubren la apertura del stream, donde ocurre el throttling;
+            # la ranura de concurrencia se libera en al_terminar
+            response, cerrar_stream = self._abrir_stream(lambda: self.bedrock_client.invoke_model_with_response_stream(
+                body=body,
+                modelId=plan['modelo'],
+                accept='application/json',
+                contentType='application/json'
+            ))
+            
+            return RespuestaStreaming(radicado, response.get('body'), al_terminar=al_terminar, inicio=inicio,
+                                      caso_similar=caso)
+        except Exception as e:
+            if cerrar_stream is not None:
+                cerrar_stream(e)
+            error = f"Error generando respuesta: {str(e)}"
+            self._persistir(radicado, tipo_pqrs, datos_cliente, fecha, error=error,
+                            tiempo_total=time.perf_counter() - inicio, modelo=plan['modelo'])
+            return RespuestaStreaming(None, None, error=error)
+    
+    def _documento(self, clave, renderizar):
+        """Bytes del documento: cache en memoria, luego el almacén y si no, se renderiza"""
+        cache = self.artefactos if self.artefactos is not None else obtener_cache_artefactos()
+        
+        def generar():
+            if self.almacen is not None:
+                contenido = self.almacen.obtener_documento(clave)
+                if contenido is not None:
+                    return contenido
+            with self.metricas.medir(f'render_{clave[0]}'):
+                return renderizar()
+        
+        return cache.obtener_o_generar(clave, generar)
+    
+    def documento_word_bytes(self, texto, radicado, datos_cliente):
+        """Retorna el documento Word en bytes, reutilizando el ya renderizado si existe"""
+        return self._documento(
+            clave_artefacto('docx', radicado, texto, VERSION_PLANTILLA_WORD),
+            lambda: renderizar_documento_word(self, VERSION_PLANTILLA_WORD, texto, radicado, datos_cliente)
+        )
+    
+    def documento_pdf_bytes(self, texto, radicado, datos_cliente):
+        """Retorna el documento PDF en bytes, reutilizando el ya renderizado si existe"""
+        return self._documento(
+            clave_artefacto('pdf', radicado, texto, VERSION_PLANTILLA_PDF),
+            lambda: self.escribir_documento_pdf(BytesIO(), texto, radicado, datos_cliente).getvalue()
+        )
+    
+    def archivar_documento_word(self, texto, radicado, datos_cliente):
+        """Renderiza el documento Word y lo guarda en el almacén junto a la carta"""
+        contenido = self.documento_word_bytes(texto, radicado, datos_cliente)
+        if self.almacen is not None:
+            self.almacen.guardar_documento(clave_artefacto('docx', radicado, texto, VERSION_PLANTILLA_WORD), contenido)
+        return contenido
+    
+    def escribir_documento_pdf(self, buffer, texto, radicado, datos_cliente):
+        """Escribe el documento PDF en el buffer del llamador y lo retorna"""
+        # reportlab se carga con el primer PDF, no al importar el generador
+        from plantilla_pdf import escribir_documento_pdf
+        
+        return escribir_documento_pdf(self, VERSION_PLANTILLA_PDF, buffer, texto, radicado, datos_cliente)
+    
+    def generar_documento_word(self, texto, radicado, datos_cliente):
+        """Genera documento Word con la respuesta"""
+        doc = self.construir_documento_word(
+            parrafos=texto.split('\n\n'),
+            radicado=radicado,
+            nombre=datos_cliente['nombre_completo'],
+            direccion=datos_cliente['direccion'],
+            fecha=datetime.now().strftime('%d de %B de %Y'),
+            tipo=self.tipos_pqrs[radicado[4]].lower()
+        )
+        
+        # Guardar en memoria
+        doc_buffer = BytesIO()
+        doc.save(doc_buffer)
+        doc_buffer.seek(0)
+        
+        return doc_buffer
+    
+    def construir_documento_word(self, parrafos, radicado, nombre, direccion, fecha, tipo):
+        """Construye el árbol python-docx de la carta
+
+        También lo usa plantilla_word para armar la plantilla con marcadores,
+        por eso recibe los textos ya resueltos y no los datos del cliente.
+        """
+        # python-docx se carga con el primer documento, no al importar el generador
+        from docx import Document
+        from docx.shared import Pt, RGBColor, Inches, Cm
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        
+        doc = Document()
+        
+        # Configurar márgenes
+        for section in doc.sections:
+            section.top_margin = Cm(2.5)
+            section.bottom_margin = Cm(2.5)
+            section.left_margin = Cm(3)
+            section.right_margin = Cm(3)
+        
+        # Agregar logo en el encabezado
+        header = doc.sections[0].header
+        header_table = header.add_table(rows=1, cols=2, width=doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin)
+        header_table.autofit = False
+        
+        # Celda del logo
+        logo_cell = header_table.cell(0, 0)
+        logo_paragraph = logo_cell.paragraphs[0]
+        
+        # python-docx no admite webp: se usa la variante PNG ya escalada
+        logo_png = obtener_recursos(self.logo_path).logo_png(ANCHO_DOCUMENTO) if self.logo_path else None
+        try:
+            run = logo_paragraph.add_run()
+            run.add_picture(BytesIO(logo_png), width=Inches(2))
+        except:
+            # Si no se puede cargar el logo, agregar texto
+            run = logo_paragraph.add_run('VEOLIA')
+            run.font.size = Pt(14)
+            run.font.bold = True
+            run.font.color.rgb = RGBColor(0, 75, 135)
+        
+        # Celda del texto
+        text_cell = header_table.cell(0, 1)
+        text_paragraph = text_cell.paragraphs[0]
+        text_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        run = text_paragraph.add_run('Gestión del Agua y Servicios Ambientales')
+        run.font.size = Pt(10)
+        run.font.color.rgb = RGBColor(0, 75, 135)
+        
+        # Espaciado después del encabezado
+        doc.add_paragraph()
+        
+        # Fecha y radicado
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        p.add_run(f"Bogotá D.C., {fecha}\n").font.size = Pt(11)
+        p.add_run(f"Radicado: {radicado}").font.size = Pt(11)
+        
+        doc.add_paragraph()
+        
+        # Destinatario
+        p = doc.add_paragraph()
+        p.add_run(f"Señor(a)\n{nombre}\n{direccion}\nBogotá D.C.").font.size = Pt(11)
+        
+        doc.add_paragraph()
+        
+        # Asunto
+        p = doc.add_paragraph()
+        run = p.add_run(f"Asunto: Respuesta a {tipo} radicada")
+        run.font.bold = True
+        run.font.size = Pt(11)
+        
+        doc.add_paragraph()
+        
+        # Saludo
+        p = doc.add_paragraph()
+        p.add_run("Respetado(a) señor(a):").font.size = Pt(11)
+        
+        doc.add_paragraph()
+        
+        # Contenido
+        for parrafo in parrafos:
+            if parrafo.strip():
+                p = doc.add_paragraph()
+                p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                p.add_run(parrafo).font.size = Pt(11)
+        
+        doc.add_paragraph()
+        
+        # Despedida
+        p = doc.add_paragraph()
+        p.add_run("Cordialmente,").font.size = Pt(11)
+        
+        doc.add_paragraph()
+        doc.add_paragraph()
+        
+        # Firma
+        p = doc.add_paragraph()
+        run = p.add_run("MARÍA FERNANDA LÓPEZ GARCÍA\nCoordinadora Servicio al Cliente\nVeolia Colombia")
+        run.font.bold = True
+        run.font.size = Pt(11)
+        
+        # Pie de página
+        footer = doc.sections[0].footer
+        p = footer.paragraphs[0]
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = p.add_run('Veolia Colombia - Comprometidos con el Medio Ambiente\n')
+        run.font.size = Pt(8)
+        run.font.color.rgb = RGBColor(0, 169, 130)
+        run = p.add_run('Línea gratuita nacional: 01 8000 123 456 - www.veolia.com.co')
+        run.font.size = Pt(8)
+        
+        return doc
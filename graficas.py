@@ -0,0 +1,51 @@
+# ============================================================================
+# GRÁFICAS
+# ============================================================================
+# Figuras de plotly sin llamadas a st.*: se pueden construir y medir fuera de
+# Streamlit. plotly se importa al crear la primera figura.
+
+
+def crear_grafica_consumos(datos):
+    """Crea gráfica de consumos históricos"""
+    import plotly.graph_objects as go
+
+    meses = [c['mes'] for c in datos['consumos_historicos']]
+    consumos = [c['consumo'] for c in datos['consumos_historicos']]
+
+    fig = go.Figure()
+
+    # Línea de consumo
+    fig.add_trace(go.Scatter(
+        x=meses,
+        y=consumos,
+        mode='lines+markers',
+        name='Consumo mensual',
+        line=dict(color='#00A982', width=3),
+        marker=dict(size=10, color='#00A982')
+    ))
+
+    # Línea de promedio
+    promedio = datos['consumo_promedio']
+    fig.add_trace(go.Scatter(
+        x=meses,
+        y=[promedio] * len(meses),
+        mode='lines',
+        name='Promedio',
+        line=dict(color='#004B87', width=2, dash='dash')
+    ))
+
+    fig.update_layout(
+        title='Histórico de Consumos (m³)',
+        xaxis_title='Mes',
+        yaxis_title='Consumo (m³)',
+        height=400,
+        hovermode='x unified',
+        showlegend=True,
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+
+    fig.update_xaxes(gridcolor='lightgray')
+    fig.update_yaxes(gridcolor='lightgray')
+
+    return fig
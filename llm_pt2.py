@@ -1,27 +1,33 @@
-import os
+import html
+import time
 import streamlit as st
-import boto3
 import json
-import random
+import os
+import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import base64
-from io import BytesIO
-from PIL import Image
 
-# Librerías para generación de documentos
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches, Cm
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+# pandas, plotly, boto3, python-docx y reportlab se importan en su primer uso
+# (tablas, gráficas, primera generación y descargas), no al arrancar.
+import configuracion
+from bedrock_cliente import ClienteBedrockDiferido, estadisticas_pool
+from generador_pqrs import VeoliaPQRSGenerator
+import lote_pqrs
+from graficas import crear_grafica_consumos
+from cache_respuestas import obtener_cache_respuestas
+from casos_similares import obtener_indice_casos
+from uso_tokens import obtener_contabilidad, resumen_uso
+from almacen_pqrs import CUBETAS_LATENCIA_MS, MARCA_FIN, MARCA_INICIO, obtener_almacen
+from artefactos import obtener_cache_artefactos
+from resiliencia import obtener_resiliencia
+from motor_generacion import obtener_motor
+from metricas import iniciar_exportacion, obtener_metricas
+import cola_trabajos
+import exportacion_historial
+from recursos import ANCHO_ENCABEZADO, ANCHO_PIE, ANCHO_SIDEBAR, ANCHO_VISTA_PREVIA, obtener_recursos
+
+# Duración del rerun completo, observada al final del script
+inicio_rerun = time.perf_counter()
 
 # ============================================================================
 # CONFIGURACIÓN DE STREAMLIT
@@ -34,694 +40,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Ruta del logo
-LOGO_PATH = "/Users/michaelmoreno/Desktop/T Logic/Veolia/sistemapqrs/RGB_VEOLIA_HD-1024x418.webp"
-
-# Función para cargar el logo
-def get_logo_base64():
-    """Convierte el logo a base64 para usar en HTML"""
-    try:
-        with open(LOGO_PATH, "rb") as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
-    except:
-        return None
-
-# CSS Profesional con colores de Veolia
-logo_base64 = get_logo_base64()
-st.markdown(f"""
-<style>
-    /* Variables de color Veolia */
-    :root {{
-        --veolia-primary: #00A982;
-        --veolia-secondary: #004B87;
-        --veolia-light: #E8F5F1;
-        --veolia-dark: #003865;
-        --veolia-accent: #7ED321;
-        --text-primary: #212529;
-        --text-secondary: #6C757D;
-        --background: #F8F9FA;
-        --card-background: #FFFFFF;
-        --border-color: #DEE2E6;
-        --success-color: #28A745;
-        --warning-color: #FFC107;
-        --error-color: #DC3545;
-    }}
-
-    /* Estilos generales */
-    .stApp {{
-        background-color: var(--background);
-    }}
-
-    /* Logo container */
-    .logo-container {{
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        padding: 1rem 0;
-        background: white;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-    }}
-
-    .logo-container img {{
-        max-width: 200px;
-        height: auto;
-    }}
-
-    /* Header principal con logo */
-    .main-header {{
-        background: linear-gradient(135deg, var(--veolia-secondary) 0%, var(--veolia-primary) 100%);
-        padding: 2.5rem;
-        border-radius: 20px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.15);
-        position: relative;
-        overflow: hidden;
-    }}
-
-    .main-header::before {{
-        content: "";
-        position: absolute;
-        top: -50%;
-        right: -50%;
-        width: 200%;
-        height: 200%;
-        background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 70%);
-        transform: rotate(45deg);
-    }}
-
-    .main-header-logo {{
-        width: 150px;
-        margin-bottom: 1rem;
-        filter: brightness(0) invert(1);
-    }}
-
-    .main-header h1 {{
-        font-size: 2.5rem;
-        font-weight: 700;
-        margin-bottom: 0.5rem;
-        position: relative;
-        z-index: 1;
-    }}
-
-    .main-header p {{
-        font-size: 1.1rem;
-        opacity: 0.95;
-        position: relative;
-        z-index: 1;
-    }}
-
-    /* Cards y contenedores */
-    .service-card {{
-        background: var(--card-background);
-        padding: 2rem;
-        border-radius: 15px;
-        box-shadow: 0 5px 20px rgba(0,0,0,0.08);
-        margin: 1.5rem 0;
-        border: 1px solid var(--border-color);
-        transition: all 0.3s ease;
-        position: relative;
-        overflow: hidden;
-    }}
-
-    .service-card:hover {{
-        transform: translateY(-2px);
-        box-shadow: 0 8px 25px rgba(0,0,0,0.12);
-        border-color: var(--veolia-primary);
-    }}
-
-    .service-card::after {{
-        content: "";
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 3px;
-        background: var(--veolia-primary);
-        transition: left 0.3s ease;
-    }}
-
-    .service-card:hover::after {{
-        left: 0;
-    }}
-
-    /* Métricas */
-    .metric-container {{
-        background: linear-gradient(135deg, var(--veolia-light) 0%, #FFFFFF 100%);
-        padding: 1.5rem;
-        border-radius: 12px;
-        text-align: center;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-        border: 1px solid var(--veolia-primary);
-        transition: all 0.3s ease;
-    }}
-
-    .metric-container:hover {{
-        transform: scale(1.02);
-        box-shadow: 0 6px 20px rgba(0,0,0,0.08);
-    }}
-
-    .metric-value {{
-        font-size: 2rem;
-        font-weight: 700;
-        color: var(--veolia-secondary);
-        margin: 0.5rem 0;
-    }}
-
-    .metric-label {{
-        font-size: 0.9rem;
-        color: var(--text-secondary);
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-    }}
-
-    /* Documento preview con logo */
-    .document-preview {{
-        background: white;
-        border: 1px solid var(--border-color);
-        border-radius: 8px;
-        padding: 2rem;
-        margin: 1rem 0;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-        font-family: 'Times New Roman', serif;
-        line-height: 1.6;
-    }}
-
-    .document-header {{
-        display: flex;
-        justify-content: space-between;
-        align-items: flex-start;
-        margin-bottom: 2rem;
-    }}
-
-    .document-header-text {{
-        text-align: right;
-        color: var(--veolia-secondary);
-        font-weight: bold;
-    }}
-
-    .document-logo {{
-        width: 120px;
-        height: auto;
-    }}
-
-    .document-subject {{
-        font-weight: bold;
-        margin: 1rem 0;
-    }}
-
-    /* Botones personalizados */
-    .stButton > button {{
-        background: var(--veolia-primary);
-        color: white;
-        border: none;
-        padding: 0.75rem 2rem;
-        border-radius: 8px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 15px rgba(0,169,130,0.3);
-    }}
-
-    .stButton > button:hover {{
-        background: var(--veolia-secondary);
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(0,169,130,0.4);
-    }}
-
-    /* Selectbox y inputs */
-    .stSelectbox > div > div {{
-        background: white;
-        border: 2px solid var(--border-color);
-        border-radius: 8px;
-        transition: all 0.3s ease;
-    }}
-
-    .stSelectbox > div > div:focus-within {{
-        border-color: var(--veolia-primary);
-        box-shadow: 0 0 0 3px rgba(0,169,130,0.1);
-    }}
-
-    .stTextInput > div > div {{
-        background: white;
-        border: 2px solid var(--border-color);
-        border-radius: 8px;
-        transition: all 0.3s ease;
-    }}
-
-    .stTextInput > div > div:focus-within {{
-        border-color: var(--veolia-primary);
-        box-shadow: 0 0 0 3px rgba(0,169,130,0.1);
-    }}
-
-    /* Tabs mejoradas */
-    .stTabs [data-baseweb="tab-list"] {{
-        gap: 2rem;
-        background: transparent;
-        border-bottom: 2px solid var(--border-color);
-    }}
-
-    .stTabs [data-baseweb="tab"] {{
-        height: 50px;
-        padding: 0 2rem;
-        background: transparent;
-        border: none;
-        color: var(--text-secondary);
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }}
-
-    .stTabs [aria-selected="true"] {{
-        background: transparent;
-        color: var(--veolia-primary);
-        border-bottom: 3px solid var(--veolia-primary);
-    }}
-
-    /* Sidebar */
-    .css-1d391kg {{
-        background: var(--card-background);
-        padding: 1.5rem;
-    }}
-
-    /* Info boxes */
-    .info-box {{
-        background: var(--veolia-light);
-        border-left: 4px solid var(--veolia-primary);
-        padding: 1rem 1.5rem;
-        border-radius: 0 8px 8px 0;
-        margin: 1rem 0;
-    }}
-
-    .warning-box {{
-        background: #FFF3CD;
-        border-left: 4px solid var(--warning-color);
-        padding: 1rem 1.5rem;
-        border-radius: 0 8px 8px 0;
-        margin: 1rem 0;
-    }}
-
-    .success-box {{
-        background: #D4EDDA;
-        border-left: 4px solid var(--success-color);
-        padding: 1rem 1.5rem;
-        border-radius: 0 8px 8px 0;
-        margin: 1rem 0;
-    }}
-
-    /* Estados de PQRS */
-    .pqrs-type-badge {{
-        display: inline-block;
-        padding: 0.5rem 1rem;
-        border-radius: 20px;
-        font-weight: 600;
-        font-size: 0.9rem;
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-    }}
-
-    .pqrs-peticion {{
-        background: #E3F2FD;
-        color: #1976D2;
-    }}
-
-    .pqrs-queja {{
-        background: #FFF3E0;
-        color: #F57C00;
-    }}
-
-    .pqrs-reclamo {{
-        background: #FFEBEE;
-        color: #D32F2F;
-    }}
-
-    .pqrs-sugerencia {{
-        background: #E8F5E9;
-        color: #388E3C;
-    }}
-
-    /* Animaciones */
-    @keyframes fadeIn {{
-        from {{ opacity: 0; transform: translateY(10px); }}
-        to {{ opacity: 1; transform: translateY(0); }}
-    }}
-
-    .fade-in {{
-        animation: fadeIn 0.5s ease-out;
-    }}
-
-    /* Progress indicator */
-    .progress-step {{
-        display: flex;
-        align-items: center;
-        margin: 1rem 0;
-    }}
-
-    .progress-circle {{
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        background: var(--veolia-primary);
-        color: white;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-weight: bold;
-        margin-right: 1rem;
-    }}
-
-    .progress-circle.inactive {{
-        background: var(--border-color);
-        color: var(--text-secondary);
-    }}
-
-    /* Responsive */
-    @media (max-width: 768px) {{
-        .main-header h1 {{
-            font-size: 2rem;
-        }}
-        
-        .service-card {{
-            padding: 1.5rem;
-        }}
-        
-        .document-logo {{
-            width: 80px;
-        }}
-    }}
-</style>
-""", unsafe_allow_html=True)
-
-# ============================================================================
-# CLASES PRINCIPALES
-# ============================================================================
-
-class VeoliaPQRSGenerator:
-    """Generador de respuestas PQRS usando AWS Bedrock"""
-    
-    def __init__(self):
-        self.bedrock_client = None
-        self.model_id = "us.anthropic.claude-sonnet-4-20250514-v1:0"
-        self.tipos_pqrs = {
-            'P': 'PETICIÓN',
-            'Q': 'QUEJA',
-            'R': 'RECLAMO',
-            'S': 'SUGERENCIA'
-        }
-        self.logo_path = LOGO_PATH
-        
-        # Inicializar Bedrock
-        try:
-            self.bedrock_client = boto3.client(
-                service_name='bedrock-runtime',
-                region_name='us-east-1',
-                aws_access_key_id=st.secrets.get("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=st.secrets.get("AWS_SECRET_ACCESS_KEY")
-            )
-        except Exception as e:
-            st.error(f"Error inicializando Bedrock: {e}")
-    
-    def generar_radicado(self, tipo_pqrs):
-        """Genera un número de radicado único"""
-        fecha = datetime.now().strftime("%Y%m%d")
-        numero = datetime.now().strftime("%H%M%S")
-        return f"VEO-{tipo_pqrs}-{fecha}-{numero}"
-    
-    def generar_datos_cliente(self, numero_contrato):
-        """Genera datos ficticios del cliente basados en el número de contrato"""
-        random.seed(int(numero_contrato))
-        
-        barrios = ["Santa Bárbara", "Chapinero Alto", "Usaquén", "Cedritos", "La Castellana", 
-                   "Salitre", "Teusaquillo", "Chicó", "Rosales", "Colina Campestre"]
-        
-        nombres = ["Ana María", "Juan Carlos", "Patricia", "Luis Alberto", "Carolina", 
-                  "José Manuel", "Martha Lucía", "Carlos Andrés", "María José", "Diego Alejandro"]
-        
-        apellidos = ["González", "Rodríguez", "Martínez", "López", "Sánchez", 
-                    "Ramírez", "Torres", "Herrera", "Jiménez", "Morales"]
-        
-        # Generar datos del cliente
-        nombre = random.choice(nombres)
-        apellido1 = random.choice(apellidos)
-        apellido2 = random.choice(apellidos)
-        nombre_completo = f"{nombre} {apellido1} {apellido2}"
-        
-        # Generar consumos históricos
-        consumo_base = random.randint(15, 35)
-        consumos_historicos = []
-        meses = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio"]
-        
-        for i in range(6):
-            variacion = random.randint(-3, 3)
-            consumo = max(10, consumo_base + variacion)
-            consumos_historicos.append({
-                'mes': meses[i],
-                'consumo': consumo,
-                'año': 2024
-            })
-        
-        promedio_consumo = sum(c['consumo'] for c in consumos_historicos) / len(consumos_historicos)
-        ultimo_consumo = consumos_historicos[-1]['consumo']
-        
-        # Calcular valores según estrato
-        estrato = random.randint(1, 6)
-        tarifas_m3 = {1: 2000, 2: 2500, 3: 3000, 4: 3500, 5: 4000, 6: 4500}
-        valor_m3 = tarifas_m3[estrato]
-        
-        # Generar correo
-        nombre_limpio = nombre.lower().replace(' ', '').replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
-        apellido_limpio = apellido1.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
-        correo = f"{nombre_limpio}.{apellido_limpio}@gmail.com"
-        
-        return {
-            "numero_contrato": numero_contrato,
-            "nombre_completo": nombre_completo,
-            "cedula": f"{random.randint(80000000, 99999999)}",
-            "direccion": f"Calle {random.randint(1, 150)} #{random.randint(1, 99)}-{random.randint(1, 99)}, {random.choice(barrios)}",
-            "correo": correo,
-            "telefono": f"3{random.randint(10, 50)}{random.randint(1000000, 9999999)}",
-            "estrato": estrato,
-            "consumo_actual": ultimo_consumo,
-            "consumo_promedio": round(promedio_consumo, 1),
-            "consumos_historicos": consumos_historicos,
-            "valor_m3": valor_m3,
-            "valor_factura": round(ultimo_consumo * valor_m3, -2),
-            "fecha_ultima_lectura": (datetime.now() - timedelta(days=random.randint(1, 15))).strftime('%Y-%m-%d'),
-            "numero_medidor": f"MED-{random.randint(10000, 99999)}",
-            "tipo_usuario": random.choice(["Residencial", "Comercial"]),
-            "fecha_instalacion": (datetime.now() - timedelta(days=random.randint(365, 3650))).strftime('%Y-%m-%d'),
-            "barrio": random.choice(barrios),
-            "ciclo_facturacion": random.randint(1, 6)
-        }
-    
-    def generar_contexto_pqrs(self, tipo_pqrs, datos_cliente):
-        """Genera el contexto específico según el tipo de PQRS"""
-        contextos = {
-            'P': f"""El usuario solicita información detallada sobre su cuenta de servicios con número de contrato {datos_cliente['numero_contrato']}. 
-                    Requiere conocer el histórico de consumos de los últimos 6 meses, las tarifas aplicadas según su estrato {datos_cliente['estrato']},
-                    y aclaración sobre los componentes de la factura. También solicita información sobre programas de ahorro de agua disponibles.""",
-            
-            'Q': f"""El usuario presenta una queja formal por la atención recibida durante la visita técnica realizada el {datos_cliente['fecha_ultima_lectura']} 
-                    en su predio ubicado en {datos_cliente['direccion']}. El técnico no siguió los protocolos de servicio, no presentó identificación 
-                    y dejó el área de trabajo en desorden. Solicita medidas correctivas y una nueva visita técnica.""",
-            
-            'R': f"""El usuario presenta un reclamo por el alto consumo facturado en el último periodo. El consumo registrado de {datos_cliente['consumo_actual']} m³ 
-                    es significativamente mayor al promedio histórico de {datos_cliente['consumo_promedio']} m³. El valor facturado de ${datos_cliente['valor_factura']:,} 
-                    no corresponde con el patrón de consumo habitual. Solicita revisión técnica del medidor {datos_cliente['numero_medidor']} y ajuste en la factura.""",
-            
-            'S': f"""El usuario, cliente desde {datos_cliente['fecha_instalacion']}, sugiere implementar mejoras en el sistema de notificación de lecturas 
-                    y en la aplicación móvil. Propone incluir alertas de consumo inusual, gráficas comparativas mensuales y la opción de programar 
-                    visitas técnicas directamente desde la app. También sugiere implementar un sistema de puntos por ahorro de agua."""
-        }
-        
-        return contextos.get(tipo_pqrs, "")
-    
-    def generar_respuesta_bedrock(self, tipo_pqrs, datos_cliente):
-        """Genera la respuesta usando Claude a través de Bedrock"""
-        if not self.bedrock_client:
-            return None, None, "Bedrock no está configurado correctamente"
-        
-        radicado = self.generar_radicado(tipo_pqrs)
-        contexto = self.generar_contexto_pqrs(tipo_pqrs, datos_cliente)
-        
-        # Construir el prompt
-        system_prompt = """Eres un representante experto del servicio al cliente de Veolia Colombia, 
-        empresa líder en gestión del agua y servicios ambientales. Tu rol es generar respuestas 
-        profesionales, empáticas y completas a las PQRS de los usuarios.
-        
-        Debes mantener un tono profesional pero cercano, demostrar conocimiento técnico cuando 
-        sea necesario y siempre expresar el compromiso de Veolia con la calidad del servicio 
-        y el cuidado del medio ambiente."""
-        
-        user_prompt = f"""Genera una respuesta formal y completa para la siguiente {self.tipos_pqrs[tipo_pqrs]}:
-
-Radicado: {radicado}
-Fecha: {datetime.now().strftime('%d de %B de %Y')}
-
-Datos del usuario:
-- Nombre: {datos_cliente['nombre_completo']}
-- Cédula: {datos_cliente['cedula']}
-- Contrato: {datos_cliente['numero_contrato']}
-- Dirección: {datos_cliente['direccion']}
-- Estrato: {datos_cliente['estrato']}
-- Tipo de usuario: {datos_cliente['tipo_usuario']}
-
-Contexto de la {self.tipos_pqrs[tipo_pqrs]}:
-{contexto}
-
-La respuesta debe:
-1. Iniciar con un saludo cordial y acuse de recibo
-2. Abordar específicamente todos los puntos planteados
-3. Proporcionar información técnica cuando sea relevante
-4. Mencionar el marco legal aplicable (Ley 142 de 1994, Resoluciones CRA)
-5. Detallar los pasos a seguir y tiempos de respuesta
-6. Incluir información de contacto y canales de atención
-7. Cerrar con un mensaje de compromiso con el servicio
-8. Mantener un formato de carta formal pero con lenguaje claro y cercano
-
-Genera la respuesta completa sin usar títulos ni numeraciones, manteniendo un flujo natural."""
-        
-        try:
-            # Configurar la solicitud
-            body = json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 3000,
-                "system": system_prompt,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": user_prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9,
-            })
-            
-            # Invocar el modelo
-            response = self.bedrock_client.invoke_model(
-                body=body,
-                modelId=self.model_id,
-                accept='application/json',
-                contentType='application/json'
-            )
-            
-            # Procesar respuesta
-            response_body = json.loads(response.get('body').read())
-            respuesta_texto = response_body['content'][0]['text'].strip()
-            
-            return respuesta_texto, radicado, None
-            
-        except Exception as e:
-            return None, None, f"Error generando respuesta: {str(e)}"
-    
-    def generar_documento_word(self, texto, radicado, datos_cliente):
-        """Genera documento Word con la respuesta"""
-        doc = Document()
-        
-        # Configurar márgenes
-        for section in doc.sections:
-            section.top_margin = Cm(2.5)
-            section.bottom_margin = Cm(2.5)
-            section.left_margin = Cm(3)
-            section.right_margin = Cm(3)
-        
-        # Agregar logo en el encabezado
-        header = doc.sections[0].header
-        header_table = header.add_table(rows=1, cols=2, width=doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin)
-        header_table.autofit = False
-        
-        # Celda del logo
-        logo_cell = header_table.cell(0, 0)
-        logo_paragraph = logo_cell.paragraphs[0]
-        
-        try:
-            run = logo_paragraph.add_run()
-            run.add_picture(self.logo_path, width=Inches(2))
-        except:
-            # Si no se puede cargar el logo, agregar texto
-            run = logo_paragraph.add_run('VEOLIA')
-            run.font.size = Pt(14)
-            run.font.bold = True
-            run.font.color.rgb = RGBColor(0, 75, 135)
-        
-        # Celda del texto
-        text_cell = header_table.cell(0, 1)
-        text_paragraph = text_cell.paragraphs[0]
-        text_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        run = text_paragraph.add_run('Gestión del Agua y Servicios Ambientales')
-        run.font.size = Pt(10)
-        run.font.color.rgb = RGBColor(0, 75, 135)
-        
-        # Espaciado después del encabezado
-        doc.add_paragraph()
-        
-        # Fecha y radicado
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        p.add_run(f"Bogotá D.C., {datetime.now().strftime('%d de %B de %Y')}\n").font.size = Pt(11)
-        p.add_run(f"Radicado: {radicado}").font.size = Pt(11)
-        
-        doc.add_paragraph()
-        
-        # Destinatario
-        p = doc.add_paragraph()
-        p.add_run(f"Señor(a)\n{datos_cliente['nombre_completo']}\n{datos_cliente['direccion']}\nBogotá D.C.").font.size = Pt(11)
-        
-        doc.add_paragraph()
-        
-        # Asunto
-        p = doc.add_paragraph()
-        run = p.add_run(f"Asunto: Respuesta a {self.tipos_pqrs[radicado[4]].lower()} radicada")
-        run.font.bold = True
-        run.font.size = Pt(11)
-        
-        doc.add_paragraph()
-        
-        # Saludo
-        p = doc.add_paragraph()
-        p.add_run("Respetado(a) señor(a):").font.size = Pt(11)
-        
-        doc.add_paragraph()
-        
-        # Contenido
-        for parrafo in texto.split('\n\n'):
-            if parrafo.strip():
-                p = doc.add_paragraph()
-                p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                p.add_run(parrafo).font.size = Pt(11)
-        
-        doc.add_paragraph()
-        
-        # Despedida
-        p = doc.add_paragraph()
-        p.add_run("Cordialmente,").font.size = Pt(11)
-        
-        doc.add_paragraph()
-        doc.add_paragraph()
-        
-        # Firma
-        p = doc.add_paragraph()
-        run = p.add_run("MARÍA FERNANDA LÓPEZ GARCÍA\nCoordinadora Servicio al Cliente\nVeolia Colombia")
-        run.font.bold = True
-        run.font.size = Pt(11)
-        
-        # Pie de página
-        footer = doc.sections[0].footer
-        p = footer.paragraphs[0]
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run('Veolia Colombia - Comprometidos con el Medio Ambiente\n')
-        run.font.size = Pt(8)
-        run.font.color.rgb = RGBColor(0, 169, 130)
-        run = p.add_run('Línea gratuita nacional: 01 8000 123 456 - www.veolia.com.co')
-        run.font.size = Pt(8)
-        
-        # Guardar en memoria
-        doc_buffer = BytesIO()
-        doc.save(doc_buffer)
-        doc_buffer.seek(0)
-        
-        return doc_buffer
+# Logo y CSS se preparan una vez por proceso; aquí solo se envían
+recursos = obtener_recursos()
+logo_encabezado = recursos.logo_data_uri(ANCHO_ENCABEZADO)
+logo_vista_previa = recursos.logo_data_uri(ANCHO_VISTA_PREVIA)
+logo_pie = recursos.logo_data_uri(ANCHO_PIE)
+st.markdown(recursos.css(), unsafe_allow_html=True)
 
 # ============================================================================
 # FUNCIONES DE UTILIDAD
@@ -745,7 +69,8 @@ def mostrar_datos_cliente(datos):
             {}<br>
             CC: {}
         </div>
-        """.format(datos['nombre_completo'], datos['cedula']), unsafe_allow_html=True)
+        """.format(html.escape(str(datos['nombre_completo'])), html.escape(str(datos['cedula']))),
+                    unsafe_allow_html=True)
     
     with col2:
         st.markdown("""
@@ -761,7 +86,7 @@ def mostrar_datos_cliente(datos):
             {}<br>
             Estrato: {}
         </div>
-        """.format(datos['direccion'], datos['estrato']), unsafe_allow_html=True)
+        """.format(html.escape(str(datos['direccion'])), datos['estrato']), unsafe_allow_html=True)
     
     with col3:
         st.markdown("""
@@ -778,47 +103,241 @@ def mostrar_datos_cliente(datos):
         </div>
         """.format(datos['numero_medidor'], datos['tipo_usuario']), unsafe_allow_html=True)
 
-def crear_grafica_consumos(datos):
-    """Crea gráfica de consumos históricos"""
-    df_consumos = pd.DataFrame(datos['consumos_historicos'])
-    
-    fig = go.Figure()
-    
-    # Línea de consumo
-    fig.add_trace(go.Scatter(
-        x=df_consumos['mes'],
-        y=df_consumos['consumo'],
-        mode='lines+markers',
-        name='Consumo mensual',
-        line=dict(color='#00A982', width=3),
-        marker=dict(size=10, color='#00A982')
-    ))
-    
-    # Línea de promedio
-    promedio = datos['consumo_promedio']
-    fig.add_trace(go.Scatter(
-        x=df_consumos['mes'],
-        y=[promedio] * len(df_consumos),
-        mode='lines',
-        name='Promedio',
-        line=dict(color='#004B87', width=2, dash='dash')
-    ))
-    
-    fig.update_layout(
-        title='Histórico de Consumos (m³)',
-        xaxis_title='Mes',
-        yaxis_title='Consumo (m³)',
-        height=400,
-        hovermode='x unified',
-        showlegend=True,
-        plot_bgcolor='white',
-        paper_bgcolor='white'
+def html_vista_previa(tipo_pqrs, radicado, datos_cliente, parrafos, logo_uri=None, en_progreso=False):
+    """Retorna el HTML de la vista previa de la carta con los párrafos disponibles"""
+    if logo_uri:
+        encabezado = f"""<div class="document-header">
+<img src="{logo_uri}" class="document-logo" alt="Veolia">
+<div class="document-header-text">Gestión del Agua y Servicios Ambientales</div>
+</div>"""
+    else:
+        encabezado = """<div class="document-header">
+<div></div>
+<div class="document-header-text">VEOLIA COLOMBIA<br>Gestión del Agua y Servicios Ambientales</div>
+</div>"""
+    
+    cuerpo = "\n".join(
+        f"<p style='text-align: justify;'>{html.escape(parrafo.strip())}</p>"
+        for parrafo in parrafos if parrafo.strip()
     )
     
-    fig.update_xaxes(gridcolor='lightgray')
-    fig.update_yaxes(gridcolor='lightgray')
+    if en_progreso:
+        cierre = "<p style='color: #6C757D;'>✍️ Redactando...</p>"
+    else:
+        cierre = """<p>Cordialmente,</p>
+<br><br>
+<p><strong>MARÍA FERNANDA LÓPEZ GARCÍA</strong><br>
+Coordinadora Servicio al Cliente<br>
+Veolia Colombia</p>"""
+    
+    return f"""<div class="document-preview">
+{encabezado}
+<p style="text-align: right;">Bogotá D.C., {datetime.now().strftime('%d de %B de %Y')}<br>
+Radicado: {html.escape(str(radicado))}</p>
+<p>Señor(a)<br>
+{html.escape(str(datos_cliente['nombre_completo']))}<br>
+{html.escape(str(datos_cliente['direccion']))}<br>
+Bogotá D.C.</p>
+<p class="document-subject">Asunto: Respuesta a {generador.tipos_pqrs[tipo_pqrs].lower()} radicada</p>
+<p>Respetado(a) señor(a):</p>
+{cuerpo}
+{cierre}
+</div>"""
+
+NOMBRES_TIPO = {'P': 'Petición', 'Q': 'Queja', 'R': 'Reclamo', 'S': 'Sugerencia'}
+TIPOS_POR_NOMBRE = {nombre: tipo for tipo, nombre in NOMBRES_TIPO.items()}
+ESTADOS_PQRS = ['Completada', 'Error']
+NOMBRES_MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+@st.fragment(run_every=0.5)
+def seguir_generacion():
+    """Muestra el avance de la generación enviada al motor; al terminar recarga la página"""
+    generacion = st.session_state.get('generacion_en_curso')
+    if generacion is None:
+        return
+    
+    if not generacion.terminada():
+        st.markdown("---")
+        st.markdown("#### Vista Previa de la Respuesta")
+        if generacion.streaming and generacion.radicado:
+            # Solo se muestran los párrafos completos
+            st.markdown(html_vista_previa(
+                generacion.tipo, generacion.radicado, generacion.datos_cliente,
+                generacion.texto.split('\n\n')[:-1], logo_vista_previa, en_progreso=True
+            ), unsafe_allow_html=True)
+        else:
+            st.info("⏳ Generando respuesta con IA...")
+        return
+    
+    del st.session_state.generacion_en_curso
+    respuesta, radicado, error = generacion.resultado()
+    if error:
+        st.session_state.aviso_generacion = ('error', f"❌ {error}")
+    else:
+        st.session_state.ultima_respuesta = {
+            'texto': respuesta,
+            'radicado': radicado,
+            'datos_cliente': generacion.datos_cliente,
+            'tipo': generacion.tipo
+        }
+        caso = generacion.caso_similar
+        if generacion.desde_cache:
+            st.session_state.aviso_generacion = ('success', f"♻️ Respuesta recuperada de caché - Radicado: {radicado}")
+        elif caso is not None:
+            st.session_state.aviso_generacion = (
+                'success', f"✅ Respuesta generada con el caso similar {caso['radicado']} como ejemplo"
+                           f" - Radicado: {radicado}"
+            )
+        else:
+            st.session_state.aviso_generacion = ('success', f"✅ Respuesta generada - Radicado: {radicado}")
+    st.rerun()
+
+ETIQUETAS_TRABAJO = {
+    cola_trabajos.EN_COLA: "📥 En cola",
+    cola_trabajos.EN_PROCESO: "⚙️ En proceso",
+    cola_trabajos.COMPLETADO: "✅ Completado",
+    cola_trabajos.FALLIDO: "❌ Fallido"
+}
+
+def abrir_respuesta(radicado):
+    """Carga la carta guardada de un radicado como respuesta actual; retorna False si no existe"""
+    registro = almacen.obtener(radicado)
+    if registro is None or registro['texto'] is None:
+        return False
+    st.session_state.ultima_respuesta = {
+        'texto': registro['texto'],
+        'radicado': radicado,
+        'datos_cliente': registro['datos_cliente'],
+        'tipo': registro['tipo']
+    }
+    return True
+
+@st.fragment(run_every=1.0)
+def seguir_trabajo():
+    """Muestra el estado del trabajo encolado; al terminar carga la carta y recarga la página"""
+    radicado = st.session_state.get('trabajo_en_curso')
+    trabajo = cola.obtener(radicado) if radicado else None
+    if trabajo is None:
+        st.session_state.pop('trabajo_en_curso', None)
+        return
     
-    return fig
+    if trabajo['estado'] not in cola_trabajos.ESTADOS_FINALES:
+        reintento = " (reintentando tras un error transitorio)" if trabajo['error'] else ""
+        st.info(f"{ETIQUETAS_TRABAJO[trabajo['estado']]}{reintento} - Radicado: {radicado} "
+                f"(puede cerrar la pestaña y consultarlo después)")
+        return
+    
+    del st.session_state.trabajo_en_curso
+    if trabajo['estado'] == cola_trabajos.COMPLETADO and abrir_respuesta(radicado):
+        st.session_state.aviso_generacion = ('success', f"✅ Respuesta generada - Radicado: {radicado}")
+    else:
+        st.session_state.aviso_generacion = ('error', f"❌ {trabajo['error'] or 'La generación falló'}")
+    st.rerun()
+
+@st.fragment(run_every=1.0)
+def seguir_lote():
+    """Muestra el avance del lote encolado; al terminar arma la tabla de resultados"""
+    lote = st.session_state.get('lote_en_curso')
+    trabajos = cola.trabajos_lote(lote['lote']) if lote else []
+    if not trabajos:
+        st.session_state.pop('lote_en_curso', None)
+        return
+    
+    terminados = sum(1 for t in trabajos if t['estado'] in cola_trabajos.ESTADOS_FINALES)
+    if terminados < len(trabajos):
+        st.progress(terminados / len(trabajos), text=f"Procesadas {terminados} de {len(trabajos)} filas")
+        return
+    
+    del st.session_state.lote_en_curso
+    st.session_state.resultado_lote = {
+        'resultados': lote['errores'] + lote_pqrs.resultados_lote(trabajos, almacen),
+        'nombre': lote['nombre']
+    }
+    st.rerun()
+
+@st.fragment(run_every=1.0)
+def seguir_exportacion():
+    """Muestra el avance de la exportación del historial; al terminar recarga la página"""
+    exportacion = st.session_state.get('exportacion_historial')
+    if exportacion is None:
+        return
+    if exportacion.estado != exportacion_historial.EN_CURSO:
+        # Terminó entre dos ticks: la página completa muestra la descarga o el error
+        st.rerun()
+    st.progress(exportacion.progreso(),
+                text=f"Exportando {exportacion.filas:,} de {exportacion.total:,} registros")
+
+NOMBRES_ETAPA = {
+    'datos_cliente': 'Datos del cliente',
+    'construir_prompt': 'Prompt',
+    'bedrock_primer_token': 'Bedrock 1er token',
+    'bedrock_total': 'Bedrock total',
+    'parseo_respuesta': 'Parseo',
+    'render_docx': 'Word',
+    'render_pdf': 'PDF',
+    'rerun': 'Rerun'
+}
+
+@st.fragment(run_every=5.0)
+def panel_latencias():
+    """Percentiles de cada etapa del pipeline en este proceso, actualizados en vivo"""
+    resumen = obtener_metricas().resumen()
+    if not resumen:
+        return
+    filas = ''.join(
+        f"<p><strong>{NOMBRES_ETAPA.get(etapa, etapa)}:</strong> "
+        f"{formatear_tiempo(m['p50'] * 1000)} / {formatear_tiempo(m['p95'] * 1000)} ({m['total']})</p>"
+        for etapa, m in resumen.items()
+    )
+    st.markdown(f"""
+    <div class="service-card">
+        <h4>⏱️ Latencia por Etapa</h4>
+        <p><em>p50 / p95 (observaciones)</em></p>
+        {filas}
+    </div>
+    """, unsafe_allow_html=True)
+
+def formatear_tiempo(milisegundos):
+    """Formatea un tiempo en milisegundos como milisegundos, segundos o minutos"""
+    if milisegundos is None:
+        return "—"
+    if milisegundos < 1000:
+        return f"{milisegundos:.0f} ms"
+    segundos = milisegundos / 1000
+    if segundos < 60:
+        return f"{segundos:.1f} s"
+    return f"{segundos / 60:.1f} min"
+
+def formatear_porcentaje(parte, total):
+    """Formatea parte/total como porcentaje entero"""
+    if not total:
+        return "—"
+    return f"{parte / total:.0%}"
+
+def tabla_historial(registros):
+    """Convierte registros del almacén en un DataFrame para mostrar"""
+    import pandas as pd
+    
+    return pd.DataFrame({
+        'Radicado': [r['radicado'] for r in registros],
+        'Tipo': [NOMBRES_TIPO.get(r['tipo'], r['tipo']) for r in registros],
+        'Fecha': [r['fecha'] for r in registros],
+        'Cliente': [r['nombre_cliente'] for r in registros],
+        'Contrato': [r['numero_contrato'] for r in registros],
+        'Estado': [r['estado'] for r in registros],
+        'Tiempo Respuesta': [formatear_tiempo(r['tiempo_total_ms']) for r in registros]
+    })
+
+def html_resultado_busqueda(resultado):
+    """Tarjeta de un resultado de búsqueda con los términos encontrados resaltados"""
+    fragmento = html.escape(resultado['fragmento'] or '').replace('\n', ' ')
+    fragmento = fragmento.replace(MARCA_INICIO, '<mark>').replace(MARCA_FIN, '</mark>')
+    return f"""<div class="resultado-busqueda">
+    {get_tipo_badge(resultado['tipo'])} <strong>{html.escape(resultado['radicado'])}</strong>
+    · {resultado['fecha']} · {html.escape(resultado['nombre_cliente'] or '')}
+    · Contrato {resultado['numero_contrato']} · {resultado['estado']}
+    <p>{fragmento}</p>
+</div>"""
 
 def get_tipo_badge(tipo):
     """Retorna el HTML para el badge del tipo de PQRS"""
@@ -835,10 +354,10 @@ def get_tipo_badge(tipo):
 # ============================================================================
 
 # Header principal con logo
-if logo_base64:
+if logo_encabezado:
     st.markdown(f"""
     <div class="main-header">
-        <img src="data:image/webp;base64,{logo_base64}" class="main-header-logo" alt="Veolia Logo">
+        <img src="{logo_encabezado}" class="main-header-logo" alt="Veolia Logo">
         <h1>💧 Sistema de Gestión PQRS</h1>
         <p>Atención al Cliente</p>
     </div>
@@ -851,40 +370,184 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
-# Inicializar generador
-generador = VeoliaPQRSGenerator()
+# Inicializar Bedrock (cliente compartido por todo el proceso, creado en la
+# primera generación) y el generador
+try:
+    bedrock_client = ClienteBedrockDiferido(
+        aws_access_key_id=st.secrets.get("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=st.secrets.get("AWS_SECRET_ACCESS_KEY")
+    )
+except Exception as e:
+    bedrock_client = None
+    st.error(f"Error inicializando Bedrock: {e}")
+
+almacen = obtener_almacen()
+contabilidad = obtener_contabilidad()
+generador = VeoliaPQRSGenerator(
+    bedrock_client,
+    logo_path=configuracion.LOGO_PATH,
+    cache=obtener_cache_respuestas(),
+    almacen=almacen,
+    resiliencia=obtener_resiliencia() if configuracion.RESILIENCIA_HABILITADA else None,
+    contabilidad=contabilidad,
+    casos=obtener_indice_casos()
+)
+# Todas las llamadas a Bedrock de la interfaz pasan por el motor del proceso
+motor = obtener_motor()
+# Endpoint /metrics (Prometheus), una vez por proceso
+iniciar_exportacion()
+# Cola durable: los trabajos sobreviven a que el agente cierre la pestaña
+cola = cola_trabajos.obtener_cola()
+cola_trabajos.iniciar_trabajador(generador, motor=motor)
+
+# Al volver con la URL de una solicitud encolada se retoma su seguimiento
+if 'radicado' in st.query_params and 'ultima_respuesta' not in st.session_state:
+    st.session_state.setdefault('trabajo_en_curso', st.query_params['radicado'])
+if 'lote' in st.query_params and 'resultado_lote' not in st.session_state:
+    st.session_state.setdefault('lote_en_curso', {
+        'lote': st.query_params['lote'], 'nombre': st.query_params['lote'], 'errores': []
+    })
 
 # Sidebar con logo
 with st.sidebar:
     # Mostrar logo en el sidebar si existe
-    if os.path.exists(LOGO_PATH):
-        st.image(LOGO_PATH, width=200)
+    logo_sidebar = recursos.logo_png(ANCHO_SIDEBAR)
+    if logo_sidebar:
+        st.image(logo_sidebar, width=200)
         st.markdown("---")
     
     st.markdown("### 🔧 Panel de Control")
     
     # Estado del sistema
     bedrock_status = "✅ Activo" if generador.bedrock_client else "❌ Inactivo"
+    pool = estadisticas_pool(generador.bedrock_client)
+    motor_stats = motor.estadisticas()
+    cola_stats = cola.conteo_por_estado()
     
     st.markdown(f"""
     <div class="service-card">
         <h4>Estado del Sistema</h4>
         <p><strong>AWS Bedrock:</strong> {bedrock_status}</p>
         <p><strong>Modelo:</strong> Claude Sonnet</p>
-        <p><strong>Región:</strong> us-east-1</p>
+        <p><strong>Región:</strong> {configuracion.BEDROCK_REGION}</p>
+        <p><strong>Conexiones:</strong> {pool['conexiones_abiertas']} abiertas / {pool['max_conexiones']} máx.
+        ({pool['conexiones_libres']} libres)</p>
+        <p><strong>Solicitudes por el pool:</strong> {pool['solicitudes']}</p>
+        <p><strong>Generaciones:</strong> {motor_stats['en_vuelo']} en vuelo / {motor_stats['max_en_vuelo']} máx.
+        ({motor_stats['en_cola']} en cola)</p>
+        <p><strong>Cola de trabajos:</strong> {cola_stats['en_cola']} en cola, {cola_stats['en_proceso']} en proceso,
+        {cola_stats['fallido']} fallidos</p>
+        <p><strong>Clientes creados:</strong> {pool['clientes_creados']}</p>
     </div>
     """, unsafe_allow_html=True)
     
+    # Cache de respuestas
+    if generador.cache is not None:
+        cache_stats = generador.cache.estadisticas()
+        documentos_stats = obtener_cache_artefactos().estadisticas()
+        st.markdown(f"""
+        <div class="service-card">
+            <h4>♻️ Caché de Respuestas</h4>
+            <p><strong>Aciertos:</strong> {cache_stats['hits_memoria'] + cache_stats['hits_disco']}
+            ({cache_stats['hits_memoria']} memoria / {cache_stats['hits_disco']} disco)</p>
+            <p><strong>Fallos:</strong> {cache_stats['misses']}</p>
+            <p><strong>Tasa de acierto:</strong> {cache_stats['tasa_acierto']:.0%}</p>
+            <p><strong>Radicados reutilizados:</strong> {cache_stats['radicados_reutilizados']}</p>
+            <p><strong>Documentos en caché:</strong> {documentos_stats['documentos']}
+            ({documentos_stats['bytes_usados'] / 1048576:.1f} MB)</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Casos similares: cartas ofrecidas y reutilizadas por el agente, y ejemplos en el prompt
+    if generador.casos is not None:
+        casos_stats = generador.casos.estadisticas()
+        estado_casos = ('' if casos_stats['listo'] else ' (cargando…)' if casos_stats['cargando']
+                        else ' (se carga con la primera consulta)')
+        st.markdown(f"""
+        <div class="service-card">
+            <h4>🔁 Casos Similares</h4>
+            <p><strong>Casos indexados:</strong> {casos_stats['casos']:,}{estado_casos}</p>
+            <p><strong>Cartas ofrecidas:</strong> {casos_stats['ofrecidas']}</p>
+            <p><strong>Cartas reutilizadas:</strong> {casos_stats['reutilizadas']}</p>
+            <p><strong>Usados como ejemplo:</strong> {casos_stats['ejemplos']}</p>
+            <p><strong>Sin caso parecido:</strong> {casos_stats['sin_caso']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Reintentos, límite de concurrencia y circuit breaker
+    if generador.resiliencia is not None:
+        resiliencia_stats = generador.resiliencia.metricas()
+        estado_circuito = {
+            'cerrado': '✅ Cerrado',
+            'semiabierto': '⚠️ Semiabierto',
+            'abierto': '⛔ Abierto'
+        }[resiliencia_stats['estado_circuito']]
+        st.markdown(f"""
+        <div class="service-card">
+            <h4>🛡️ Resiliencia Bedrock</h4>
+            <p><strong>Circuito:</strong> {estado_circuito} ({resiliencia_stats['aperturas_circuito']} aperturas)</p>
+            <p><strong>Límite de concurrencia:</strong> {resiliencia_stats['limite_concurrencia']:g}
+            ({resiliencia_stats['en_vuelo']} en vuelo, {resiliencia_stats['esperando']} en espera)</p>
+            <p><strong>Llamadas:</strong> {resiliencia_stats['llamadas']}
+            ({resiliencia_stats['reintentos']} reintentos, {resiliencia_stats['fallos']} fallidas)</p>
+            <p><strong>Throttling:</strong> {resiliencia_stats['throttling']}
+            &nbsp; <strong>Transitorios:</strong> {resiliencia_stats['transitorio']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Tokens consumidos y cache de prompt
+    uso = resumen_uso()
+    if uso['llamadas']:
+        st.markdown(f"""
+        <div class="service-card">
+            <h4>🔢 Uso de Tokens</h4>
+            <p><strong>Llamadas:</strong> {uso['llamadas']}</p>
+            <p><strong>Entrada sin caché:</strong> {uso['input_tokens']:,}</p>
+            <p><strong>Entrada leída de caché:</strong> {uso['cache_read_input_tokens']:,}
+            ({uso['fraccion_cacheada']:.0%})</p>
+            <p><strong>Entrada escrita en caché:</strong> {uso['cache_creation_input_tokens']:,}</p>
+            <p><strong>Salida:</strong> {uso['output_tokens']:,}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Costo del día (todas las réplicas) frente al presupuesto
+    gasto_hoy = contabilidad.gasto(datetime.now().date().isoformat())
+    if gasto_hoy or configuracion.PRESUPUESTO_DIARIO_USD:
+        if configuracion.PRESUPUESTO_DIARIO_USD:
+            fraccion_gasto = gasto_hoy / configuracion.PRESUPUESTO_DIARIO_USD
+            if fraccion_gasto >= 1:
+                estado_presupuesto = "🔴 agotado: modelo económico"
+            elif fraccion_gasto >= configuracion.PRESUPUESTO_FRACCION_AVISO:
+                estado_presupuesto = "🟡 max_tokens recortado"
+            else:
+                estado_presupuesto = "🟢 normal"
+            linea_presupuesto = (f"<p><strong>Presupuesto:</strong> US$ {configuracion.PRESUPUESTO_DIARIO_USD:,.2f}"
+                                 f" ({fraccion_gasto:.0%})</p><p>{estado_presupuesto}</p>")
+        else:
+            linea_presupuesto = ""
+        st.markdown(f"""
+        <div class="service-card">
+            <h4>💵 Costo del Día</h4>
+            <p><strong>Gasto:</strong> US$ {gasto_hoy:,.4f}</p>
+            {linea_presupuesto}
+        </div>
+        """, unsafe_allow_html=True)
+    
     # Estadísticas del día
-    st.markdown("""
+    resumen_dia = almacen.resumen_periodo(datetime.now().date(), datetime.now().date())
+    p95_dia = almacen.percentil_latencia(datetime.now().date(), datetime.now().date(), 0.95)
+    st.markdown(f"""
     <div class="service-card">
         <h4>📊 Estadísticas del Día</h4>
-        <p><strong>PQRS Generadas:</strong> 12</p>
-        <p><strong>Tiempo Promedio:</strong> 2.3 min</p>
-        <p><strong>Satisfacción:</strong> 98%</p>
+        <p><strong>PQRS Generadas:</strong> {resumen_dia['total']}</p>
+        <p><strong>Tiempo Promedio:</strong> {formatear_tiempo(resumen_dia['tiempo_promedio_ms'])}
+        (p95 ≤ {formatear_tiempo(p95_dia)})</p>
+        <p><strong>Resueltas:</strong> {formatear_porcentaje(resumen_dia['completadas'], resumen_dia['total'])}</p>
     </div>
     """, unsafe_allow_html=True)
     
+    panel_latencias()
+    
     # Información adicional
     with st.expander("ℹ️ Acerca del Sistema"):
         st.markdown("""
@@ -903,7 +566,7 @@ with st.sidebar:
         """)
 
 # Contenido principal
-tabs = st.tabs(["📝 Generar PQRS", "📊 Dashboard", "📚 Historial", "❓ Ayuda"])
+tabs = st.tabs(["📝 Generar PQRS", "📦 Generación Masiva", "📊 Dashboard", "📚 Historial", "❓ Ayuda"])
 
 # Tab 1: Generar PQRS
 with tabs[0]:
@@ -976,26 +639,107 @@ with tabs[0]:
             
             st.success(f"✅ Cliente encontrado: {datos_cliente['nombre_completo']}")
             
-            # Botón para generar respuesta
-            if st.button("🚀 Generar Respuesta PQRS", type="primary", use_container_width=True):
-                with st.spinner("Generando respuesta con IA..."):
-                    respuesta, radicado, error = generador.generar_respuesta_bedrock(tipo_pqrs, datos_cliente)
-                    
-                    if error:
-                        st.error(f"❌ {error}")
-                    else:
-                        st.session_state.ultima_respuesta = {
-                            'texto': respuesta,
-                            'radicado': radicado,
-                            'datos_cliente': datos_cliente,
-                            'tipo': tipo_pqrs
-                        }
-                        st.success(f"✅ Respuesta generada - Radicado: {radicado}")
+            modo_streaming = st.toggle(
+                "Ver la respuesta mientras se redacta",
+                value=True,
+                help="Muestra la carta párrafo a párrafo a medida que la genera la IA"
+            )
+            regenerar = st.checkbox(
+                "🔄 Regenerar (ignorar caché y casos similares)",
+                value=False,
+                help="Solicita una carta nueva aunque exista una reciente para este contrato y tipo "
+                     "o un caso resuelto muy parecido"
+            )
+            
+            en_curso = 'generacion_en_curso' in st.session_state or 'trabajo_en_curso' in st.session_state
+            
+            # Caso casi idéntico: se ofrece su carta adaptada, pero solo se usa si el agente la confirma
+            caso_ofrecido = None
+            if not regenerar:
+                clave_oferta = (tipo_pqrs, numero_contrato)
+                oferta = st.session_state.get('caso_ofrecido')
+                if oferta is None or oferta['clave'] != clave_oferta:
+                    oferta = {'clave': clave_oferta,
+                              'caso': generador.sugerir_reutilizacion(tipo_pqrs, datos_cliente)}
+                    # Mientras el índice carga no se guarda el "sin caso": se vuelve a buscar
+                    if oferta['caso'] is not None or generador.casos is None or generador.casos.listo:
+                        st.session_state.caso_ofrecido = oferta
+                caso_ofrecido = oferta['caso']
+            if caso_ofrecido is not None:
+                with st.expander(f"🔁 Caso similar {caso_ofrecido['radicado']} "
+                                 f"(similitud {caso_ofrecido['similitud']:.0%}): puede reutilizar su carta"):
+                    st.caption("Se cambiaron nombre, contrato, dirección, cifras y fechas del cliente. Revise las "
+                               "cifras derivadas (diferencias, porcentajes, valores en letras): pueden ser las del "
+                               "caso anterior.")
+                    st.text(caso_ofrecido['texto'])
+                    if st.button("🔁 Usar esta carta sin generar", use_container_width=True, disabled=en_curso):
+                        respuesta, radicado, error = generador.reutilizar_caso(
+                            tipo_pqrs, datos_cliente, caso_ofrecido['radicado']
+                        )
+                        st.session_state.pop('caso_ofrecido', None)
+                        if error:
+                            st.session_state.aviso_generacion = ('error', f"❌ {error}")
+                        else:
+                            st.session_state.ultima_respuesta = {
+                                'texto': respuesta,
+                                'radicado': radicado,
+                                'datos_cliente': datos_cliente,
+                                'tipo': tipo_pqrs
+                            }
+                            st.session_state.aviso_generacion = (
+                                'success', f"🔁 Carta adaptada del caso similar {caso_ofrecido['radicado']}"
+                                           f" - Radicado: {radicado}"
+                            )
+                        st.rerun()
+            
+            # Botón para generar respuesta: el script sigue mientras Bedrock responde.
+            # En streaming va directo al motor; si no, como trabajo durable.
+            if st.button("🚀 Generar Respuesta PQRS", type="primary", use_container_width=True,
+                         disabled=en_curso):
+                if modo_streaming:
+                    st.query_params.pop('radicado', None)
+                    st.session_state.generacion_en_curso = motor.generar(
+                        generador, tipo_pqrs, datos_cliente, regenerar=regenerar
+                    )
+                else:
+                    trabajo = cola_trabajos.encolar_generacion(cola, generador, tipo_pqrs, datos_cliente,
+                                                               regenerar=regenerar)
+                    st.session_state.trabajo_en_curso = trabajo['radicado']
+                    st.query_params['radicado'] = trabajo['radicado']
         elif numero_contrato:
             st.warning("⚠️ El número de contrato debe tener exactamente 10 dígitos")
         
         st.markdown('</div>', unsafe_allow_html=True)
     
+    # Generación en curso: la vista previa se consulta sin bloquear la página
+    if 'generacion_en_curso' in st.session_state:
+        seguir_generacion()
+    if 'trabajo_en_curso' in st.session_state:
+        seguir_trabajo()
+    
+    if 'aviso_generacion' in st.session_state:
+        tipo_aviso, mensaje = st.session_state.pop('aviso_generacion')
+        getattr(st, tipo_aviso)(mensaje)
+    
+    # Seguimiento de solicitudes encoladas (también las de lotes)
+    with st.expander("🔎 Consultar solicitud por radicado"):
+        radicado_consulta = st.text_input("Radicado", placeholder="VEO-P-20240101-120000-000001").strip()
+        if radicado_consulta:
+            trabajo = cola.obtener(radicado_consulta)
+            if trabajo is None:
+                st.info("No hay una solicitud encolada con ese radicado")
+            else:
+                st.markdown(f"**Estado:** {ETIQUETAS_TRABAJO[trabajo['estado']]} &nbsp;&nbsp; "
+                            f"**Intentos:** {trabajo['intentos']} &nbsp;&nbsp; "
+                            f"**Cliente:** {trabajo['datos_cliente']['nombre_completo']}")
+                if trabajo['error'] and trabajo['estado'] in cola_trabajos.ESTADOS_FINALES:
+                    st.error(f"❌ {trabajo['error']}")
+                elif trabajo['error']:
+                    st.warning(f"⚠️ Último intento: {trabajo['error']} (se reintentará)")
+                if trabajo['estado'] == cola_trabajos.COMPLETADO and st.button("📄 Abrir respuesta"):
+                    if not abrir_respuesta(radicado_consulta):
+                        st.warning("⚠️ La carta de este radicado no está en el almacén")
+    
     # Mostrar respuesta generada
     if 'ultima_respuesta' in st.session_state:
         st.markdown("---")
@@ -1023,124 +767,163 @@ with tabs[0]:
         
         # Vista previa del documento con logo
         st.markdown("#### Vista Previa de la Respuesta")
-        
-        if logo_base64:
-            st.markdown(f"""
-            <div class="document-preview">
-                <div class="document-header">
-                    <img src="data:image/webp;base64,{logo_base64}" class="document-logo" alt="Veolia">
-                    <div class="document-header-text">
-                        Gestión del Agua y Servicios Ambientales
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="document-preview">', unsafe_allow_html=True)
-            st.markdown(f"""
-            <div class="document-header">
-                <div></div>
-                <div class="document-header-text">
-                    VEOLIA COLOMBIA<br>
-                    Gestión del Agua y Servicios Ambientales
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <p style="text-align: right;">
-            Bogotá D.C., {datetime.now().strftime('%d de %B de %Y')}<br>
-            Radicado: {respuesta_data['radicado']}
-        </p>
-        
-        <p>
-            Señor(a)<br>
-            {respuesta_data['datos_cliente']['nombre_completo']}<br>
-            {respuesta_data['datos_cliente']['direccion']}<br>
-            Bogotá D.C.
-        </p>
-        
-        <p class="document-subject">
-            Asunto: Respuesta a {generador.tipos_pqrs[respuesta_data['tipo']].lower()} radicada
-        </p>
-        
-        <p>Respetado(a) señor(a):</p>
-        """, unsafe_allow_html=True)
-        
-        # Mostrar contenido de la respuesta
-        for parrafo in respuesta_data['texto'].split('\n\n'):
-            if parrafo.strip():
-                st.markdown(f"<p style='text-align: justify;'>{parrafo}</p>", unsafe_allow_html=True)
-        
-        st.markdown("""
-        <p>Cordialmente,</p>
-        <br><br>
-        <p>
-            <strong>MARÍA FERNANDA LÓPEZ GARCÍA</strong><br>
-            Coordinadora Servicio al Cliente<br>
-            Veolia Colombia
-        </p>
-        """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown(html_vista_previa(
+            respuesta_data['tipo'],
+            respuesta_data['radicado'],
+            respuesta_data['datos_cliente'],
+            respuesta_data['texto'].split('\n\n'),
+            logo_vista_previa
+        ), unsafe_allow_html=True)
         
         # Botones de descarga
         st.markdown("#### Opciones de Descarga")
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
-            # Generar documento Word
-            doc_buffer = generador.generar_documento_word(
-                respuesta_data['texto'],
-                respuesta_data['radicado'],
-                respuesta_data['datos_cliente']
-            )
-            
+            # El documento se renderiza solo al pulsar descargar, y una vez por radicado
             st.download_button(
                 label="📄 Descargar Word",
-                data=doc_buffer.getvalue(),
+                data=lambda: generador.documento_word_bytes(
+                    respuesta_data['texto'],
+                    respuesta_data['radicado'],
+                    respuesta_data['datos_cliente']
+                ),
                 file_name=f"{respuesta_data['radicado']}.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                 use_container_width=True
             )
         
         with col2:
+            st.download_button(
+                label="📑 Descargar PDF",
+                data=lambda: generador.documento_pdf_bytes(
+                    respuesta_data['texto'],
+                    respuesta_data['radicado'],
+                    respuesta_data['datos_cliente']
+                ),
+                file_name=f"{respuesta_data['radicado']}.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
+        
+        with col3:
             st.button("📧 Enviar por Email", type="secondary", use_container_width=True)
 
-# Tab 2: Dashboard
+# Tab 2: Generación masiva
 with tabs[1]:
+    st.markdown("### 📦 Generación Masiva de PQRS")
+    st.markdown("""
+    <div class="info-box">
+        Cargue un archivo CSV o Excel con las columnas <strong>tipo</strong> (P, Q, R, S o el nombre completo)
+        y <strong>numero_contrato</strong>. Las respuestas se generan en paralelo y los errores de cada fila
+        se reportan sin detener el lote.
+    </div>
+    """, unsafe_allow_html=True)
+    
+    archivo_lote = st.file_uploader("Archivo del lote", type=['csv', 'xlsx', 'xls'])
+    
+    if archivo_lote is not None:
+        try:
+            filas_lote, errores_lote = lote_pqrs.leer_archivo_lote(archivo_lote, archivo_lote.name)
+        except Exception as e:
+            filas_lote, errores_lote = [], []
+            st.error(f"❌ No se pudo leer el archivo: {e}")
+        
+        if filas_lote or errores_lote:
+            st.markdown(f"**Filas válidas:** {len(filas_lote)} &nbsp;&nbsp; **Filas con error:** {len(errores_lote)}")
+        
+        if filas_lote and st.button("🚀 Generar Lote", type="primary", use_container_width=True,
+                                    disabled='lote_en_curso' in st.session_state):
+            # Cada fila es un trabajo durable: el lote sigue aunque se cierre la pestaña
+            lote = uuid.uuid4().hex[:12]
+            lote_pqrs.encolar_lote(cola, generador, filas_lote, lote)
+            st.session_state.pop('resultado_lote', None)
+            st.session_state.lote_en_curso = {
+                'lote': lote,
+                'nombre': Path(archivo_lote.name).stem,
+                'errores': list(errores_lote)
+            }
+            st.query_params['lote'] = lote
+    
+    if 'lote_en_curso' in st.session_state:
+        seguir_lote()
+    
+    if 'resultado_lote' in st.session_state:
+        resultado_lote = st.session_state.resultado_lote
+        resultados = resultado_lote['resultados']
+        exitosas = sum(1 for r in resultados if r['estado'] == 'Completada')
+        # Filas repetidas (mismo contrato y tipo) comparten radicado y documento
+        documentos = len({r['radicado'] for r in resultados if r['estado'] == 'Completada'})
+        
+        if exitosas == len(resultados):
+            st.success(f"✅ Lote completado: {exitosas} respuestas generadas")
+        else:
+            st.warning(f"⚠️ Lote completado: {exitosas} de {len(resultados)} filas generadas")
+        if documentos < exitosas:
+            st.info(f"ℹ️ {exitosas - documentos} filas repiten contrato y tipo de otra fila y comparten su "
+                    f"radicado; el ZIP trae {documentos} documentos")
+        
+        st.dataframe(lote_pqrs.tabla_resultados(resultados), use_container_width=True, hide_index=True)
+        
+        if exitosas:
+            col_word, col_pdf = st.columns(2)
+            with col_word:
+                st.download_button(
+                    label=f"📦 Descargar {documentos} documentos Word (ZIP)",
+                    data=lambda: lote_pqrs.empaquetar_documentos(generador, resultados),
+                    file_name=f"PQRS_lote_{resultado_lote['nombre']}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+            with col_pdf:
+                st.download_button(
+                    label=f"📦 Descargar {documentos} documentos PDF (ZIP)",
+                    data=lambda: lote_pqrs.empaquetar_documentos(generador, resultados, formato='pdf'),
+                    file_name=f"PQRS_lote_{resultado_lote['nombre']}_pdf.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+
+# Tab 3: Dashboard
+with tabs[2]:
     st.markdown("### 📊 Dashboard de PQRS")
     
+    hoy = datetime.now().date()
+    resumen_hoy = almacen.resumen_periodo(hoy, hoy)
+    resumen_mes = almacen.resumen_periodo(hoy - timedelta(days=29), hoy)
+    
     # Métricas principales
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-container">
             <div class="metric-label">PQRS Hoy</div>
-            <div class="metric-value">28</div>
+            <div class="metric-value">{resumen_hoy['total']}</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-container">
             <div class="metric-label">Tiempo Promedio</div>
-            <div class="metric-value">2.3 min</div>
+            <div class="metric-value">{formatear_tiempo(resumen_hoy['tiempo_promedio_ms'])}</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-container">
             <div class="metric-label">Resueltas</div>
-            <div class="metric-value">96%</div>
+            <div class="metric-value">{formatear_porcentaje(resumen_hoy['completadas'], resumen_hoy['total'])}</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col4:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-container">
-            <div class="metric-label">Satisfacción</div>
-            <div class="metric-value">4.8/5</div>
+            <div class="metric-label">Últimos 30 Días</div>
+            <div class="metric-value">{resumen_mes['total']}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -1148,23 +931,41 @@ with tabs[1]:
     col1, col2 = st.columns(2)
     
     with col1:
-        # Distribución por tipo
-        tipos_data = pd.DataFrame({
-            'Tipo': ['Peticiones', 'Quejas', 'Reclamos', 'Sugerencias'],
-            'Cantidad': [45, 28, 35, 12],
-            'Color': ['#1976D2', '#F57C00', '#D32F2F', '#388E3C']
-        })
+        # Distribución por tipo (últimos 30 días)
+        conteo_tipos = almacen.conteo_por_tipo(hoy - timedelta(days=29), hoy)
         
-        fig = px.pie(tipos_data, values='Cantidad', names='Tipo', 
-                     title='Distribución por Tipo de PQRS',
-                     color_discrete_map=dict(zip(tipos_data['Tipo'], tipos_data['Color'])))
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig, use_container_width=True)
+        if conteo_tipos:
+            import pandas as pd
+            import plotly.express as px
+            
+            tipos_data = pd.DataFrame({
+                'Tipo': ['Peticiones', 'Quejas', 'Reclamos', 'Sugerencias'],
+                'Cantidad': [conteo_tipos.get(t, 0) for t in ['P', 'Q', 'R', 'S']],
+                'Color': ['#1976D2', '#F57C00', '#D32F2F', '#388E3C']
+            })
+            
+            fig = px.pie(tipos_data, values='Cantidad', names='Tipo', 
+                         title='Distribución por Tipo de PQRS',
+                         color_discrete_map=dict(zip(tipos_data['Tipo'], tipos_data['Color'])))
+            fig.update_traces(textposition='inside', textinfo='percent+label')
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("Aún no hay PQRS registradas en los últimos 30 días")
     
     with col2:
-        # Tendencia mensual
-        meses = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun']
-        valores = [120, 135, 128, 142, 155, 148]
+        # Tendencia mensual (últimos 6 meses)
+        primer_mes = (hoy.replace(day=1) - timedelta(days=150)).replace(day=1)
+        conteo_meses = almacen.conteo_por_mes(primer_mes, hoy)
+        
+        meses = []
+        valores = []
+        mes = primer_mes
+        while mes <= hoy:
+            meses.append(f"{NOMBRES_MESES[mes.month - 1]} {mes.year}")
+            valores.append(conteo_meses.get(mes.strftime('%Y-%m'), 0))
+            mes = (mes + timedelta(days=32)).replace(day=1)
+        
+        import plotly.graph_objects as go
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
@@ -1189,24 +990,57 @@ with tabs[1]:
         
         st.plotly_chart(fig, use_container_width=True)
     
+    # Distribución de tiempos de generación (últimos 30 días), desde el histograma
+    histograma = almacen.histograma_latencia(hoy - timedelta(days=29), hoy)
+    if sum(histograma):
+        import plotly.graph_objects as go
+        
+        etiquetas = [f"≤ {formatear_tiempo(limite)}" for limite in CUBETAS_LATENCIA_MS]
+        etiquetas.append(f"> {formatear_tiempo(CUBETAS_LATENCIA_MS[-1])}")
+        fig = go.Figure(go.Bar(x=etiquetas, y=histograma, marker_color='#004B87'))
+        fig.update_layout(
+            title='Tiempo de Generación (últimos 30 días)',
+            xaxis_title='Tiempo',
+            yaxis_title='PQRS completadas',
+            plot_bgcolor='white',
+            paper_bgcolor='white'
+        )
+        fig.update_yaxes(gridcolor='lightgray')
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Tokens y costo por tipo y modelo (últimos 30 días), con el max_tokens sugerido
+    uso_tipos = contabilidad.resumen(hoy - timedelta(days=29), hoy)
+    if uso_tipos:
+        import pandas as pd
+        
+        st.markdown("### 💵 Tokens y Costo por Tipo (últimos 30 días)")
+        recomendados = {tipo: contabilidad.recomendar_max_tokens(tipo) for tipo in {u['tipo'] for u in uso_tipos}}
+        st.dataframe(pd.DataFrame([{
+            'Tipo': generador.tipos_pqrs.get(u['tipo'], u['tipo']),
+            'Modelo': u['modelo'],
+            'Llamadas': u['llamadas'],
+            'Entrada': u['input_tokens'] + u['cache_read_input_tokens'] + u['cache_creation_input_tokens'],
+            'Salida': u['output_tokens'],
+            'Salida promedio': round(u['output_tokens'] / u['llamadas']),
+            'Truncadas': u['truncadas'],
+            'Costo (US$)': round(u['costo_usd'], 4),
+            'max_tokens sugerido': recomendados[u['tipo']]
+        } for u in uso_tipos]), use_container_width=True, hide_index=True)
+    
     # Tabla de últimas PQRS
     st.markdown("### 📋 Últimas PQRS Procesadas")
     
-    ultimas_pqrs = pd.DataFrame({
-        'Radicado': ['VEO-R-20241209-143522', 'VEO-P-20241209-142815', 'VEO-Q-20241209-141203'],
-        'Tipo': ['Reclamo', 'Petición', 'Queja'],
-        'Cliente': ['Ana María González', 'Juan Carlos López', 'Patricia Ramírez'],
-        'Estado': ['Completada', 'Completada', 'En proceso'],
-        'Tiempo': ['2.1 min', '1.8 min', '3.2 min']
-    })
-    
-    st.dataframe(ultimas_pqrs, use_container_width=True, hide_index=True)
+    ultimas_pqrs = almacen.ultimas(10)
+    if ultimas_pqrs:
+        st.dataframe(tabla_historial(ultimas_pqrs), use_container_width=True, hide_index=True)
+    else:
+        st.info("Aún no se han generado PQRS")
 
-# Tab 3: Historial
-with tabs[2]:
+# Tab 4: Historial
+with tabs[3]:
     st.markdown("### 📚 Historial de PQRS")
     
-    # Filtros
+    # Filtros (se aplican en la consulta, no sobre un DataFrame)
     col1, col2, col3 = st.columns(3)
     
     with col1:
@@ -1222,42 +1056,113 @@ with tabs[2]:
             default=['Petición', 'Queja', 'Reclamo', 'Sugerencia']
         )
     
-    # Simulación de datos históricos
-    st.markdown("#### Resultados de la búsqueda")
+    col1, col2 = st.columns(2)
     
-    # Generar datos de ejemplo de forma más simple
-    tipos_ciclo = ['R', 'P', 'Q', 'S', 'R', 'P'] * 5  # 30 elementos
-    radicados = []
-    for i in range(30):
-        tipo = tipos_ciclo[i]
-        dia = (i % 30) + 1
-        hora = 8 + (i % 10)
-        minuto = (i * 2) % 60
-        segundo = (i * 3) % 60
-        radicado = f'VEO-{tipo}-202412{dia:02d}-{hora:02d}{minuto:02d}{segundo:02d}'
-        radicados.append(radicado)
-    
-    historico_data = pd.DataFrame({
-        'Radicado': radicados,
-        'Tipo': ['Reclamo', 'Petición', 'Queja', 'Sugerencia', 'Reclamo', 'Petición'] * 5,
-        'Fecha': pd.date_range(start='2024-12-01', periods=30, freq='D'),
-        'Cliente': [f'Cliente {i}' for i in range(1, 31)],
-        'Contrato': [f'{1234567890 + i}' for i in range(30)],
-        'Estado': ['Completada'] * 28 + ['En proceso'] * 2,
-        'Tiempo Respuesta': [f'{random.uniform(1.5, 4.0):.1f} min' for _ in range(30)]
-    })
+    with col1:
+        estado_filtro = st.multiselect("Estado", options=ESTADOS_PQRS, default=ESTADOS_PQRS)
+    
+    with col2:
+        contrato_filtro = st.text_input("Número de Contrato", max_chars=10, placeholder="Todos los contratos")
+    
+    filtros_historial = {
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'tipos': [TIPOS_POR_NOMBRE[nombre] for nombre in tipo_filtro],
+        'estados': estado_filtro,
+        'numero_contrato': contrato_filtro.strip() or None
+    }
     
-    st.dataframe(
-        historico_data[historico_data['Tipo'].isin(tipo_filtro)].head(20),
-        use_container_width=True,
-        hide_index=True
+    busqueda = st.text_input(
+        "🔎 Buscar en cartas y datos del cliente",
+        placeholder='Ej.: MED-00123, "Resolución CRA 413", un nombre, una dirección o un radicado',
+        help='Sin distinguir tildes ni mayúsculas. Use comillas para frases, OR para alternativas, '
+             'NOT para excluir y * al final de una palabra para buscar por prefijo.'
     )
     
-    # Botón de exportar
-    st.button("📥 Exportar a Excel", type="secondary")
+    # Pila de cursores (fecha, id): el último es el inicio de la página actual.
+    # Cambiar un filtro vuelve a la primera página.
+    clave_filtros = repr(filtros_historial)
+    if st.session_state.get('historial_filtros') != clave_filtros:
+        st.session_state.historial_filtros = clave_filtros
+        st.session_state.historial_cursores = [None]
+    cursores = st.session_state.historial_cursores
+    
+    st.markdown("#### Resultados de la búsqueda")
+    
+    if busqueda.strip():
+        # Con texto buscado se muestran los más relevantes en lugar de la página por fecha
+        encontrados = almacen.buscar(busqueda, **filtros_historial, limite=configuracion.BUSQUEDA_MAX_RESULTADOS)
+        if encontrados:
+            st.caption(f"{len(encontrados)} resultados más relevantes"
+                       + (" (refine la búsqueda para ver otros)"
+                          if len(encontrados) == configuracion.BUSQUEDA_MAX_RESULTADOS else ""))
+            st.markdown(''.join(html_resultado_busqueda(r) for r in encontrados), unsafe_allow_html=True)
+        else:
+            st.info("Ninguna PQRS contiene lo buscado con los filtros seleccionados")
+    else:
+        pagina = almacen.pagina_historial(**filtros_historial, despues_de=cursores[-1],
+                                          tamano=configuracion.HISTORIAL_TAMANO_PAGINA)
+        total_historial = almacen.contar_historial(**filtros_historial)
+        total_paginas = max(1, -(-total_historial // configuracion.HISTORIAL_TAMANO_PAGINA))
+        
+        if pagina['filas']:
+            st.dataframe(tabla_historial(pagina['filas']), use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay PQRS que coincidan con los filtros seleccionados")
+        
+        col_anterior, col_pagina, col_siguiente = st.columns([1, 2, 1])
+        with col_anterior:
+            st.button("◀ Anterior", key="historial_anterior", use_container_width=True,
+                      disabled=len(cursores) == 1, on_click=cursores.pop)
+        with col_pagina:
+            st.markdown(f"<div style='text-align: center'>Página {len(cursores)} de {total_paginas} "
+                        f"· {total_historial:,} PQRS</div>", unsafe_allow_html=True)
+        with col_siguiente:
+            st.button("Siguiente ▶", key="historial_siguiente", use_container_width=True,
+                      disabled=pagina['siguiente'] is None, on_click=cursores.append,
+                      args=(pagina['siguiente'],))
+    
+    # Exportación de todo el historial filtrado (no solo las filas mostradas), en segundo plano
+    st.markdown("#### 📥 Exportar historial")
+    col_formato, col_texto, col_exportar = st.columns(3)
+    with col_formato:
+        formato_exportacion = st.selectbox(
+            "Formato",
+            exportacion_historial.formatos_disponibles(),
+            format_func=lambda formato: exportacion_historial.FORMATOS[formato][0]
+        )
+    with col_texto:
+        incluir_texto = st.checkbox("Incluir el texto de las respuestas", value=True)
+    
+    exportacion = st.session_state.get('exportacion_historial')
+    en_curso = exportacion is not None and exportacion.estado == exportacion_historial.EN_CURSO
+    with col_exportar:
+        if st.button(f"📥 Exportar a {formato_exportacion.upper()}", type="secondary",
+                     use_container_width=True, disabled=en_curso):
+            if exportacion is not None:
+                exportacion.descartar()
+            exportacion = exportacion_historial.iniciar_exportacion_historial(
+                almacen, filtros_historial, formato_exportacion, incluir_texto
+            )
+            st.session_state.exportacion_historial = exportacion
+    
+    if exportacion is not None:
+        if exportacion.estado == exportacion_historial.EN_CURSO:
+            seguir_exportacion()
+        elif exportacion.estado == exportacion_historial.ERROR:
+            st.error(f"❌ {exportacion.error}")
+        else:
+            st.download_button(
+                label=f"⬇️ Descargar {exportacion.nombre_archivo} ({exportacion.filas:,} registros, "
+                      f"{os.path.getsize(exportacion.ruta) / 1e6:.1f} MB)",
+                data=exportacion.contenido,
+                file_name=exportacion.nombre_archivo,
+                mime=exportacion.mime,
+                use_container_width=True
+            )
 
-# Tab 4: Ayuda
-with tabs[3]:
+# Tab 5: Ayuda
+with tabs[4]:
     st.markdown("### ❓ Centro de Ayuda")
     
     with st.expander("🔍 ¿Cómo generar una respuesta PQRS?"):
@@ -1305,10 +1210,10 @@ with tabs[3]:
         """)
 
 # Footer con logo
-if logo_base64:
+if logo_pie:
     st.markdown(f"""
     <div style="text-align: center; padding: 2rem; color: #6C757D; margin-top: 3rem;">
-        <img src="data:image/webp;base64,{logo_base64}" style="width: 100px; margin-bottom: 1rem;">
+        <img src="{logo_pie}" style="width: 100px; margin-bottom: 1rem;">
         <p>Sistema PQRS Veolia Colombia v2.0 - Powered by AWS Bedrock & Claude AI</p>
         <p>© 2024 Veolia Colombia - Todos los derechos reservados</p>
     </div>
@@ -1319,4 +1224,6 @@ else:
         <p>Sistema PQRS Veolia Colombia v2.0 - Powered by AWS Bedrock & Claude AI</p>
         <p>© 2025 Veolia Colombia - Todos los derechos reservados</p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+obtener_metricas().observar('rerun', time.perf_counter() - inicio_rerun)
@@ -0,0 +1,201 @@
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import configuracion
+
+# ============================================================================
+# GENERACIÓN MASIVA DE PQRS
+# ============================================================================
+# Los hilos del pool no tienen contexto de Streamlit: aquí no se llama a st.*.
+# El progreso se entrega al llamador a medida que cada fila termina.
+
+TIPOS_VALIDOS = ('P', 'Q', 'R', 'S')
+# Nombres completos aceptados en la columna tipo, sin tildes y en mayúsculas
+TIPOS_POR_NOMBRE = {'PETICION': 'P', 'QUEJA': 'Q', 'RECLAMO': 'R', 'SUGERENCIA': 'S'}
+
+
+def _normalizar_tipo(valor):
+    """Retorna la letra del tipo si el valor es la letra o el nombre completo, o None"""
+    texto = unicodedata.normalize('NFKD', valor.strip().upper())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    if texto in TIPOS_VALIDOS:
+        return texto
+    return TIPOS_POR_NOMBRE.get(texto)
+
+
+def _buscar_columna(columnas, candidatas):
+    """Retorna el nombre real de la primera columna que coincida con alguna candidata"""
+    normalizadas = {str(c).strip().lower().replace('ú', 'u'): c for c in columnas}
+    for candidata in candidatas:
+        if candidata in normalizadas:
+            return normalizadas[candidata]
+    return None
+
+
+def leer_archivo_lote(archivo, nombre_archivo):
+    """Lee un CSV o Excel con columnas tipo y numero_contrato
+
+    Retorna (filas, errores): filas válidas como dicts y errores de validación por fila.
+    """
+    import pandas as pd
+
+    if nombre_archivo.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(archivo, dtype=str)
+    else:
+        df = pd.read_csv(archivo, dtype=str, sep=None, engine='python')
+
+    col_tipo = _buscar_columna(df.columns, ['tipo', 'tipo_pqrs', 'tipo pqrs'])
+    col_contrato = _buscar_columna(df.columns, ['numero_contrato', 'contrato', 'numero contrato', 'número de contrato'])
+    if col_tipo is None or col_contrato is None:
+        raise ValueError("El archivo debe tener las columnas 'tipo' y 'numero_contrato'")
+
+    filas = []
+    errores = []
+    for posicion, (tipo, contrato) in enumerate(zip(df[col_tipo], df[col_contrato]), start=1):
+        # Se acepta la letra o el nombre completo (Petición, Queja, Reclamo, Sugerencia)
+        tipo = str(tipo).strip() if pd.notna(tipo) else ''
+        contrato = str(contrato).strip() if pd.notna(contrato) else ''
+        letra = _normalizar_tipo(tipo)
+
+        if letra is None:
+            errores.append({'fila': posicion, 'tipo': tipo, 'numero_contrato': contrato,
+                            'estado': 'Error', 'error': 'Tipo de PQRS no válido'})
+        elif not (len(contrato) == 10 and contrato.isdigit()):
+            errores.append({'fila': posicion, 'tipo': letra, 'numero_contrato': contrato,
+                            'estado': 'Error', 'error': 'El contrato debe tener exactamente 10 dígitos'})
+        else:
+            filas.append({'fila': posicion, 'tipo': letra, 'numero_contrato': contrato})
+
+    if len(filas) > configuracion.LOTE_MAX_FILAS:
+        raise ValueError(f"El lote supera el máximo de {configuracion.LOTE_MAX_FILAS} filas")
+
+    return filas, errores
+
+
+def _procesar_fila(generador, fila):
+    """Genera la respuesta de una fila; nunca lanza excepciones"""
+    inicio = time.time()
+    resultado = {
+        'fila': fila['fila'],
+        'tipo': fila['tipo'],
+        'numero_contrato': fila['numero_contrato'],
+        'radicado': None,
+        'cliente': None,
+        'estado': 'Error',
+        'error': None,
+        'texto': None,
+        'datos_cliente': None,
+        'segundos': 0.0
+    }
+    try:
+        datos_cliente = generador.generar_datos_cliente(fila['numero_contrato'])
+        resultado['datos_cliente'] = datos_cliente
+        resultado['cliente'] = datos_cliente['nombre_completo']
+
+        texto, radicado, error = generador.generar_respuesta_bedrock(fila['tipo'], datos_cliente)
+        if error:
+            resultado['error'] = error
+        else:
+            resultado.update({'texto': texto, 'radicado': radicado, 'estado': 'Completada'})
+    except Exception as e:
+        resultado['error'] = f"Error inesperado: {str(e)}"
+
+    resultado['segundos'] = round(time.time() - inicio, 2)
+    return resultado
+
+
+def procesar_lote(generador, filas, max_workers=None):
+    """Procesa las filas en un pool acotado de hilos y entrega cada resultado al terminar"""
+    max_workers = max_workers or configuracion.LOTE_MAX_WORKERS
+    if not filas:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pqrs-lote') as pool:
+        futuros = [pool.submit(_procesar_fila, generador, fila) for fila in filas]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
+
+
+def encolar_lote(cola, generador, filas, lote):
+    """Encola una generación por fila en la cola durable, todas con el mismo id de lote"""
+    from cola_trabajos import encolar_generacion
+
+    for fila in filas:
+        datos_cliente = generador.generar_datos_cliente(fila['numero_contrato'])
+        encolar_generacion(cola, generador, fila['tipo'], datos_cliente, lote=lote, fila=fila['fila'])
+
+
+def resultados_lote(trabajos, almacen):
+    """Convierte los trabajos terminados de un lote en resultados como los de procesar_lote"""
+    from cola_trabajos import COMPLETADO
+
+    resultados = []
+    for trabajo in trabajos:
+        registro = almacen.obtener(trabajo['radicado']) if trabajo['estado'] == COMPLETADO else None
+        completada = registro is not None and registro['texto'] is not None
+        resultados.append({
+            'fila': trabajo['fila'],
+            'tipo': trabajo['tipo'],
+            'numero_contrato': trabajo['numero_contrato'],
+            'radicado': trabajo['radicado'],
+            'cliente': trabajo['datos_cliente']['nombre_completo'],
+            'estado': 'Completada' if completada else 'Error',
+            'error': None if completada else (trabajo['error'] or 'La carta no está en el almacén'),
+            'texto': registro['texto'] if completada else None,
+            'datos_cliente': trabajo['datos_cliente'],
+            'segundos': round((registro['tiempo_total_ms'] or 0) / 1000, 2) if completada else 0.0
+        })
+    return resultados
+
+
+def empaquetar_documentos(generador, resultados, formato='docx'):
+    """Genera un ZIP con un documento Word o PDF por cada radicado completado
+
+    Las filas que comparten radicado (repetidas en el lote) aportan un solo documento.
+    """
+    zip_buffer = BytesIO()
+    incluidos = set()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for resultado in resultados:
+            if resultado['estado'] != 'Completada' or resultado['radicado'] in incluidos:
+                continue
+            incluidos.add(resultado['radicado'])
+            nombre = f"{resultado['radicado']}.{formato}"
+            if formato == 'pdf':
+                # El PDF se escribe directo en la entrada del ZIP, sin copia intermedia
+                with zip_file.open(nombre, 'w') as entrada:
+                    generador.escribir_documento_pdf(
+                        entrada,
+                        resultado['texto'],
+                        resultado['radicado'],
+                        resultado['datos_cliente']
+                    )
+            else:
+                documento = generador.documento_word_bytes(
+                    resultado['texto'],
+                    resultado['radicado'],
+                    resultado['datos_cliente']
+                )
+                zip_file.writestr(nombre, documento)
+    return zip_buffer.getvalue()
+
+
+def tabla_resultados(resultados):
+    """Convierte los resultados del lote en un DataFrame para mostrar"""
+    import pandas as pd
+
+    columnas = ['fila', 'tipo', 'numero_contrato', 'radicado', 'cliente', 'estado', 'error', 'segundos']
+    df = pd.DataFrame([{c: r.get(c) for c in columnas} for r in resultados], columns=columnas)
+    return df.sort_values('fila').rename(columns={
+        'fila': 'Fila',
+        'tipo': 'Tipo',
+        'numero_contrato': 'Contrato',
+        'radicado': 'Radicado',
+        'cliente': 'Cliente',
+        'estado': 'Estado',
+        'error': 'Error',
+        'segundos': 'Segundos'
+    })
@@ -0,0 +1,216 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import configuracion
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# MÉTRICAS POR ETAPA
+# ============================================================================
+# Histogramas de duración de cada etapa del pipeline (datos del cliente,
+# prompt, Bedrock, parseo, render, rerun) con cubetas fijas, como los de
+# Prometheus: observar es O(log cubetas) y no guarda muestras. Se exportan en
+# formato de texto de Prometheus desde un endpoint HTTP local y, si se
+# configura, a un archivo para el textfile collector de node_exporter.
+# Son del proceso: con varias réplicas, cada una expone las suyas.
+
+# Límites superiores (segundos) de las cubetas; la última es +Inf
+CUBETAS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+NOMBRE_METRICA = 'pqrs_etapa_segundos'
+
+# Orden en que se muestran las etapas conocidas
+ETAPAS = ('datos_cliente', 'casos_similares', 'construir_prompt', 'bedrock_primer_token', 'bedrock_total',
+          'parseo_respuesta', 'render_docx', 'render_pdf', 'rerun')
+
+
+class Histograma:
+    """Conteos por cubeta, suma y total de observaciones en segundos"""
+
+    def __init__(self, cubetas=CUBETAS_SEGUNDOS):
+        self.cubetas = cubetas
+        self.conteos = [0] * (len(cubetas) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos):
+        indice = bisect.bisect_left(self.cubetas, segundos)
+        with self._lock:
+            self.conteos[indice] += 1
+            self.suma += segundos
+            self.total += 1
+
+    def instantanea(self):
+        """Copia consistente de (conteos, suma, total)"""
+        with self._lock:
+            return list(self.conteos), self.suma, self.total
+
+    def percentil(self, fraccion):
+        """Estimación del percentil interpolando dentro de la cubeta (como histogram_quantile)"""
+        conteos, _, total = self.instantanea()
+        if not total:
+            return None
+        objetivo = fraccion * total
+        acumulado = 0
+        for indice, cantidad in enumerate(conteos):
+            if cantidad and acumulado + cantidad >= objetivo:
+                if indice == len(self.cubetas):
+                    return self.cubetas[-1]
+                inferior = self.cubetas[indice - 1] if indice else 0.0
+                return inferior + (self.cubetas[indice] - inferior) * (objetivo - acumulado) / cantidad
+            acumulado += cantidad
+        return self.cubetas[-1]
+
+
+class RegistroMetricas:
+    """Histogramas por etapa, creados en la primera observación"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    def histograma(self, etapa):
+        histograma = self._histogramas.get(etapa)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(etapa, Histograma())
+        return histograma
+
+    def observar(self, etapa, segundos):
+        self.histograma(etapa).observar(segundos)
+
+    @contextmanager
+    def medir(self, etapa):
+        """Observa la duración del bloque with, también si lanza una excepción"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio)
+
+    def etapas(self):
+        """Etapas con observaciones: primero las conocidas en su orden, luego el resto"""
+        registradas = list(self._histogramas)
+        return [e for e in ETAPAS if e in registradas] + sorted(e for e in registradas if e not in ETAPAS)
+
+    def resumen(self):
+        """{etapa: {'total', 'promedio', 'p50', 'p95', 'p99'}} en segundos"""
+        resumen = {}
+        for etapa in self.etapas():
+            histograma = self._histogramas[etapa]
+            _, suma, total = histograma.instantanea()
+            resumen[etapa] = {
+                'total': total,
+                'promedio': suma / total if total else None,
+                'p50': histograma.percentil(0.50),
+                'p95': histograma.percentil(0.95),
+                'p99': histograma.percentil(0.99)
+            }
+        return resumen
+
+    def exportar_prometheus(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        lineas = [
+            f"# HELP {NOMBRE_METRICA} Duración de cada etapa del pipeline PQRS",
+            f"# TYPE {NOMBRE_METRICA} histogram"
+        ]
+        for etapa in self.etapas():
+            histograma = self._histogramas[etapa]
+            conteos, suma, total = histograma.instantanea()
+            acumulado = 0
+            for limite, cantidad in zip(histograma.cubetas, conteos):
+                acumulado += cantidad
+                lineas.append(f'{NOMBRE_METRICA}_bucket{{etapa="{etapa}",le="{limite:g}"}} {acumulado}')
+            lineas.append(f'{NOMBRE_METRICA}_bucket{{etapa="{etapa}",le="+Inf"}} {total}')
+            lineas.append(f'{NOMBRE_METRICA}_sum{{etapa="{etapa}"}} {suma:.6f}')
+            lineas.append(f'{NOMBRE_METRICA}_count{{etapa="{etapa}"}} {total}')
+        return '\n'.join(lineas) + '\n'
+
+    def escribir_archivo(self, ruta):
+        """Escribe la exposición en ruta de forma atómica (archivo temporal y rename)"""
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.exportar_prometheus())
+        os.replace(temporal, ruta)
+
+
+def _servir_http(registro, host, puerto):
+    """Sirve /metrics en un hilo de fondo; si el puerto está ocupado solo lo registra"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = registro.exportar_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    except OSError as e:
+        # Otra réplica en el mismo servidor ya tiene el puerto
+        logger.warning("No se pudo exponer métricas en %s:%s: %s", host, puerto, e)
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='pqrs-metricas-http', daemon=True).start()
+    return servidor
+
+
+def _escribir_periodicamente(registro, ruta, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            registro.escribir_archivo(ruta)
+        except OSError:
+            logger.exception("No se pudieron escribir las métricas en %s", ruta)
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+_exportando = False
+
+
+def obtener_metricas():
+    """Retorna el registro de métricas del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = RegistroMetricas()
+    return _instancia
+
+
+def iniciar_exportacion():
+    """Inicia una sola vez el endpoint HTTP y la escritura a archivo configurados"""
+    global _exportando
+    if _exportando:
+        return
+    with _lock_instancia:
+        if _exportando:
+            return
+        _exportando = True
+    registro = obtener_metricas()
+    if configuracion.METRICAS_PUERTO:
+        _servir_http(registro, configuracion.METRICAS_HOST, configuracion.METRICAS_PUERTO)
+    if configuracion.METRICAS_ARCHIVO:
+        threading.Thread(
+            target=_escribir_periodicamente,
+            args=(registro, configuracion.METRICAS_ARCHIVO, configuracion.METRICAS_INTERVALO_SEGUNDOS),
+            name='pqrs-metricas-archivo',
+            daemon=True
+        ).start()
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import configuracion
+
+# ============================================================================
+# MOTOR DE GENERACIÓN
+# ============================================================================
+# Todo el tráfico hacia Bedrock del proceso pasa por aquí. Un hilo de fondo
+# corre su propio loop de asyncio; cada solicitud es una corrutina que espera
+# un semáforo (tope de generaciones en vuelo) y ejecuta las llamadas
+# bloqueantes de boto3 en un executor del tamaño del pool de conexiones.
+# Quien envía recibe de inmediato un manejador (Generacion) o un Future y
+# sigue su camino: el script de Streamlit ya no queda bloqueado mientras
+# Bedrock responde, y las generaciones en cola no ocupan hilos.
+#
+# boto3 es bloqueante: una generación en vuelo ocupa un hilo del executor
+# mientras espera cada evento del stream, es decir, casi toda la carta. Las
+# generaciones simultáneas reales son, entonces, tantas como hilos
+# (BEDROCK_MAX_CONEXIONES); por eso el tope en vuelo nunca pasa de ese número
+# y el resto espera en la cola del semáforo.
+
+EN_COLA = 'en_cola'
+GENERANDO = 'generando'
+COMPLETADA = 'completada'
+ERROR = 'error'
+
+
+class Generacion:
+    """Manejador de una generación enviada al motor; la UI lo consulta sin bloquearse
+
+    texto crece a medida que llegan fragmentos (solo en modo streaming).
+    resultado() retorna (texto, radicado, error) como generar_respuesta_bedrock.
+    """
+
+    def __init__(self, id_generacion, tipo_pqrs, datos_cliente, streaming):
+        self.id = id_generacion
+        self.tipo = tipo_pqrs
+        self.datos_cliente = datos_cliente
+        self.streaming = streaming
+        self.estado = EN_COLA
+        self.texto = ""
+        self.radicado = None
+        self.error = None
+        self.desde_cache = False
+        self.caso_similar = None
+        self.enviada_en = time.perf_counter()
+        self.futuro = None
+
+    def terminada(self):
+        return self.futuro is not None and self.futuro.done()
+
+    def resultado(self, timeout=None):
+        """Espera a que termine (hasta timeout segundos) y retorna (texto, radicado, error)"""
+        return self.futuro.result(timeout)
+
+
+class MotorGeneracion:
+    """Loop de asyncio en un hilo de fondo que ejecuta las generaciones del proceso"""
+
+    def __init__(self, max_en_vuelo=None, hilos=None):
+        self.hilos = hilos or configuracion.BEDROCK_MAX_CONEXIONES
+        # Más en vuelo que hilos solo movería la espera del semáforo a la cola del executor
+        self.max_en_vuelo = min(max_en_vuelo or configuracion.MOTOR_MAX_EN_VUELO, self.hilos)
+        self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='pqrs-bedrock')
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._semaforo = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._contadores = {'enviadas': 0, 'en_cola': 0, 'en_vuelo': 0, 'completadas': 0, 'errores': 0}
+
+        listo = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, args=(listo,), name='pqrs-motor', daemon=True)
+        self._hilo.start()
+        listo.wait()
+
+    def _correr(self, listo):
+        asyncio.set_event_loop(self._loop)
+        # El semáforo se crea dentro de su loop
+        self._semaforo = asyncio.Semaphore(self.max_en_vuelo)
+        self._loop.call_soon(listo.set)
+        self._loop.run_forever()
+
+    def _sumar(self, **deltas):
+        with self._lock:
+            for clave, delta in deltas.items():
+                self._contadores[clave] += delta
+
+    async def _con_turno(self, corrutina_fn):
+        """Espera un turno del semáforo y corre corrutina_fn() dentro de él"""
+        async with self._semaforo:
+            self._sumar(en_cola=-1, en_vuelo=1)
+            try:
+                return await corrutina_fn()
+            finally:
+                self._sumar(en_vuelo=-1)
+
+    def _enviar(self, corrutina_fn):
+        """Programa la corrutina en el loop del motor y retorna un concurrent.futures.Future"""
+        self._sumar(enviadas=1, en_cola=1)
+        futuro = asyncio.run_coroutine_threadsafe(self._con_turno(corrutina_fn), self._loop)
+        futuro.add_done_callback(self._contar_fin)
+        return futuro
+
+    def _contar_fin(self, futuro):
+        if futuro.cancelled() or futuro.exception() is not None:
+            self._sumar(errores=1)
+        else:
+            self._sumar(completadas=1)
+
+    def ejecutar(self, funcion, *args):
+        """Corre funcion(*args) en el executor cuando haya turno; retorna un Future"""
+        async def tarea():
+            return await self._loop.run_in_executor(None, funcion, *args)
+        return self._enviar(tarea)
+
+    def generar(self, generador, tipo_pqrs, datos_cliente, regenerar=False, streaming=True):
+        """Envía una generación y retorna su Generacion sin esperar a Bedrock"""
+        generacion = Generacion(next(self._ids), tipo_pqrs, datos_cliente, streaming)
+
+        async def tarea():
+            generacion.estado = GENERANDO
+            if streaming:
+                resultado = await self._leer_stream(generacion, generador, regenerar)
+            else:
+                resultado = await self._loop.run_in_executor(
+                    None, generador.generar_respuesta_bedrock, tipo_pqrs, datos_cliente, regenerar
+                )
+            texto, radicado, error = resultado
+            if error:
+                generacion.error = error
+                generacion.estado = ERROR
+            else:
+                generacion.texto = texto
+                generacion.radicado = radicado
+                generacion.estado = COMPLETADA
+            return resultado
+
+        generacion.futuro = self._enviar(tarea)
+        return generacion
+
+    async def _leer_stream(self, generacion, generador, regenerar):
+        """Abre el stream y lo consume fragmento a fragmento; cada espera ocupa un hilo del executor"""
+        streaming = await self._loop.run_in_executor(
+            None, generador.generar_respuesta_bedrock_stream,
+            generacion.tipo, generacion.datos_cliente, regenerar
+        )
+        generacion.radicado = streaming.radicado
+        generacion.desde_cache = streaming.desde_cache
+        generacion.caso_similar = streaming.caso_similar
+        fragmentos = iter(streaming)
+        while await self._loop.run_in_executor(None, next, fragmentos, None) is not None:
+            generacion.texto = streaming.texto
+        return streaming.resultado()
+
+    def estadisticas(self):
+        with self._lock:
+            estadisticas = dict(self._contadores)
+        estadisticas.update({'max_en_vuelo': self.max_en_vuelo, 'hilos': self.hilos})
+        return estadisticas
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_motor():
+    """Retorna el motor de generación del proceso, iniciándolo la primera vez"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = MotorGeneracion()
+    return _instancia
@@ -0,0 +1,200 @@
+import os
+import threading
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm, inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+import configuracion
+from recursos import ANCHO_DOCUMENTO, obtener_recursos
+
+# ============================================================================
+# RENDERIZADOR PDF
+# ============================================================================
+# Misma carta que construir_documento_word, dibujada con reportlab. Estilos y
+# logo se preparan una sola vez por proceso: el logo es la variante JPEG de
+# recursos, que reportlab incrusta sin recomprimir. Cada carta se escribe en
+# el buffer que entrega el llamador.
+#
+# El texto usa una fuente TrueType incrustada (subconjunto de los glifos
+# usados), no las base-14 de PDF: el archivo se ve igual en cualquier visor,
+# tildes y eñes incluidas.
+
+AZUL_VEOLIA = colors.Color(0, 75 / 255, 135 / 255)
+VERDE_VEOLIA = colors.Color(0, 169 / 255, 130 / 255)
+
+MARGEN_SUPERIOR = 2.5 * cm
+MARGEN_INFERIOR = 2.5 * cm
+MARGEN_IZQUIERDO = 3 * cm
+MARGEN_DERECHO = 3 * cm
+# Distancias del encabezado y pie al borde de la página (las de Word por defecto)
+DISTANCIA_ENCABEZADO = 0.5 * inch
+DISTANCIA_PIE = 0.5 * inch
+
+ANCHO_LOGO = 2 * inch
+
+FUENTE = 'CartaSans'
+FUENTE_NEGRITA = 'CartaSans-Negrita'
+
+FIRMA = "MARÍA FERNANDA LÓPEZ GARCÍA\nCoordinadora Servicio al Cliente\nVeolia Colombia"
+
+
+def _ruta_fuente(ruta, respaldo):
+    """La fuente configurada o, si no existe, la equivalente de Bitstream Vera incluida en reportlab"""
+    if ruta and os.path.exists(ruta):
+        return ruta
+    import reportlab
+    return os.path.join(os.path.dirname(reportlab.__file__), 'fonts', respaldo)
+
+
+def registrar_fuentes():
+    """Registra una sola vez por proceso las fuentes TrueType de la carta"""
+    if FUENTE in pdfmetrics.getRegisteredFontNames():
+        return
+    pdfmetrics.registerFont(TTFont(FUENTE, _ruta_fuente(configuracion.PDF_FUENTE, 'Vera.ttf')))
+    pdfmetrics.registerFont(TTFont(FUENTE_NEGRITA, _ruta_fuente(configuracion.PDF_FUENTE_NEGRITA, 'VeraBd.ttf')))
+    # <b> dentro de un Paragraph usa la negrita de la misma familia
+    pdfmetrics.registerFontFamily(FUENTE, normal=FUENTE, bold=FUENTE_NEGRITA,
+                                  italic=FUENTE, boldItalic=FUENTE_NEGRITA)
+
+
+def _texto_parrafo(texto):
+    """Escapa texto para un Paragraph de reportlab conservando los saltos de línea"""
+    return escape(texto).replace('\n', '<br/>')
+
+
+class PlantillaPDF:
+    """Estilos y logo de la carta en PDF, preparados una vez y reutilizados"""
+
+    def __init__(self, logo_path):
+        self.logo = None
+        if logo_path:
+            recursos = obtener_recursos(logo_path)
+            jpeg = recursos.logo_jpeg(ANCHO_DOCUMENTO)
+            if jpeg:
+                self.logo = (jpeg, ANCHO_LOGO * recursos.alto_logo(ANCHO_DOCUMENTO) / ANCHO_DOCUMENTO)
+        alto_encabezado = self.logo[1] if self.logo else 14
+        # Igual que Word: si el encabezado no cabe en el margen, el cuerpo baja
+        self.margen_superior = max(MARGEN_SUPERIOR, DISTANCIA_ENCABEZADO + alto_encabezado + 0.3 * cm)
+
+        registrar_fuentes()
+        self.estilo_normal = ParagraphStyle(
+            'CartaNormal', fontName=FUENTE, fontSize=11, leading=13.5, alignment=TA_LEFT
+        )
+        self.estilo_derecha = ParagraphStyle('CartaDerecha', parent=self.estilo_normal, alignment=TA_RIGHT)
+        self.estilo_cuerpo = ParagraphStyle('CartaCuerpo', parent=self.estilo_normal, alignment=TA_JUSTIFY)
+        self.estilo_negrita = ParagraphStyle('CartaNegrita', parent=self.estilo_normal, fontName=FUENTE_NEGRITA)
+        self.espacio = Spacer(1, self.estilo_normal.leading)
+
+    def _dibujar_pagina(self, canvas, doc):
+        """Encabezado con logo y pie de página, en cada página"""
+        ancho_pagina, alto_pagina = doc.pagesize
+        tope = alto_pagina - DISTANCIA_ENCABEZADO
+        canvas.saveState()
+
+        if self.logo:
+            jpeg, alto_logo = self.logo
+            canvas.drawImage(ImageReader(BytesIO(jpeg)), MARGEN_IZQUIERDO, tope - alto_logo,
+                             width=ANCHO_LOGO, height=alto_logo)
+        else:
+            # Si no se puede cargar el logo, texto en su lugar
+            canvas.setFont(FUENTE_NEGRITA, 14)
+            canvas.setFillColor(AZUL_VEOLIA)
+            canvas.drawString(MARGEN_IZQUIERDO, tope - 14, 'VEOLIA')
+
+        canvas.setFont(FUENTE, 10)
+        canvas.setFillColor(AZUL_VEOLIA)
+        canvas.drawRightString(ancho_pagina - MARGEN_DERECHO, tope - 10, 'Gestión del Agua y Servicios Ambientales')
+
+        centro = ancho_pagina / 2
+        canvas.setFont(FUENTE, 8)
+        canvas.setFillColor(VERDE_VEOLIA)
+        canvas.drawCentredString(centro, DISTANCIA_PIE + 10, 'Veolia Colombia - Comprometidos con el Medio Ambiente')
+        canvas.setFillColor(colors.black)
+        canvas.drawCentredString(centro, DISTANCIA_PIE, 'Línea gratuita nacional: 01 8000 123 456 - www.veolia.com.co')
+
+        canvas.restoreState()
+
+    def escribir(self, buffer, texto, radicado, nombre, direccion, fecha, tipo):
+        """Escribe el PDF de la carta en buffer (cualquier objeto con write)"""
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=letter,
+            topMargin=self.margen_superior,
+            bottomMargin=MARGEN_INFERIOR,
+            leftMargin=MARGEN_IZQUIERDO,
+            rightMargin=MARGEN_DERECHO,
+            title=f"Respuesta a {tipo} - {radicado}",
+            author="Veolia Colombia",
+            subject=f"Radicado {radicado}",
+            creator="Sistema PQRS Veolia",
+            lang="es-CO",
+            # Sin esto el canvas declara Helvetica (no incrustada) en cada página
+            initialFontName=FUENTE
+        )
+
+        elementos = [
+            self.espacio,
+            Paragraph(_texto_parrafo(f"Bogotá D.C., {fecha}\nRadicado: {radicado}"), self.estilo_derecha),
+            self.espacio,
+            Paragraph(_texto_parrafo(f"Señor(a)\n{nombre}\n{direccion}\nBogotá D.C."), self.estilo_normal),
+            self.espacio,
+            Paragraph(_texto_parrafo(f"Asunto: Respuesta a {tipo} radicada"), self.estilo_negrita),
+            self.espacio,
+            Paragraph("Respetado(a) señor(a):", self.estilo_normal),
+            self.espacio
+        ]
+        for parrafo in texto.split('\n\n'):
+            if parrafo.strip():
+                elementos.append(Paragraph(_texto_parrafo(parrafo), self.estilo_cuerpo))
+                elementos.append(Spacer(1, 6))
+        elementos.extend([
+            self.espacio,
+            Paragraph("Cordialmente,", self.estilo_normal),
+            self.espacio,
+            self.espacio,
+            Paragraph(_texto_parrafo(FIRMA), self.estilo_negrita)
+        ])
+
+        doc.build(elementos, onFirstPage=self._dibujar_pagina, onLaterPages=self._dibujar_pagina)
+        return buffer
+
+
+_lock = threading.Lock()
+_plantillas = {}
+
+
+def obtener_plantilla_pdf(logo_path, version):
+    """Retorna la plantilla PDF del proceso para el logo y la versión de diseño dados"""
+    clave = (logo_path, version)
+    plantilla = _plantillas.get(clave)
+    if plantilla is None:
+        with _lock:
+            plantilla = _plantillas.get(clave)
+            if plantilla is None:
+                plantilla = PlantillaPDF(logo_path)
+                _plantillas[clave] = plantilla
+    return plantilla
+
+
+def escribir_documento_pdf(generador, version, buffer, texto, radicado, datos_cliente, fecha=None):
+    """Escribe la carta en PDF en buffer con los mismos datos que la versión Word"""
+    fecha = fecha or datetime.now()
+    return obtener_plantilla_pdf(generador.logo_path, version).escribir(
+        buffer,
+        texto,
+        radicado,
+        datos_cliente['nombre_completo'],
+        datos_cliente['direccion'],
+        fecha.strftime('%d de %B de %Y'),
+        generador.tipos_pqrs[radicado[4]].lower()
+    )
@@ -0,0 +1,147 @@
+import re
+import threading
+import zipfile
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# ============================================================================
+# RENDERIZADOR WORD POR PLANTILLA
+# ============================================================================
+# Construir la carta con python-docx crea cientos de objetos por documento.
+# Aquí la carta se arma una sola vez con marcadores en lugar de los datos
+# (usando el mismo construir_documento_word, así el diseño es idéntico). Las
+# demás partes del paquete se comprimen una sola vez; por cada carta solo se
+# reemplazan los marcadores en word/document.xml y se agrega al ZIP base.
+
+MARCA_FECHA = '@@FECHA@@'
+MARCA_RADICADO = '@@RADICADO@@'
+MARCA_NOMBRE = '@@NOMBRE@@'
+MARCA_DIRECCION = '@@DIRECCION@@'
+MARCA_TIPO = '@@TIPO@@'
+MARCA_CUERPO = '@@CUERPO@@'
+
+PARTE_DOCUMENTO = 'word/document.xml'
+
+_PATRON_MARCAS = re.compile('|'.join(re.escape(m) for m in (
+    MARCA_FECHA, MARCA_RADICADO, MARCA_NOMBRE, MARCA_DIRECCION, MARCA_TIPO
+)))
+# Caracteres que no admite XML 1.0 (python-docx los rechaza con error)
+_PATRON_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_PATRON_SEPARADORES = re.compile('([\t\r\n])')
+
+
+def _texto_xml(texto):
+    """Escapa texto para XML eliminando caracteres no permitidos"""
+    return escape(_PATRON_INVALIDOS.sub('', texto))
+
+
+def _contenido_run(texto):
+    """XML del contenido de un run, igual al que genera python-docx para run.text"""
+    partes = []
+    for segmento in _PATRON_SEPARADORES.split(texto):
+        if not segmento:
+            continue
+        if segmento == '\t':
+            partes.append('<w:tab/>')
+        elif segmento in ('\r', '\n'):
+            partes.append('<w:br/>')
+        elif len(segmento.strip()) < len(segmento):
+            partes.append(f'<w:t xml:space="preserve">{_texto_xml(segmento)}</w:t>')
+        else:
+            partes.append(f'<w:t>{_texto_xml(segmento)}</w:t>')
+    return ''.join(partes)
+
+
+class PlantillaWord:
+    """Plantilla .docx precompilada que se rellena parcheando document.xml"""
+
+    def __init__(self, generador):
+        doc = generador.construir_documento_word(
+            parrafos=[MARCA_CUERPO],
+            radicado=MARCA_RADICADO,
+            nombre=MARCA_NOMBRE,
+            direccion=MARCA_DIRECCION,
+            fecha=MARCA_FECHA,
+            tipo=MARCA_TIPO
+        )
+        buffer = BytesIO()
+        doc.save(buffer)
+
+        # ZIP base con todas las partes menos document.xml, ya comprimidas
+        base = BytesIO()
+        with zipfile.ZipFile(BytesIO(buffer.getvalue())) as original, \
+                zipfile.ZipFile(base, 'w', zipfile.ZIP_DEFLATED) as paquete:
+            for info in original.infolist():
+                if info.filename == PARTE_DOCUMENTO:
+                    documento = original.read(info.filename).decode('utf-8')
+                else:
+                    paquete.writestr(info.filename, original.read(info.filename))
+        self.paquete_base = base.getvalue()
+
+        # Se separa el párrafo del cuerpo para repetirlo una vez por párrafo de la carta
+        marca = f'<w:t>{MARCA_CUERPO}</w:t>'
+        posicion = documento.index(marca)
+        inicio_parrafo = max(documento.rfind('<w:p>', 0, posicion), documento.rfind('<w:p ', 0, posicion))
+        fin_parrafo = documento.index('</w:p>', posicion) + len('</w:p>')
+
+        self.antes_cuerpo = documento[:inicio_parrafo]
+        self.despues_cuerpo = documento[fin_parrafo:]
+        self.apertura_parrafo = documento[inicio_parrafo:posicion]
+        self.cierre_parrafo = documento[posicion + len(marca):fin_parrafo]
+
+    def renderizar(self, texto, radicado, nombre, direccion, fecha, tipo):
+        """Retorna los bytes del .docx con los datos de la carta"""
+        valores = {
+            MARCA_FECHA: _texto_xml(fecha),
+            MARCA_RADICADO: _texto_xml(radicado),
+            MARCA_NOMBRE: _texto_xml(nombre),
+            MARCA_DIRECCION: _texto_xml(direccion),
+            MARCA_TIPO: _texto_xml(tipo)
+        }
+
+        def reemplazar(coincidencia):
+            return valores[coincidencia.group(0)]
+
+        cuerpo = ''.join(
+            f'{self.apertura_parrafo}{_contenido_run(parrafo)}{self.cierre_parrafo}'
+            for parrafo in texto.split('\n\n') if parrafo.strip()
+        )
+        documento = (_PATRON_MARCAS.sub(reemplazar, self.antes_cuerpo) + cuerpo
+                     + _PATRON_MARCAS.sub(reemplazar, self.despues_cuerpo))
+
+        salida = BytesIO(self.paquete_base)
+        salida.seek(0, 2)
+        with zipfile.ZipFile(salida, 'a', zipfile.ZIP_DEFLATED) as paquete:
+            paquete.writestr(PARTE_DOCUMENTO, documento.encode('utf-8'))
+        return salida.getvalue()
+
+
+_lock = threading.Lock()
+_plantillas = {}
+
+
+def obtener_plantilla_word(generador, version):
+    """Retorna la plantilla del proceso para el logo y la versión de diseño dados"""
+    clave = (generador.logo_path, version)
+    plantilla = _plantillas.get(clave)
+    if plantilla is None:
+        with _lock:
+            plantilla = _plantillas.get(clave)
+            if plantilla is None:
+                plantilla = PlantillaWord(generador)
+                _plantillas[clave] = plantilla
+    return plantilla
+
+
+def renderizar_documento_word(generador, version, texto, radicado, datos_cliente, fecha=None):
+    """Renderiza la carta con la plantilla; equivale a generador.generar_documento_word"""
+    fecha = fecha or datetime.now()
+    return obtener_plantilla_word(generador, version).renderizar(
+        texto,
+        radicado,
+        datos_cliente['nombre_completo'],
+        datos_cliente['direccion'],
+        fecha.strftime('%d de %B de %Y'),
+        generador.tipos_pqrs[radicado[4]].lower()
+    )
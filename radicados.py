@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import configuracion
+
+# ============================================================================
+# GENERADOR DE RADICADOS
+# ============================================================================
+# Formato: VEO-{tipo}-{AAAAMMDD}-{HHMMSS}-{secuencia}. La secuencia es diaria y
+# se incrementa de forma atómica en un archivo SQLite compartido, así que dos
+# radicados nunca coinciden aunque se pidan en el mismo segundo desde varios
+# hilos o procesos del mismo servidor, y crecen en el orden en que se emiten.
+
+DIGITOS_SECUENCIA = 6
+
+
+class GeneradorRadicados:
+    """Emite radicados únicos y monótonos con una secuencia diaria en SQLite"""
+
+    def __init__(self, ruta_db):
+        self.ruta_db = ruta_db
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        # Una conexión por proceso; entre procesos serializa el bloqueo de SQLite
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute("PRAGMA busy_timeout=30000")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS secuencias_radicado (
+                fecha TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            )
+        """)
+
+    def siguiente_secuencia(self, fecha):
+        """Incrementa y retorna la secuencia del día (fecha en formato AAAAMMDD)"""
+        with self._lock:
+            return self._conexion.execute(
+                """INSERT INTO secuencias_radicado (fecha, valor) VALUES (?, 1)
+                   ON CONFLICT (fecha) DO UPDATE SET valor = valor + 1
+                   RETURNING valor""",
+                (fecha,)
+            ).fetchone()[0]
+
+    def siguiente(self, tipo_pqrs):
+        """Genera el siguiente radicado para el tipo de PQRS"""
+        # Una sola lectura del reloj: fecha y hora no pueden quedar en días distintos
+        ahora = datetime.now()
+        fecha = ahora.strftime("%Y%m%d")
+        secuencia = self.siguiente_secuencia(fecha)
+        return f"VEO-{tipo_pqrs}-{fecha}-{ahora.strftime('%H%M%S')}-{secuencia:0{DIGITOS_SECUENCIA}d}"
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_generador_radicados():
+    """Retorna el generador de radicados compartido del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = GeneradorRadicados(configuracion.RADICADOS_RUTA)
+    return _instancia
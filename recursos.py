@@ -0,0 +1,130 @@
+import base64
+import os
+import re
+import threading
+from io import BytesIO
+
+import configuracion
+
+# ============================================================================
+# RECURSOS ESTÁTICOS
+# ============================================================================
+# El logo se decodifica una sola vez por proceso y de él salen las variantes
+# PNG/JPEG que necesita cada uso, ya escaladas. python-docx no admite webp,
+# por eso Word usa la variante PNG. También se guarda la hoja de estilos ya
+# compactada, lista para enviarse con st.markdown en cada rerun.
+
+RUTA_ESTILOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'estilos.css')
+
+# Anchos en píxeles de cada uso del logo (las imágenes de la interfaz van al
+# doble de su ancho CSS para pantallas de alta densidad)
+ANCHO_ENCABEZADO = 300
+ANCHO_VISTA_PREVIA = 240
+ANCHO_PIE = 200
+ANCHO_SIDEBAR = 400
+# 2 pulgadas a 200 dpi, en Word y PDF
+ANCHO_DOCUMENTO = 400
+
+
+def _compactar_css(css):
+    """Quita comentarios y sangría; sin líneas vacías que corten el bloque HTML"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    return '\n'.join(linea.strip() for linea in css.splitlines() if linea.strip())
+
+
+class RecursosEstaticos:
+    """Logo y estilos de la aplicación, preparados una vez y reutilizados"""
+
+    def __init__(self, logo_path):
+        self.logo_path = logo_path
+        self._lock = threading.Lock()
+        self._logo = None
+        self._logo_cargado = False
+        self._variantes = {}
+        self._css = None
+
+    def _imagen_logo(self):
+        """Logo decodificado en RGBA, o None si no se puede leer"""
+        if not self._logo_cargado:
+            try:
+                from PIL import Image
+
+                with Image.open(self.logo_path) as imagen:
+                    self._logo = imagen.convert('RGBA')
+            except Exception:
+                self._logo = None
+            self._logo_cargado = True
+        return self._logo
+
+    def _variante(self, formato, ancho):
+        clave = (formato, ancho)
+        if clave in self._variantes:
+            return self._variantes[clave]
+
+        with self._lock:
+            if clave not in self._variantes:
+                logo = self._imagen_logo()
+                contenido = None
+                if logo is not None:
+                    from PIL import Image
+
+                    alto = max(1, round(logo.height * ancho / logo.width))
+                    imagen = logo.resize((ancho, alto), Image.LANCZOS)
+                    salida = BytesIO()
+                    if formato == 'JPEG':
+                        # JPEG no tiene transparencia: se aplana sobre blanco
+                        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+                        fondo.paste(imagen, mask=imagen.getchannel('A'))
+                        fondo.save(salida, format='JPEG', quality=90)
+                    else:
+                        imagen.save(salida, format='PNG', optimize=True)
+                    contenido = (salida.getvalue(), alto)
+                self._variantes[clave] = contenido
+        return self._variantes[clave]
+
+    def logo_png(self, ancho):
+        """Bytes PNG del logo al ancho dado, o None si no hay logo"""
+        variante = self._variante('PNG', ancho)
+        return variante[0] if variante else None
+
+    def logo_jpeg(self, ancho):
+        """Bytes JPEG (fondo blanco) del logo al ancho dado, o None si no hay logo"""
+        variante = self._variante('JPEG', ancho)
+        return variante[0] if variante else None
+
+    def alto_logo(self, ancho):
+        """Alto en píxeles del logo escalado al ancho dado, o None si no hay logo"""
+        variante = self._variante('PNG', ancho)
+        return variante[1] if variante else None
+
+    def logo_data_uri(self, ancho):
+        """URI data: del PNG del logo para incrustar en HTML, o None si no hay logo"""
+        clave = ('URI', ancho)
+        if clave not in self._variantes:
+            png = self.logo_png(ancho)
+            self._variantes[clave] = f"data:image/png;base64,{base64.b64encode(png).decode()}" if png else None
+        return self._variantes[clave]
+
+    def css(self):
+        """Bloque <style> de la aplicación"""
+        if self._css is None:
+            with open(RUTA_ESTILOS, encoding='utf-8') as archivo:
+                self._css = f"<style>\n{_compactar_css(archivo.read())}\n</style>"
+        return self._css
+
+
+_lock_instancias = threading.Lock()
+_instancias = {}
+
+
+def obtener_recursos(logo_path=None):
+    """Retorna los recursos del proceso para un logo (por defecto el configurado)"""
+    logo_path = logo_path or configuracion.LOGO_PATH
+    recursos = _instancias.get(logo_path)
+    if recursos is None:
+        with _lock_instancias:
+            recursos = _instancias.get(logo_path)
+            if recursos is None:
+                recursos = RecursosEstaticos(logo_path)
+                _instancias[logo_path] = recursos
+    return recursos
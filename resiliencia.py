@@ -0,0 +1,293 @@
+import random
+import threading
+import time
+
+import configuracion
+
+# ============================================================================
+# RESILIENCIA DE LAS LLAMADAS A BEDROCK
+# ============================================================================
+# Cada llamada pasa por un circuit breaker, un límite adaptativo de llamadas
+# simultáneas (AIMD: crece de a poco con cada éxito y se reduce a la mitad con
+# el throttling, una vez por ráfaga) y un ciclo de reintentos con backoff
+# exponencial y jitter completo. En streaming la ranura se conserva hasta
+# consumir el stream: la generación sigue en vuelo mientras llegan eventos.
+# Los errores se clasifican antes de decidir si se reintenta: un
+# ValidationException no mejora reintentando, un ThrottlingException sí.
+# El estado es del proceso y lo comparten todas las sesiones e hilos.
+
+THROTTLING = 'throttling'
+TRANSITORIO = 'transitorio'
+PERMANENTE = 'permanente'
+
+_CODIGOS_THROTTLING = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException',
+    'ProvisionedThroughputExceededException', 'RequestLimitExceeded'
+}
+_CODIGOS_TRANSITORIOS = {
+    'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException',
+    'ModelTimeoutException', 'ModelStreamErrorException', 'RequestTimeout', 'RequestTimeoutException'
+}
+
+
+class CircuitoAbierto(Exception):
+    """Bedrock falló repetidamente y las llamadas se rechazan sin intentarlas"""
+
+
+class SinCapacidad(Exception):
+    """No se liberó una ranura de concurrencia dentro del tiempo de espera"""
+
+
+def clasificar_error(error):
+    """Clasifica una excepción de Bedrock/botocore como throttling, transitorio o permanente"""
+    if isinstance(error, SinCapacidad):
+        return THROTTLING
+    if isinstance(error, CircuitoAbierto):
+        return TRANSITORIO
+    try:
+        from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+    except ImportError:
+        return PERMANENTE
+
+    if isinstance(error, ClientError):
+        codigo = error.response.get('Error', {}).get('Code', '')
+        estado = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        if codigo in _CODIGOS_THROTTLING or estado == 429:
+            return THROTTLING
+        if codigo in _CODIGOS_TRANSITORIOS or estado >= 500:
+            return TRANSITORIO
+        return PERMANENTE
+    # Timeouts de lectura/conexión y conexiones cerradas
+    if isinstance(error, (HTTPClientError, ConnectionError)):
+        return TRANSITORIO
+    return PERMANENTE
+
+
+class LimitadorAIMD:
+    """Semáforo cuyo tamaño se adapta: +1/límite por éxito, ×0.5 por throttling
+
+    Solo reduce el throttling de llamadas admitidas después de la última
+    reducción: una ráfaga de N throttlings simultáneos reduce una vez, no N.
+    """
+
+    def __init__(self, minimo, inicial, maximo):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.limite = float(min(max(inicial, minimo), maximo))
+        self.en_vuelo = 0
+        self.esperando = 0
+        self.reducciones = 0
+        self._condicion = threading.Condition()
+
+    def adquirir(self, espera_maxima):
+        """Espera una ranura libre y retorna el turno para liberar(); lanza SinCapacidad si no llega a tiempo"""
+        vence = time.monotonic() + espera_maxima
+        with self._condicion:
+            self.esperando += 1
+            try:
+                while self.en_vuelo >= int(self.limite):
+                    restante = vence - time.monotonic()
+                    if restante <= 0:
+                        raise SinCapacidad("Bedrock está saturado; no hay capacidad disponible en este momento")
+                    self._condicion.wait(restante)
+                self.en_vuelo += 1
+                return self.reducciones
+            finally:
+                self.esperando -= 1
+
+    def liberar(self, resultado, turno):
+        """Devuelve la ranura y ajusta el límite según el resultado de la llamada admitida en turno"""
+        with self._condicion:
+            self.en_vuelo -= 1
+            if resultado == THROTTLING:
+                if turno == self.reducciones:
+                    self.limite = max(self.minimo, self.limite / 2)
+                    self.reducciones += 1
+            elif resultado is None:
+                self.limite = min(self.maximo, self.limite + 1 / self.limite)
+            self._condicion.notify_all()
+
+
+class CircuitBreaker:
+    """Cerrado → abierto tras N fallos seguidos → semiabierto tras la espera (una prueba)"""
+
+    def __init__(self, umbral_fallos, espera_segundos):
+        self.umbral_fallos = umbral_fallos
+        self.espera_segundos = espera_segundos
+        self.estado = 'cerrado'
+        self.fallos_seguidos = 0
+        self.aperturas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Lanza CircuitoAbierto si la llamada no debe intentarse"""
+        with self._lock:
+            if self.estado == 'abierto':
+                if time.monotonic() - self._abierto_desde < self.espera_segundos:
+                    raise CircuitoAbierto("Bedrock no está disponible temporalmente; intente de nuevo en unos segundos")
+                self.estado = 'semiabierto'
+            if self.estado == 'semiabierto':
+                if self._prueba_en_curso:
+                    raise CircuitoAbierto("Bedrock no está disponible temporalmente; intente de nuevo en unos segundos")
+                self._prueba_en_curso = True
+
+    def registrar(self, exito):
+        with self._lock:
+            self._prueba_en_curso = False
+            if exito:
+                self.estado = 'cerrado'
+                self.fallos_seguidos = 0
+                return
+            self.fallos_seguidos += 1
+            if self.estado == 'semiabierto' or self.fallos_seguidos >= self.umbral_fallos:
+                if self.estado != 'abierto':
+                    self.aperturas += 1
+                self.estado = 'abierto'
+                self._abierto_desde = time.monotonic()
+
+    def liberar_prueba(self):
+        """Cierra una prueba que terminó sin resultado de salud (error permanente)"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+
+class ResilienciaBedrock:
+    """Ejecuta llamadas a Bedrock con circuit breaker, límite AIMD y reintentos"""
+
+    def __init__(self, reintentos=None, backoff_base_ms=None, backoff_max_ms=None, limitador=None,
+                 circuito=None, espera_ranura_segundos=None, dormir=time.sleep):
+        self.reintentos = configuracion.RESILIENCIA_REINTENTOS if reintentos is None else reintentos
+        self.backoff_base = (configuracion.RESILIENCIA_BACKOFF_BASE_MS if backoff_base_ms is None
+                             else backoff_base_ms) / 1000
+        self.backoff_max = (configuracion.RESILIENCIA_BACKOFF_MAX_MS if backoff_max_ms is None
+                            else backoff_max_ms) / 1000
+        self.espera_ranura = (configuracion.RESILIENCIA_ESPERA_RANURA_SEGUNDOS if espera_ranura_segundos is None
+                              else espera_ranura_segundos)
+        self.limitador = limitador or LimitadorAIMD(
+            configuracion.RESILIENCIA_CONCURRENCIA_MIN,
+            configuracion.RESILIENCIA_CONCURRENCIA_INICIAL,
+            configuracion.RESILIENCIA_CONCURRENCIA_MAX
+        )
+        self.circuito = circuito or CircuitBreaker(
+            configuracion.RESILIENCIA_CIRCUITO_FALLOS,
+            configuracion.RESILIENCIA_CIRCUITO_ESPERA_SEGUNDOS
+        )
+        self._dormir = dormir
+        self._aleatorio = random.Random()
+        self._lock = threading.Lock()
+        self._contadores = {
+            'llamadas': 0, 'intentos': 0, 'reintentos': 0, 'exitos': 0, 'fallos': 0,
+            THROTTLING: 0, TRANSITORIO: 0, PERMANENTE: 0, 'rechazos_circuito': 0, 'sin_capacidad': 0
+        }
+
+    def _contar(self, *claves):
+        with self._lock:
+            for clave in claves:
+                self._contadores[clave] += 1
+
+    def espera_backoff(self, intento):
+        """Segundos antes del reintento número intento (jitter completo)"""
+        return self._aleatorio.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        """Llama funcion(*args, **kwargs) con reintentos; relanza el último error si no se logra"""
+        return self._ejecutar(funcion, args, kwargs, retener=False)
+
+    def abrir_stream(self, funcion, *args, **kwargs):
+        """Como ejecutar, pero la ranura sigue ocupada hasta consumir el stream
+
+        Retorna (resultado, cerrar). cerrar(error=None) se llama una vez al
+        agotar el stream o al fallar, con la excepción si la hubo: libera la
+        ranura y, si fue throttling, reduce el límite.
+        """
+        return self._ejecutar(funcion, args, kwargs, retener=True)
+
+    def _cerrador(self, turno):
+        abierto = True
+
+        def cerrar(error=None):
+            nonlocal abierto
+            if not abierto:
+                return
+            abierto = False
+            clase = clasificar_error(error) if error is not None else None
+            if clase is not None:
+                self._contar(clase)
+            self.limitador.liberar(clase, turno)
+        return cerrar
+
+    def _ejecutar(self, funcion, args, kwargs, retener):
+        self._contar('llamadas')
+        intento = 0
+        while True:
+            try:
+                self.circuito.permitir()
+            except CircuitoAbierto:
+                self._contar('rechazos_circuito', 'fallos')
+                raise
+
+            clase = None
+            retenida = False
+            try:
+                turno = self.limitador.adquirir(self.espera_ranura)
+            except SinCapacidad:
+                self.circuito.liberar_prueba()
+                self._contar('sin_capacidad', 'fallos')
+                raise
+
+            try:
+                self._contar('intentos')
+                resultado = funcion(*args, **kwargs)
+            except Exception as e:
+                clase = clasificar_error(e)
+                self._contar(clase)
+                if clase == PERMANENTE:
+                    self.circuito.liberar_prueba()
+                else:
+                    self.circuito.registrar(exito=False)
+                if clase == PERMANENTE or intento >= self.reintentos:
+                    self._contar('fallos')
+                    raise
+            else:
+                self.circuito.registrar(exito=True)
+                self._contar('exitos')
+                if retener:
+                    retenida = True
+                    return resultado, self._cerrador(turno)
+                return resultado
+            finally:
+                if not retenida:
+                    self.limitador.liberar(clase, turno)
+
+            self._dormir(self.espera_backoff(intento))
+            intento += 1
+            self._contar('reintentos')
+
+    def metricas(self):
+        """Contadores de llamadas y estado actual del limitador y del circuito"""
+        with self._lock:
+            metricas = dict(self._contadores)
+        metricas.update({
+            'limite_concurrencia': round(self.limitador.limite, 1),
+            'en_vuelo': self.limitador.en_vuelo,
+            'esperando': self.limitador.esperando,
+            'estado_circuito': self.circuito.estado,
+            'aperturas_circuito': self.circuito.aperturas
+        })
+        return metricas
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_resiliencia():
+    """Retorna la capa de resiliencia compartida del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = ResilienciaBedrock()
+    return _instancia
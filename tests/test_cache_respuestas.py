@@ -0,0 +1,41 @@
+import itertools
+import threading
+import time
+
+from cache_respuestas import CacheRespuestas
+
+
+def test_reenvios_simultaneos_reciben_el_mismo_radicado(tmp_path):
+    ruta = str(tmp_path / 'cache.sqlite3')
+    # Una instancia por "proceso": cada una con su propia conexión a la base
+    caches = [CacheRespuestas(ruta) for _ in range(4)]
+    secuencia = itertools.count(1)
+    barrera = threading.Barrier(8)
+    radicados = []
+
+    def nuevo_radicado():
+        time.sleep(0.05)
+        return f"VEO-R-{next(secuencia):06d}"
+
+    def enviar(cache):
+        barrera.wait()
+        radicados.append(cache.asignar_radicado('1234567890', 'R', nuevo_radicado))
+
+    hilos = [threading.Thread(target=enviar, args=(caches[i % 4],)) for i in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(radicados) == 8
+    assert set(radicados) == {'VEO-R-000001'}
+
+
+def test_vencida_la_ventana_se_asigna_otro_radicado(tmp_path):
+    cache = CacheRespuestas(str(tmp_path / 'cache.sqlite3'), ventana_radicado_segundos=60)
+    primero = cache.asignar_radicado('1234567890', 'R', lambda: 'VEO-R-000001')
+    assert cache.asignar_radicado('1234567890', 'R', lambda: 'VEO-R-000002') == primero
+    assert cache.asignar_radicado('1234567890', 'Q', lambda: 'VEO-Q-000003') == 'VEO-Q-000003'
+
+    cache._conexion.execute("UPDATE radicados_recientes SET creado = creado - 120")
+    assert cache.asignar_radicado('1234567890', 'R', lambda: 'VEO-R-000004') == 'VEO-R-000004'
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from casos_similares import personalizar_carta
+from clientes_sinteticos import generar_datos_cliente
+
+HOY = datetime(2026, 10, 5)
+
+
+def _clientes():
+    anterior = generar_datos_cliente('1234567890', hoy=HOY)
+    nuevo = dict(generar_datos_cliente('1234567891', hoy=HOY), consumo_actual=21, valor_m3=3500,
+                 valor_factura=73500.0)
+    anterior.update(consumo_actual=15, valor_m3=2500, valor_factura=37500.0)
+    return anterior, nuevo
+
+
+def _previo(anterior, texto):
+    return {'radicado': 'VEO-R-20261001-100000-000001', 'fecha': '2026-10-01 10:00:00',
+            'datos_cliente': anterior, 'texto': texto}
+
+
+def test_solo_cambian_las_cifras_citadas_como_datos_del_cliente():
+    anterior, nuevo = _clientes()
+    texto = (f"Respetado(a) {anterior['nombre_completo']}: su consumo fue de 15 m³, facturado a $2.500 por m³ "
+             f"para un total de $37.500. Le responderemos en 15 días hábiles, según el artículo 15.")
+
+    carta = personalizar_carta(_previo(anterior, texto), nuevo, 'VEO-R-20261005-100000-000002', fecha=HOY)
+
+    assert carta is not None
+    assert nuevo['nombre_completo'] in carta
+    assert "21 m³" in carta and "$3.500 por m³" in carta and "$73.500" in carta
+    assert "15 días hábiles" in carta and "artículo 15." in carta
+
+
+def test_descarta_la_carta_si_queda_el_valor_de_la_factura_anterior():
+    anterior, nuevo = _clientes()
+    texto = f"Respetado(a) {anterior['nombre_completo']}: el valor facturado fue 37.500 pesos."
+
+    assert personalizar_carta(_previo(anterior, texto), nuevo, 'VEO-R-20261005-100000-000002', fecha=HOY) is None
@@ -0,0 +1,74 @@
+import configuracion
+from cola_trabajos import COMPLETADO, EN_COLA, FALLIDO, ColaTrabajos, TrabajadorCola
+from resiliencia import SinCapacidad
+
+DATOS = {'numero_contrato': '1234567890', 'nombre_completo': 'Cliente de Prueba'}
+
+
+class GeneradorFalso:
+    """Falla con los errores dados, en orden, y luego genera la carta"""
+
+    def __init__(self, *errores):
+        self.errores = list(errores)
+
+    def generar_respuesta_bedrock(self, tipo_pqrs, datos_cliente, regenerar=False, radicado=None, lanzar=False):
+        if self.errores:
+            raise self.errores.pop(0)
+        return "Carta", radicado, None
+
+    def archivar_documento_word(self, texto, radicado, datos_cliente):
+        pass
+
+
+def _atender(cola, generador):
+    trabajador = TrabajadorCola(cola, generador, hilos=1, nombre='prueba')
+    trabajo = cola.tomar(trabajador.nombre)
+    if trabajo is not None:
+        trabajador.atender(trabajo)
+    return trabajo
+
+
+def test_throttling_vuelve_a_la_cola_con_espera(tmp_path, monkeypatch):
+    cola = ColaTrabajos(str(tmp_path / 'cola.sqlite3'), max_intentos=3)
+    cola.encolar('VEO-P-1', 'P', DATOS)
+    generador = GeneradorFalso(SinCapacidad("saturado"))
+
+    _atender(cola, generador)
+    trabajo = cola.obtener('VEO-P-1')
+    assert trabajo['estado'] == EN_COLA
+    assert 'saturado' in trabajo['error']
+    # Aún no vence la espera: nadie lo retoma
+    assert _atender(cola, generador) is None
+
+    monkeypatch.setattr(configuracion, 'COLA_REINTENTO_BASE_SEGUNDOS', 0.0)
+    cola._conexion().execute("UPDATE trabajos SET disponible_desde = 0")
+    _atender(cola, generador)
+    trabajo = cola.obtener('VEO-P-1')
+    assert trabajo['estado'] == COMPLETADO
+    assert trabajo['intentos'] == 2
+
+
+def test_error_permanente_falla_de_inmediato(tmp_path):
+    cola = ColaTrabajos(str(tmp_path / 'cola.sqlite3'), max_intentos=3)
+    cola.encolar('VEO-P-1', 'P', DATOS)
+
+    _atender(cola, GeneradorFalso(ValueError("solicitud inválida")))
+
+    trabajo = cola.obtener('VEO-P-1')
+    assert trabajo['estado'] == FALLIDO
+    assert trabajo['intentos'] == 1
+
+
+def test_reintentos_acotados_por_max_intentos(tmp_path, monkeypatch):
+    monkeypatch.setattr(configuracion, 'COLA_REINTENTO_BASE_SEGUNDOS', 0.0)
+    cola = ColaTrabajos(str(tmp_path / 'cola.sqlite3'), max_intentos=2)
+    cola.encolar('VEO-P-1', 'P', DATOS)
+    generador = GeneradorFalso(SinCapacidad("saturado"), SinCapacidad("saturado"), SinCapacidad("saturado"))
+
+    _atender(cola, generador)
+    _atender(cola, generador)
+
+    trabajo = cola.obtener('VEO-P-1')
+    assert trabajo['estado'] == FALLIDO
+    assert trabajo['intentos'] == 2
+    assert _atender(cola, generador) is None
@@ -0,0 +1,24 @@
+from io import StringIO
+
+from lote_pqrs import leer_archivo_lote
+
+
+def test_tipo_acepta_la_letra_o_el_nombre_exacto():
+    archivo = StringIO(
+        "tipo,numero_contrato\n"
+        "p,1234567890\n"
+        "Petición,1234567891\n"
+        " RECLAMO ,1234567892\n"
+        "Pago,1234567893\n"
+        "Quejas,1234567894\n"
+        ",1234567895\n"
+    )
+
+    filas, errores = leer_archivo_lote(archivo, 'lote.csv')
+
+    assert [(f['fila'], f['tipo']) for f in filas] == [(1, 'P'), (2, 'P'), (3, 'R')]
+    assert [(e['fila'], e['tipo'], e['error']) for e in errores] == [
+        (4, 'Pago', 'Tipo de PQRS no válido'),
+        (5, 'Quejas', 'Tipo de PQRS no válido'),
+        (6, '', 'Tipo de PQRS no válido'),
+    ]
@@ -0,0 +1,35 @@
+import json
+
+from bedrock_stub import BedrockStub
+from clientes_sinteticos import generar_datos_cliente
+from generador_pqrs import VeoliaPQRSGenerator
+
+SONNET = 'us.anthropic.claude-sonnet-4-20250514-v1:0'
+HAIKU = 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
+
+
+def _uso(stub, generador, modelo):
+    plan = {'modelo': modelo, 'max_tokens': 1000, 'degradado': None}
+    body = generador.construir_body('R', generar_datos_cliente('1234567890'), 'VEO-R-000001', plan)
+    respuesta = stub.invoke_model(body=body, modelId=modelo)
+    return json.loads(respuesta['body'].read())['usage'], json.loads(body)
+
+
+def test_el_prefijo_alcanza_el_minimo_y_se_lee_del_cache():
+    stub = BedrockStub(latencia_mediana_ms=0, tokens_por_segundo=0, tasa_throttling=0, tasa_timeout=0)
+    generador = VeoliaPQRSGenerator(stub)
+
+    primera, _ = _uso(stub, generador, SONNET)
+    segunda, _ = _uso(stub, generador, SONNET)
+
+    assert primera['cache_creation_input_tokens'] >= 1024
+    assert segunda['cache_read_input_tokens'] == primera['cache_creation_input_tokens']
+
+
+def test_sin_cache_control_si_el_prefijo_no_alcanza_el_minimo_del_modelo():
+    stub = BedrockStub(latencia_mediana_ms=0, tokens_por_segundo=0, tasa_throttling=0, tasa_timeout=0)
+    generador = VeoliaPQRSGenerator(stub)
+
+    _, body = _uso(stub, generador, HAIKU)
+
+    assert isinstance(body['messages'][0]['content'], str)
@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date
+
+import configuracion
+
+# ============================================================================
+# REGISTRO DE USO DE TOKENS
+# ============================================================================
+# Guarda el bloque usage de cada llamada a Bedrock, separando los tokens de
+# entrada leídos del cache de prompt, los escritos en él y los no cacheados.
+# Los últimos registros quedan en memoria; ContabilidadTokens además acumula
+# tokens y costo por día, tipo y modelo en SQLite, junto con la distribución
+# de tokens de salida por tipo, y decide cuándo degradar por presupuesto.
+
+MAX_REGISTROS = 1000
+
+_lock = threading.Lock()
+_registros = deque(maxlen=MAX_REGISTROS)
+
+
+def normalizar_uso(usage):
+    """Convierte el bloque usage de Anthropic en un dict con todos los campos"""
+    usage = usage or {}
+    return {
+        'input_tokens': int(usage.get('input_tokens') or 0),
+        'cache_read_input_tokens': int(usage.get('cache_read_input_tokens') or 0),
+        'cache_creation_input_tokens': int(usage.get('cache_creation_input_tokens') or 0),
+        'output_tokens': int(usage.get('output_tokens') or 0)
+    }
+
+
+def precios_modelo(model_id):
+    """[entrada, salida, lectura de caché, escritura en caché] en USD por millón, o None"""
+    for fragmento, precios in configuracion.PRECIOS_MODELOS.items():
+        if fragmento in model_id:
+            return precios
+    return None
+
+
+def costo_usd(uso, model_id):
+    """Costo en USD de un uso normalizado; 0 si el modelo no tiene precio configurado"""
+    precios = precios_modelo(model_id)
+    if precios is None:
+        return 0.0
+    entrada, salida, lectura_cache, escritura_cache = precios
+    return (uso['input_tokens'] * entrada + uso['output_tokens'] * salida
+            + uso['cache_read_input_tokens'] * lectura_cache
+            + uso['cache_creation_input_tokens'] * escritura_cache) / 1_000_000
+
+
+def registrar_uso(tipo_pqrs, model_id, usage, radicado=None, razon_fin=None):
+    """Registra el uso de una llamada y retorna el registro creado"""
+    uso = normalizar_uso(usage)
+    registro = dict(uso, tipo=tipo_pqrs, modelo=model_id, radicado=radicado, momento=time.time(),
+                    costo_usd=costo_usd(uso, model_id), truncada=razon_fin == 'max_tokens')
+    with _lock:
+        _registros.append(registro)
+    return registro
+
+
+def ultimos_registros(cantidad=20):
+    """Retorna los registros más recientes, del más nuevo al más viejo"""
+    with _lock:
+        return list(_registros)[-cantidad:][::-1]
+
+
+def resumen_uso():
+    """Totales de tokens de los registros en memoria"""
+    with _lock:
+        registros = list(_registros)
+
+    resumen = {
+        'llamadas': len(registros),
+        'input_tokens': sum(r['input_tokens'] for r in registros),
+        'cache_read_input_tokens': sum(r['cache_read_input_tokens'] for r in registros),
+        'cache_creation_input_tokens': sum(r['cache_creation_input_tokens'] for r in registros),
+        'output_tokens': sum(r['output_tokens'] for r in registros),
+        'costo_usd': sum(r['costo_usd'] for r in registros)
+    }
+    entrada_total = (resumen['input_tokens'] + resumen['cache_read_input_tokens']
+                     + resumen['cache_creation_input_tokens'])
+    resumen['fraccion_cacheada'] = resumen['cache_read_input_tokens'] / entrada_total if entrada_total else 0.0
+    return resumen
+
+
+# ============================================================================
+# CONTABILIDAD PERSISTENTE Y PRESUPUESTOS
+# ============================================================================
+
+TOKENS_POR_CUBETA = 100
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS uso_diario (
+    dia TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    llamadas INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    truncadas INTEGER NOT NULL,
+    costo_usd REAL NOT NULL,
+    PRIMARY KEY (dia, tipo, modelo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS salida_tokens (
+    tipo TEXT NOT NULL,
+    cubeta INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (tipo, cubeta)
+) WITHOUT ROWID;
+"""
+
+COLUMNAS_USO = ('llamadas', 'input_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens',
+                'output_tokens', 'truncadas', 'costo_usd')
+
+
+class ContabilidadTokens:
+    """Tokens y costo por día, tipo y modelo, con presupuestos diarios"""
+
+    def __init__(self, ruta_db):
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        self._conexion().executescript(ESQUEMA)
+
+    def _conexion(self):
+        """Retorna la conexión del hilo actual, creándola si no existe"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute("PRAGMA busy_timeout=30000")
+            self._local.conexion = conexion
+        return conexion
+
+    def registrar(self, registro):
+        """Suma un registro de registrar_uso a los acumulados del día y a la distribución de salida"""
+        dia = time.strftime('%Y-%m-%d', time.localtime(registro['momento']))
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            conexion.execute(
+                f"""INSERT INTO uso_diario (dia, tipo, modelo, {', '.join(COLUMNAS_USO)})
+                    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (dia, tipo, modelo) DO UPDATE SET
+                    {', '.join(f'{c} = {c} + excluded.{c}' for c in COLUMNAS_USO)}""",
+                (dia, registro['tipo'], registro['modelo'], registro['input_tokens'],
+                 registro['cache_read_input_tokens'], registro['cache_creation_input_tokens'],
+                 registro['output_tokens'], int(registro['truncada']), registro['costo_usd'])
+            )
+            conexion.execute(
+                """INSERT INTO salida_tokens (tipo, cubeta, cantidad) VALUES (?, ?, 1)
+                   ON CONFLICT (tipo, cubeta) DO UPDATE SET cantidad = cantidad + 1""",
+                (registro['tipo'], registro['output_tokens'] // TOKENS_POR_CUBETA)
+            )
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def gasto(self, dia, tipo=None):
+        """USD gastados en el día ('YYYY-MM-DD'), en total o de un tipo"""
+        consulta = "SELECT COALESCE(SUM(costo_usd), 0) FROM uso_diario WHERE dia = ?"
+        parametros = [dia]
+        if tipo is not None:
+            consulta += " AND tipo = ?"
+            parametros.append(tipo)
+        return self._conexion().execute(consulta, parametros).fetchone()[0]
+
+    def resumen(self, desde, hasta, agrupar=('tipo', 'modelo')):
+        """Acumulados entre dos fechas (inclusive) agrupados por las columnas dadas"""
+        columnas = ', '.join(agrupar)
+        filas = self._conexion().execute(
+            f"""SELECT {columnas}, {', '.join(f'SUM({c}) AS {c}' for c in COLUMNAS_USO)}
+                FROM uso_diario WHERE dia BETWEEN ? AND ? GROUP BY {columnas} ORDER BY {columnas}""",
+            (desde.isoformat(), hasta.isoformat())
+        ).fetchall()
+        return [dict(f) for f in filas]
+
+    def distribucion_salida(self, tipo):
+        """{límite superior en tokens: cantidad de llamadas} de un tipo"""
+        filas = self._conexion().execute(
+            "SELECT cubeta, cantidad FROM salida_tokens WHERE tipo = ? ORDER BY cubeta", (tipo,)
+        ).fetchall()
+        return {(cubeta + 1) * TOKENS_POR_CUBETA: cantidad for cubeta, cantidad in filas}
+
+    def recomendar_max_tokens(self, tipo, fraccion=0.99, margen=1.2):
+        """max_tokens que cubre el percentil dado de salidas del tipo con un margen, o None sin datos
+
+        Se redondea hacia arriba a la cubeta; las cartas truncadas por
+        max_tokens cuentan en la cubeta del límite, así que la recomendación
+        nunca queda por debajo de lo que ya se está cortando.
+        """
+        distribucion = self.distribucion_salida(tipo)
+        total = sum(distribucion.values())
+        if total < configuracion.MAX_TOKENS_MUESTRAS_MINIMAS:
+            return None
+        acumulado = 0
+        for limite, cantidad in distribucion.items():
+            acumulado += cantidad
+            if acumulado >= fraccion * total:
+                return int(-(-limite * margen // TOKENS_POR_CUBETA) * TOKENS_POR_CUBETA)
+
+    def fraccion_presupuesto(self, tipo):
+        """Mayor fracción consumida hoy entre el presupuesto total y el del tipo (0 sin presupuestos)"""
+        hoy = date.today().isoformat()
+        fraccion = 0.0
+        if configuracion.PRESUPUESTO_DIARIO_USD > 0:
+            fraccion = self.gasto(hoy) / configuracion.PRESUPUESTO_DIARIO_USD
+        presupuesto_tipo = float(configuracion.PRESUPUESTOS_TIPO_USD.get(tipo) or 0)
+        if presupuesto_tipo > 0:
+            fraccion = max(fraccion, self.gasto(hoy, tipo) / presupuesto_tipo)
+        return fraccion
+
+    def planificar(self, tipo, modelo, max_tokens):
+        """Modelo y max_tokens de la próxima llamada del tipo según el presupuesto del día
+
+        Desde PRESUPUESTO_FRACCION_AVISO se recorta max_tokens a lo
+        recomendado para el tipo (o MAX_TOKENS_DEGRADADO sin datos); al
+        agotar el presupuesto también se cambia al modelo económico.
+        """
+        plan = {'modelo': modelo, 'max_tokens': max_tokens, 'degradado': None}
+        fraccion = self.fraccion_presupuesto(tipo)
+        if fraccion >= configuracion.PRESUPUESTO_FRACCION_AVISO:
+            recomendado = self.recomendar_max_tokens(tipo) or configuracion.MAX_TOKENS_DEGRADADO
+            plan['max_tokens'] = min(max_tokens, recomendado)
+            plan['degradado'] = 'max_tokens'
+        if fraccion >= 1.0 and configuracion.MODELO_ECONOMICO and configuracion.MODELO_ECONOMICO != modelo:
+            plan['modelo'] = configuracion.MODELO_ECONOMICO
+            plan['degradado'] = 'modelo'
+        return plan
+
+
+_lock_instancia = threading.Lock()
+_instancia = None
+
+
+def obtener_contabilidad():
+    """Retorna la contabilidad de tokens compartida del proceso"""
+    global _instancia
+    if _instancia is None:
+        with _lock_instancia:
+            if _instancia is None:
+                _instancia = ContabilidadTokens(configuracion.USO_RUTA)
+    return _instancia